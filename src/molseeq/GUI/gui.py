@@ -93,6 +93,18 @@ class Ui_Frame(object):
         self.molseeq_append_dataset_label = QtWidgets.QLabel(self.tab_15)
         self.molseeq_append_dataset_label.setObjectName("molseeq_append_dataset_label")
         self.formLayout.setWidget(4, QtWidgets.QFormLayout.LabelRole, self.molseeq_append_dataset_label)
+        self.molseeq_import_frames_label = QtWidgets.QLabel(self.tab_15)
+        self.molseeq_import_frames_label.setObjectName("molseeq_import_frames_label")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.LabelRole, self.molseeq_import_frames_label)
+        self.molseeq_import_frames = QtWidgets.QLineEdit(self.tab_15)
+        self.molseeq_import_frames.setObjectName("molseeq_import_frames")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.FieldRole, self.molseeq_import_frames)
+        self.molseeq_import_crop_label = QtWidgets.QLabel(self.tab_15)
+        self.molseeq_import_crop_label.setObjectName("molseeq_import_crop_label")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.LabelRole, self.molseeq_import_crop_label)
+        self.molseeq_import_crop = QtWidgets.QLineEdit(self.tab_15)
+        self.molseeq_import_crop.setObjectName("molseeq_import_crop")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.FieldRole, self.molseeq_import_crop)
         self.verticalLayout_18.addLayout(self.formLayout)
         self.molseeq_concatenate = QtWidgets.QCheckBox(self.tab_15)
         self.molseeq_concatenate.setObjectName("molseeq_concatenate")
@@ -100,9 +112,24 @@ class Ui_Frame(object):
         self.molseeq_append = QtWidgets.QCheckBox(self.tab_15)
         self.molseeq_append.setObjectName("molseeq_append")
         self.verticalLayout_18.addWidget(self.molseeq_append)
+        self.molseeq_import_memmap = QtWidgets.QCheckBox(self.tab_15)
+        self.molseeq_import_memmap.setObjectName("molseeq_import_memmap")
+        self.verticalLayout_18.addWidget(self.molseeq_import_memmap)
+        self.molseeq_import_lazy = QtWidgets.QCheckBox(self.tab_15)
+        self.molseeq_import_lazy.setObjectName("molseeq_import_lazy")
+        self.verticalLayout_18.addWidget(self.molseeq_import_lazy)
         self.molseeq_import = QtWidgets.QPushButton(self.tab_15)
         self.molseeq_import.setObjectName("molseeq_import")
         self.verticalLayout_18.addWidget(self.molseeq_import)
+        self.molseeq_session_compress = QtWidgets.QCheckBox(self.tab_15)
+        self.molseeq_session_compress.setObjectName("molseeq_session_compress")
+        self.verticalLayout_18.addWidget(self.molseeq_session_compress)
+        self.molseeq_save_session = QtWidgets.QPushButton(self.tab_15)
+        self.molseeq_save_session.setObjectName("molseeq_save_session")
+        self.verticalLayout_18.addWidget(self.molseeq_save_session)
+        self.molseeq_load_session = QtWidgets.QPushButton(self.tab_15)
+        self.molseeq_load_session.setObjectName("molseeq_load_session")
+        self.verticalLayout_18.addWidget(self.molseeq_load_session)
         self.tabWidget_4.addTab(self.tab_15, "")
         self.tab_16 = QtWidgets.QWidget()
         self.tab_16.setObjectName("tab_16")
@@ -1488,9 +1515,18 @@ class Ui_Frame(object):
         self.molseeq_import_limt.setItemText(6, _translate("Frame", "400"))
         self.molseeq_import_limt.setItemText(7, _translate("Frame", "500"))
         self.molseeq_append_dataset_label.setText(_translate("Frame", "Append Channels to Dataset:"))
+        self.molseeq_import_frames_label.setText(_translate("Frame", "Frame Window (start:stop:step)"))
+        self.molseeq_import_frames.setPlaceholderText(_translate("Frame", "All Frames"))
+        self.molseeq_import_crop_label.setText(_translate("Frame", "Crop (y0:y1, x0:x1)"))
+        self.molseeq_import_crop.setPlaceholderText(_translate("Frame", "Full Frame"))
         self.molseeq_concatenate.setText(_translate("Frame", "Concatenate Files"))
         self.molseeq_append.setText(_translate("Frame", "Append Channel(s) To Exisiting Dataset"))
+        self.molseeq_import_memmap.setText(_translate("Frame", "Memory Map Images (Read Only)"))
+        self.molseeq_import_lazy.setText(_translate("Frame", "Lazy Import (Disk Backed, Larger Than RAM)"))
         self.molseeq_import.setText(_translate("Frame", "Import"))
+        self.molseeq_session_compress.setText(_translate("Frame", "Compress Session (Chunked, Slower to Load)"))
+        self.molseeq_save_session.setText(_translate("Frame", "Save Session"))
+        self.molseeq_load_session.setText(_translate("Frame", "Load Session"))
         self.tabWidget_4.setTabText(self.tabWidget_4.indexOf(self.tab_15), _translate("Frame", "Import Images"))
         self.label_2.setText(_translate("Frame", "Dataset"))
         self.label_75.setText(_translate("Frame", "Channel"))
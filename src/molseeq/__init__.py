@@ -1,9 +1,15 @@
-from molseeq.molseeq_widget import (
-    QWidget,
-)
-
 __all__ = (
     "QWidget",
 )
 
-__version__ = "1.0.4"
\ No newline at end of file
+__version__ = "1.0.4"
+
+
+def __getattr__(name):
+
+    # the widget is imported on first use, so the headless engine does not load it
+    if name == "QWidget":
+        from molseeq.molseeq_widget import QWidget
+        return QWidget
+
+    raise AttributeError(f"module 'molseeq' has no attribute {name!r}")
@@ -0,0 +1,31 @@
+from molseeq.engine.engine import MolseeqEngine
+from molseeq.engine.params import (
+    ImportParams,
+    TransformParams,
+    AlignParams,
+    UndriftParams,
+    FilterParams,
+    DetectParams,
+    ColocalizeParams,
+    TracesParams,
+    ExportTracesParams,
+    ExportLocsParams,
+    PIPELINE_PARAMS,
+    params_from_gui,
+)
+
+__all__ = (
+    "MolseeqEngine",
+    "ImportParams",
+    "TransformParams",
+    "AlignParams",
+    "UndriftParams",
+    "FilterParams",
+    "DetectParams",
+    "ColocalizeParams",
+    "TracesParams",
+    "ExportTracesParams",
+    "ExportLocsParams",
+    "PIPELINE_PARAMS",
+    "params_from_gui",
+)
@@ -0,0 +1,405 @@
+import argparse
+import atexit
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+
+from molseeq.engine.params import PIPELINE_PARAMS
+from molseeq.funcs.executor_utils import get_compute_budget, set_compute_budget
+
+# written next to each input once all of its outputs exist, used to skip files that are up to date
+BATCH_MANIFEST_SUFFIX = "_molseeq_batch.json"
+
+# pipeline stages run in this order, stages that can run more than once take a list of parameter sets
+BATCH_STAGES = ["import", "transform", "filter", "undrift", "detect", "colocalize",
+                "traces", "export_traces", "export_locs"]
+
+BATCH_OPTIONS = ["transform_matrix", "save_session"]
+
+# inputs picked up when a directory is given in place of a glob
+BATCH_IMAGE_EXTENSIONS = [".tif", ".tiff", ".fits"]
+
+# the engine used by each batch worker process, created on first use
+_batch_engine = None
+
+
+def load_pipeline_spec(path):
+
+    with open(path, "r") as f:
+
+        if path.lower().endswith((".yaml", ".yml")):
+
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required for YAML pipeline specs, use a JSON spec or install pyyaml")
+
+            spec = yaml.safe_load(f)
+
+        else:
+            spec = json.load(f)
+
+    if spec is None:
+        spec = {}
+
+    # files referenced by the spec are relative to the spec
+    transform_matrix = spec.get("transform_matrix")
+
+    if transform_matrix not in [None, ""] and os.path.isabs(transform_matrix) == False:
+        spec["transform_matrix"] = os.path.join(os.path.dirname(os.path.abspath(path)), transform_matrix)
+
+    return spec
+
+
+def build_pipeline(spec):
+
+    unknown_keys = [key for key in spec.keys() if key not in BATCH_STAGES + BATCH_OPTIONS]
+
+    if len(unknown_keys) > 0:
+        raise ValueError(f"Unknown pipeline stages: {', '.join(unknown_keys)}")
+
+    pipeline = []
+
+    for stage in BATCH_STAGES:
+
+        stage_spec = spec.get(stage)
+
+        if stage == "import" and stage_spec is None:
+            stage_spec = {}
+        if stage == "transform" and stage_spec is None and spec.get("transform_matrix") not in [None, ""]:
+            stage_spec = {}
+
+        if stage_spec is None:
+            continue
+
+        if type(stage_spec) != list:
+            stage_spec = [stage_spec]
+
+        for step_spec in stage_spec:
+
+            step_spec = dict(step_spec or {})
+            options = {}
+
+            if stage == "detect":
+                options["fit"] = bool(step_spec.pop("fit", True))
+            if stage == "transform":
+                if spec.get("transform_matrix") in [None, ""]:
+                    raise ValueError("The transform stage requires a transform_matrix file")
+                options["transform_matrix"] = spec["transform_matrix"]
+
+            params = PIPELINE_PARAMS[stage].from_dict(step_spec)
+
+            pipeline.append([stage, params, options])
+
+    return pipeline
+
+
+def get_pipeline_hash(pipeline):
+
+    pipeline_dict = []
+
+    for stage, params, options in pipeline:
+
+        options = dict(options)
+
+        if "transform_matrix" in options.keys():
+            # the matrix file contents, not its path, decides whether outputs are current
+            with open(options["transform_matrix"], "rb") as f:
+                options["transform_matrix"] = hashlib.sha1(f.read()).hexdigest()
+
+        pipeline_dict.append([stage, params.to_dict(), options])
+
+    pipeline_json = json.dumps(pipeline_dict, sort_keys=True)
+
+    return hashlib.sha1(pipeline_json.encode()).hexdigest()
+
+
+def get_batch_inputs(patterns):
+
+    paths = []
+
+    for pattern in patterns:
+
+        if os.path.isdir(pattern):
+            pattern_paths = [path for extension in BATCH_IMAGE_EXTENSIONS
+                             for path in glob.glob(os.path.join(pattern, "*" + extension))]
+        else:
+            pattern_paths = glob.glob(pattern, recursive=True)
+
+        for path in sorted(pattern_paths):
+            path = os.path.abspath(path)
+            if os.path.isfile(path) and path not in paths:
+                paths.append(path)
+
+    return paths
+
+
+def get_manifest_path(path):
+
+    base, ext = os.path.splitext(path)
+
+    return base + BATCH_MANIFEST_SUFFIX
+
+
+def get_input_info(path):
+
+    stat = os.stat(path)
+
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def outputs_are_current(path, pipeline_hash):
+
+    outputs_current = False
+
+    try:
+
+        manifest_path = get_manifest_path(path)
+
+        if os.path.isfile(manifest_path):
+
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+
+            input_info = get_input_info(path)
+
+            if manifest.get("pipeline_hash") == pipeline_hash and manifest.get("input") == input_info:
+
+                outputs = manifest.get("outputs", [])
+
+                outputs_current = all([os.path.isfile(output) and os.path.getmtime(output) >= input_info["mtime"]
+                                       for output in outputs])
+
+    except:
+        outputs_current = False
+
+    return outputs_current
+
+
+def write_manifest(path, pipeline_hash, outputs):
+
+    manifest = {"pipeline_hash": pipeline_hash,
+                "input": get_input_info(path),
+                "outputs": outputs,
+                "completed": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    with open(get_manifest_path(path), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def get_batch_engine(verbose=False):
+
+    global _batch_engine
+
+    if _batch_engine is None:
+
+        from molseeq.engine.engine import MolseeqEngine
+
+        _batch_engine = MolseeqEngine(verbose=verbose)
+        atexit.register(_batch_engine.close)
+
+    return _batch_engine
+
+
+def initialise_batch_worker(compute_budget, verbose=False):
+
+    # each file worker gets an equal share of the machine for its own compute pool
+    set_compute_budget(**compute_budget)
+
+    get_batch_engine(verbose)
+
+
+def run_pipeline(engine, path, pipeline, save_session=False):
+
+    outputs = []
+
+    engine.reset()
+
+    for stage, params, options in pipeline:
+
+        if stage == "import":
+            engine.import_data([path], params)
+
+            if engine.dataset_dict == {}:
+                raise RuntimeError("No image data was imported")
+
+        elif stage == "transform":
+            engine.apply_transform(options["transform_matrix"], params)
+
+        elif stage == "filter":
+            engine.temporal_filter(params)
+
+        elif stage == "undrift":
+            engine.undrift(params)
+
+        elif stage == "detect":
+            engine.detect(params, detect=True, fit=options["fit"])
+
+        elif stage == "colocalize":
+            engine.colocalize(params)
+
+        elif stage == "traces":
+            engine.compute_traces(params)
+
+            if engine.traces_dict == {}:
+                raise RuntimeError("No traces were computed")
+
+        elif stage == "export_traces":
+            export_path = engine.export_traces(params)
+
+            if export_path is None or os.path.isfile(export_path) == False:
+                raise RuntimeError(f"{params.mode} traces were not exported")
+
+            outputs.append(export_path)
+
+        elif stage == "export_locs":
+            outputs.extend(engine.export_locs(params))
+
+    if save_session:
+        base, ext = os.path.splitext(path)
+        outputs.append(engine.save_session(base + "_molseeq.h5"))
+
+    missing_outputs = [output for output in outputs if os.path.isfile(output) == False]
+
+    if len(missing_outputs) > 0:
+        raise RuntimeError(f"Missing outputs: {', '.join(missing_outputs)}")
+
+    return outputs
+
+
+def process_batch_file(path, spec, verbose=False):
+
+    result = {"path": path, "status": "failed", "outputs": [], "error": None}
+
+    start = time.time()
+
+    try:
+
+        pipeline = build_pipeline(spec)
+        pipeline_hash = get_pipeline_hash(pipeline)
+
+        engine = get_batch_engine(verbose)
+
+        outputs = run_pipeline(engine, path, pipeline,
+            save_session=bool(spec.get("save_session", False)))
+
+        write_manifest(path, pipeline_hash, outputs)
+
+        result["status"] = "done"
+        result["outputs"] = outputs
+
+    except:
+        result["error"] = traceback.format_exc()
+
+    result["time"] = time.time() - start
+
+    return result
+
+
+def report_batch_result(result, index, n_files):
+
+    message = f"[{index}/{n_files}] {result['status']} {result['path']}"
+
+    if result["status"] == "done":
+        message += f" ({result['time']:.1f} s, {len(result['outputs'])} outputs)"
+
+    print(message)
+
+    if result["error"] is not None:
+        print(result["error"])
+
+
+def run_batch(paths, spec, n_jobs=1, force=False, verbose=False):
+
+    pipeline = build_pipeline(spec)
+    pipeline_hash = get_pipeline_hash(pipeline)
+
+    results = []
+    batch_paths = []
+
+    for path in paths:
+        if force == False and outputs_are_current(path, pipeline_hash):
+            results.append({"path": path, "status": "skipped", "outputs": [], "error": None})
+        else:
+            batch_paths.append(path)
+
+    n_files = len(paths)
+
+    for index, result in enumerate(results):
+        report_batch_result(result, index + 1, n_files)
+
+    n_jobs = max(1, min(n_jobs, len(batch_paths)))
+
+    if n_jobs == 1:
+
+        for path in batch_paths:
+            result = process_batch_file(path, spec, verbose)
+            results.append(result)
+            report_batch_result(result, len(results), n_files)
+
+    elif n_jobs > 1:
+
+        budget = get_compute_budget()
+
+        compute_budget = {"max_workers": max(1, budget["workers"] // n_jobs),
+                          "max_memory": budget["memory"] // n_jobs}
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs,
+                initializer=initialise_batch_worker, initargs=(compute_budget, verbose)) as executor:
+
+            futures = [executor.submit(process_batch_file, path, spec, verbose) for path in batch_paths]
+
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results.append(result)
+                report_batch_result(result, len(results), n_files)
+
+    return results
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog="molseeq-batch",
+        description="Run a molSEEQ pipeline over a directory of acquisitions, "
+                    "writing outputs next to each input file.")
+    parser.add_argument("inputs", nargs="+",
+        help="input files, directories or glob patterns (e.g. 'run1/**/*.tif')")
+    parser.add_argument("-p", "--pipeline", required=True,
+        help="YAML or JSON pipeline spec")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+        help="number of files processed at once (default: 1)")
+    parser.add_argument("-f", "--force", action="store_true",
+        help="reprocess files whose outputs are up to date")
+    parser.add_argument("-v", "--verbose", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_pipeline_spec(args.pipeline)
+        build_pipeline(spec)
+    except Exception as e:
+        parser.error(f"invalid pipeline spec {args.pipeline}: {e}")
+
+    paths = get_batch_inputs(args.inputs)
+
+    if len(paths) == 0:
+        parser.error("no input files found")
+
+    results = run_batch(paths, spec, n_jobs=args.jobs, force=args.force, verbose=args.verbose)
+
+    n_failed = len([result for result in results if result["status"] == "failed"])
+    n_skipped = len([result for result in results if result["status"] == "skipped"])
+
+    print(f"Processed {len(results) - n_failed - n_skipped} files, "
+          f"skipped {n_skipped} up to date, {n_failed} failed")
+
+    return 1 if n_failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+import traceback
+from dataclasses import replace
+
+from molseeq.funcs.utils_compute import _utils_compute
+from molseeq.funcs.undrift_utils import _undrift_utils
+from molseeq.funcs.picasso_detect import _picasso_detect_utils
+from molseeq.funcs.loc_utils import _loc_utils
+from molseeq.funcs.import_utils import _import_utils
+from molseeq.funcs.trace_compute_utils import _trace_compute_utils
+from molseeq.funcs.align_utils import _align_utils
+from molseeq.funcs.colocalize_utils import _utils_colocalize
+from molseeq.funcs.temporal_filtering import _utils_temporal_filtering
+from molseeq.funcs.session_utils import _session_utils
+from molseeq.funcs.lazy_array_utils import _lazy_array_utils
+from molseeq.funcs.executor_utils import _executor_utils
+from molseeq.funcs.transform_utils import _tranform_utils, read_transform_matrix
+from molseeq.funcs.export_traces_utils import _export_traces_utils
+from molseeq.funcs.plot_utils import _plot_utils
+from molseeq.funcs.shared_memory_utils import SharedStopFlag
+from molseeq.funcs.fit_backends import get_fit_backend
+from molseeq.funcs.localisation_table import LocalisationTable
+
+from molseeq.engine.params import (ImportParams, TransformParams, AlignParams, UndriftParams,
+                                   FilterParams, DetectParams, ColocalizeParams, TracesParams,
+                                   ExportTracesParams, ExportLocsParams)
+from molseeq.engine.parameter_gui import ParameterGUI
+
+TRACE_EXPORT_FUNCTIONS = {"JSON Dataset": "export_traces_json",
+                          "Excel": "export_traces_excel",
+                          "OriginLab": "export_traces_originlab",
+                          "Dat (.dat)": "export_traces_dat",
+                          "Text (.txt)": "export_traces_txt",
+                          "CSV (.csv)": "export_traces_csv",
+                          "Nero (.dat)": "export_traces_nero",
+                          "ebFRET SMD (.mat)": "export_traces_ebfret_smd"}
+
+
+class EngineProgress:
+
+    # stands in for the worker progress signal, forwards progress to a plain callback
+    def __init__(self, stage, callback=None):
+
+        self.stage = stage
+        self.callback = callback
+
+    def emit(self, progress):
+
+        if self.callback is not None:
+            self.callback(self.stage, progress)
+
+
+class MolseeqEngine(_import_utils, _undrift_utils, _picasso_detect_utils,
+    _trace_compute_utils, _align_utils, _loc_utils, _utils_colocalize,
+    _utils_temporal_filtering, _utils_compute, _session_utils,
+    _lazy_array_utils, _executor_utils, _tranform_utils,
+    _export_traces_utils, _plot_utils):
+
+    # runs the molSEEQ pipeline without a napari viewer, synchronously on the shared process pool.
+    # the engine reuses the widget's stage mixins, which read their settings from self.gui, so each
+    # stage writes its parameter dataclass into a ParameterGUI of read only controls before it runs
+
+    def __init__(self, verbose=False, progress_callback=None):
+
+        self.gui = ParameterGUI()
+        self.viewer = None
+
+        self.dataset_dict = {}
+        self.traces_dict = {}
+        self.traces_provenance = None
+        self.localisation_dict = {"bounding_boxes": {}, "localisations": {}}
+        self.metric_dict = {"spot_mean": "Mean", "spot_median": "Median", "spot_sum": "Sum", "spot_max": "Maximum",
+                            "spot_std": "std", "spot_photons": "Picasso Photons", }
+
+        self.background_dict = {"None":"None",
+                                "_local_bg": "Local Background",
+                                "_masked_local_bg": "Masked Local Background",
+                                "_global_bg": "Global Background",
+                                "_masked_global_bg": "Masked Global Background",
+                                "spot_lsp_bg": "LSP Background",
+                                }
+        self.active_dataset = None
+        self.active_channel = None
+        self.verbose = verbose
+        self.multiprocessing_active = False
+        self.transform_matrix = None
+        self.progress_callback = progress_callback
+
+        self.process_pool = None
+        self.stop_event = SharedStopFlag()
+
+        self.gpufit_available = get_fit_backend("gpufit").is_available()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def molseeq_notification(self, message):
+        print(message)
+
+    def update_ui(self, error=None, init=False):
+
+        self.stop_event.clear()
+        self.multiprocessing_active = init
+
+        if init is False:
+            self.release_unused_shared_images()
+
+        if error is not None:
+            print(error)
+
+    def update_active_image(self, *args, **kwargs):
+        pass
+
+    def draw_localisations(self, *args, **kwargs):
+        pass
+
+    def draw_bounding_boxes(self, *args, **kwargs):
+        pass
+
+    def get_progress(self, stage):
+
+        return EngineProgress(stage, self.progress_callback)
+
+    def get_dataset_list(self, dataset):
+
+        if dataset == "All Datasets":
+            dataset_list = list(self.dataset_dict.keys())
+        else:
+            dataset_list = [dataset]
+
+        return dataset_list
+
+    def reset(self):
+
+        # clears the data from the previous acquisition, the process pool stays warm
+        self.dataset_dict = {}
+        self.traces_dict = {}
+        self.traces_provenance = None
+        self.localisation_dict = {"bounding_boxes": {}, "localisations": {}}
+        self.transform_matrix = None
+
+        self.update_ui()
+
+    def stop(self):
+
+        self.stop_event.set()
+
+    def import_data(self, paths, params=None):
+
+        if params is None:
+            params = ImportParams()
+
+        if type(paths) == str:
+            paths = [paths]
+
+        self.gui.set_params(params)
+        self.update_ui(init=True)
+
+        self._molseeq_import_data(progress_callback=self.get_progress("import"),
+            paths=list(paths))
+
+        self.initialise_localisation_dict()
+        self.update_ui()
+
+        return self.dataset_dict
+
+    def apply_transform(self, transform_matrix, params=None):
+
+        if params is None:
+            params = TransformParams()
+
+        if type(transform_matrix) == str:
+            transform_matrix = read_transform_matrix(transform_matrix)
+
+        if transform_matrix is None:
+            self.molseeq_notification("No transform matrix loaded.")
+        else:
+            self.transform_matrix = transform_matrix
+
+            self.gui.set_params(params)
+            self.update_ui(init=True)
+
+            self._apply_transform_matrix(progress_callback=self.get_progress("transform"))
+
+            self.update_ui()
+
+    def align(self, params=None):
+
+        if params is None:
+            params = AlignParams()
+
+        if params.reference_dataset == "" and self.dataset_dict != {}:
+            params = replace(params, reference_dataset=list(self.dataset_dict.keys())[0])
+
+        self.gui.set_params(params)
+
+        align_dict, missing_fiducial_list, channel_mode = self.get_align_dict(params.reference_channel)
+
+        if len(missing_fiducial_list) > 0:
+            missing_fiducial_list = ", ".join(missing_fiducial_list)
+            self.molseeq_notification(f"Missing fitted {channel_mode} localisations for {missing_fiducial_list}")
+        else:
+            self.update_ui(init=True)
+            self._align_datasets(self.get_progress("align"), align_dict)
+            self.update_ui()
+
+    def undrift(self, params=None, segmentation=20):
+
+        if params is None:
+            params = UndriftParams()
+
+        self.gui.set_params(params)
+
+        undrift_dict = self.get_undrift_dict(self.get_dataset_list(params.dataset), params.channel)
+
+        if undrift_dict != {}:
+            self.update_ui(init=True)
+            self._undrift_images(self.get_progress("undrift"), undrift_dict, segmentation)
+            self.update_ui()
+
+    def temporal_filter(self, params=None):
+
+        if params is None:
+            params = FilterParams()
+
+        self.gui.set_params(params)
+        self.update_ui(init=True)
+
+        self._molseeq_temporal_filtering(progress_callback=self.get_progress("filter"))
+
+        self.update_ui()
+
+    def detect(self, params=None, detect=True, fit=True):
+
+        locs = []
+
+        try:
+
+            if params is None:
+                params = DetectParams()
+
+            self.gui.set_params(params)
+
+            dataset_list = self.get_dataset_list(params.dataset)
+            channel_list = [params.channel.lower()]
+
+            gpu_fit = self.gpufit_available and params.use_gpufit
+
+            stage_params = self.get_picasso_stage_params(detect, fit,
+                params.min_net_gradient, dataset_list, channel_list)
+
+            if detect and self.picasso_stage_is_current(stage_params, dataset_list, channel_list):
+
+                self.molseeq_notification("Localisations are up to date, skipping detection.")
+
+            elif params.min_net_gradient.isdigit() and params.channel != "":
+
+                self.update_ui(init=True)
+
+                locs, fitted = self._picasso_wrapper(self.get_progress("detect"),
+                    detect, fit, params.min_net_gradient, dataset_list=dataset_list,
+                    channel_list=channel_list, frame_index=None, gpu_fit=gpu_fit,
+                    stage_params=stage_params)
+
+                if isinstance(locs, LocalisationTable):
+                    locs = locs.to_records()
+
+        except:
+            print(traceback.format_exc())
+            self.update_ui()
+
+        return locs
+
+    def colocalize(self, params=None):
+
+        if params is None:
+            params = ColocalizeParams()
+
+        if params.dataset == "" and self.dataset_dict != {}:
+            params = replace(params, dataset=list(self.dataset_dict.keys())[0])
+
+        self.gui.set_params(params)
+
+        colo_locs = None
+
+        if params.channel1 == params.channel2:
+            self.molseeq_notification("Channels must be different for colocalisation")
+        else:
+            self.update_ui(init=True)
+
+            colo_locs = self._molseeq_colocalize_localisations()
+            self._molseeq_colocalize_localisations_result(colo_locs)
+
+            self.update_ui()
+
+        return colo_locs
+
+    def compute_traces(self, params=None):
+
+        if params is None:
+            params = TracesParams()
+
+        self.gui.set_params(params)
+
+        bbox_dict = self.localisation_dict["bounding_boxes"]
+
+        if len(bbox_dict.get("localisations", [])) == 0:
+            self.molseeq_notification("Bounding Boxes required for trace computation.")
+
+        elif self.traces_dict != {} and self.get_traces_provenance() == self.traces_provenance:
+            self.molseeq_notification("Traces are up to date, skipping trace computation.")
+
+        else:
+            self.update_ui(init=True)
+            self._molseeq_compute_traces(progress_callback=self.get_progress("traces"))
+            self.update_ui()
+
+        return self.traces_dict
+
+    def export_traces(self, params=None):
+
+        export_path = None
+
+        if params is None:
+            params = ExportTracesParams()
+
+        self.gui.set_params(params)
+
+        if params.mode not in TRACE_EXPORT_FUNCTIONS.keys():
+            self.molseeq_notification(f"Export mode {params.mode} not recognized.")
+
+        elif self.traces_dict != {}:
+
+            export_path, export_directory = self.get_export_traces_path(dialog=False)
+
+            export_function = getattr(self, TRACE_EXPORT_FUNCTIONS[params.mode])
+            export_function(progress_callback=self.get_progress("export_traces"),
+                export_path=export_path)
+
+        return export_path
+
+    def export_locs(self, params=None):
+
+        if params is None:
+            params = ExportLocsParams()
+
+        self.gui.set_params(params)
+
+        return super().export_locs(progress_callback=self.get_progress("export_locs"),
+            export_dataset=params.dataset, export_channel=params.channel)
+
+    def save_session(self, path, compress=True):
+
+        if path.endswith(".h5") == False:
+            path = path + ".h5"
+
+        self._save_session(progress_callback=self.get_progress("save_session"),
+            path=path, compress=compress)
+
+        return path
+
+    def load_session(self, path):
+
+        self._load_session(progress_callback=self.get_progress("load_session"), path=path)
+
+        return self.dataset_dict
+
+    def close(self):
+
+        self.close_shared_image_store()
+        self.shutdown_process_pool()
+        self.stop_event.close()
@@ -0,0 +1,90 @@
+from molseeq.engine.params import PIPELINE_PARAMS
+
+# gui options that only make sense with a napari viewer, fixed when running headless
+HEADLESS_GUI_VALUES = {"picasso_frame_mode": "All",
+                       "picasso_window_cropping": False,
+                       "picasso_minimise_ram": False,
+                       "molseeq_append": False,
+                       "molseeq_session_compress": True,
+                       # buttons the stages re-enable themselves when they finish
+                       "compute_traces": True}
+
+
+class ParameterControl:
+
+    # read only stand in for a gui input widget, backed by a parameter value
+
+    def __init__(self, value=""):
+
+        self.parameter_value = value
+
+    def currentText(self):
+
+        return str(self.parameter_value)
+
+    def text(self):
+
+        return str(self.parameter_value)
+
+    def isChecked(self):
+
+        return bool(self.parameter_value)
+
+    def value(self):
+
+        return self.parameter_value
+
+    def findText(self, text):
+
+        return -1
+
+    # display methods the pipeline calls on its widgets, there is nothing to update headless
+
+    def setEnabled(self, enabled):
+        pass
+
+    def blockSignals(self, block):
+        pass
+
+    def clear(self):
+        pass
+
+    def addItems(self, items):
+        pass
+
+    def setCurrentIndex(self, index):
+        pass
+
+
+class ParameterGUI:
+
+    # the gui controls read by the pipeline stage mixins (self.gui.*), filled from the stage
+    # parameter dataclasses. every stage parameter starts at its dataclass default, any other
+    # widget name is an error rather than a silently empty control
+
+    def __init__(self):
+
+        self.controls = {}
+
+        for params_class in PIPELINE_PARAMS.values():
+            self.set_params(params_class())
+
+        self.set_values(HEADLESS_GUI_VALUES)
+
+    def set_values(self, values):
+
+        for name, value in values.items():
+            self.controls[name] = ParameterControl(value)
+
+    def set_params(self, params):
+
+        self.set_values(params.get_gui_values())
+
+    def __getattr__(self, name):
+
+        controls = self.__dict__.get("controls", {})
+
+        if name not in controls.keys():
+            raise AttributeError(f"{name} is not a stage parameter or headless gui value")
+
+        return controls[name]
@@ -0,0 +1,219 @@
+from dataclasses import dataclass, fields, asdict
+from typing import ClassVar
+
+
+class _engine_params:
+
+    # maps each parameter to the widget that sets it in the molSEEQ gui
+    gui_fields: ClassVar[dict] = {}
+
+    @classmethod
+    def from_gui(cls, gui):
+
+        values = {}
+
+        for field in fields(cls):
+
+            control = getattr(gui, cls.gui_fields[field.name])
+
+            if field.type in [bool, "bool"]:
+                value = control.isChecked()
+            elif hasattr(control, "currentText"):
+                value = control.currentText()
+            else:
+                value = control.text()
+
+            values[field.name] = value
+
+        return cls(**values)
+
+    @classmethod
+    def from_dict(cls, params):
+
+        field_names = [field.name for field in fields(cls)]
+
+        unknown_params = [key for key in params.keys() if key not in field_names]
+
+        if len(unknown_params) > 0:
+            raise ValueError(f"Unknown {cls.__name__} parameters: {', '.join(unknown_params)}")
+
+        return cls(**params)
+
+    def to_dict(self):
+
+        return asdict(self)
+
+    def get_gui_values(self):
+
+        return {self.gui_fields[key]: value for key, value in asdict(self).items()}
+
+
+@dataclass
+class ImportParams(_engine_params):
+
+    import_mode: str = "Single Channel"
+    channel_layout: str = "Donor-Acceptor"
+    alex_first_frame: str = "Donor"
+    import_limit: str = "None"
+    frames: str = ""
+    crop: str = ""
+    concatenate: bool = False
+    memmap: bool = False
+    lazy: bool = False
+
+    gui_fields: ClassVar[dict] = {"import_mode": "molseeq_import_mode",
+                                  "channel_layout": "molseeq_channel_layout",
+                                  "alex_first_frame": "molseeq_alex_first_frame",
+                                  "import_limit": "molseeq_import_limt",
+                                  "frames": "molseeq_import_frames",
+                                  "crop": "molseeq_import_crop",
+                                  "concatenate": "molseeq_concatenate",
+                                  "memmap": "molseeq_import_memmap",
+                                  "lazy": "molseeq_import_lazy"}
+
+
+@dataclass
+class AlignParams(_engine_params):
+
+    reference_dataset: str = ""
+    reference_channel: str = "Donor Channels"
+
+    gui_fields: ClassVar[dict] = {"reference_dataset": "align_reference_dataset",
+                                  "reference_channel": "align_reference_channel"}
+
+
+@dataclass
+class UndriftParams(_engine_params):
+
+    dataset: str = "All Datasets"
+    channel: str = "Donor"
+
+    gui_fields: ClassVar[dict] = {"dataset": "undrift_dataset_selector",
+                                  "channel": "undrift_channel_selector"}
+
+
+@dataclass
+class TransformParams(_engine_params):
+
+    target: str = "Acceptor/DA/AA"
+
+    gui_fields: ClassVar[dict] = {"target": "tform_apply_target"}
+
+
+@dataclass
+class FilterParams(_engine_params):
+
+    datasets: str = "All Datasets"
+    channels: str = "All Channels"
+    filter_mode: str = "Temporal Median Filtering"
+    filter_size: str = "1"
+
+    gui_fields: ClassVar[dict] = {"datasets": "filtering_datasets",
+                                  "channels": "filtering_channels",
+                                  "filter_mode": "filtering_mode",
+                                  "filter_size": "filtering_filter_size"}
+
+
+@dataclass
+class DetectParams(_engine_params):
+
+    dataset: str = "All Datasets"
+    channel: str = "Donor"
+    detect_mode: str = "Localisations"
+    min_net_gradient: str = "1000"
+    box_size: str = "3"
+    roi_border_width: str = "5"
+    remove_overlapping: bool = True
+    use_gpufit: bool = False
+
+    gui_fields: ClassVar[dict] = {"dataset": "picasso_dataset",
+                                  "channel": "picasso_channel",
+                                  "detect_mode": "picasso_detect_mode",
+                                  "min_net_gradient": "picasso_min_net_gradient",
+                                  "box_size": "picasso_box_size",
+                                  "roi_border_width": "picasso_roi_border_width",
+                                  "remove_overlapping": "picasso_remove_overlapping",
+                                  "use_gpufit": "picasso_use_gpufit"}
+
+
+@dataclass
+class ColocalizeParams(_engine_params):
+
+    dataset: str = ""
+    channel1: str = "Donor"
+    channel2: str = "Acceptor"
+    max_dist: str = "0.1"
+    fiducials: bool = False
+    bounding_boxes: bool = True
+
+    gui_fields: ClassVar[dict] = {"dataset": "colo_dataset",
+                                  "channel1": "colo_channel1",
+                                  "channel2": "colo_channel2",
+                                  "max_dist": "colo_max_dist",
+                                  "fiducials": "colo_fiducials",
+                                  "bounding_boxes": "colo_bboxes"}
+
+
+@dataclass
+class TracesParams(_engine_params):
+
+    spot_size: str = "3"
+    spot_shape: str = "Square"
+    background_buffer: str = "1"
+    background_width: str = "3"
+    compute_global_background: bool = False
+    compute_picasso: bool = False
+
+    gui_fields: ClassVar[dict] = {"spot_size": "traces_spot_size",
+                                  "spot_shape": "traces_spot_shape",
+                                  "background_buffer": "traces_background_buffer",
+                                  "background_width": "traces_background_width",
+                                  "compute_global_background": "compute_global_background",
+                                  "compute_picasso": "compute_with_picasso"}
+
+
+@dataclass
+class ExportTracesParams(_engine_params):
+
+    mode: str = "JSON Dataset"
+    dataset: str = "All Datasets"
+    channel: str = "All Channels"
+    metric: str = "Mean"
+    background: str = "None"
+
+    gui_fields: ClassVar[dict] = {"mode": "traces_export_mode",
+                                  "dataset": "traces_export_dataset",
+                                  "channel": "traces_export_channel",
+                                  "metric": "traces_export_metric",
+                                  "background": "traces_export_background"}
+
+
+@dataclass
+class ExportLocsParams(_engine_params):
+
+    mode: str = "Picasso HDF5"
+    loc_type: str = "All"
+    dataset: str = "All Datasets"
+    channel: str = "All Channels"
+
+    gui_fields: ClassVar[dict] = {"mode": "locs_export_mode",
+                                  "loc_type": "locs_export_type",
+                                  "dataset": "locs_export_dataset",
+                                  "channel": "locs_export_channel"}
+
+
+PIPELINE_PARAMS = {"import": ImportParams,
+                   "transform": TransformParams,
+                   "align": AlignParams,
+                   "undrift": UndriftParams,
+                   "filter": FilterParams,
+                   "detect": DetectParams,
+                   "colocalize": ColocalizeParams,
+                   "traces": TracesParams,
+                   "export_traces": ExportTracesParams,
+                   "export_locs": ExportLocsParams}
+
+
+def params_from_gui(gui):
+
+    return {name: params_class.from_gui(gui) for name, params_class in PIPELINE_PARAMS.items()}
@@ -2,8 +2,8 @@ import traceback
 import numpy as np
 import cv2
 from functools import partial
-from molseeq.funcs.utils_compute import Worker
 from molseeq.funcs.transform_utils import transform_image
+from molseeq.funcs.lazy_array_utils import read_lazy_block
 from scipy.optimize import least_squares
 
 class _align_utils:
@@ -152,65 +152,87 @@ class _align_utils:
 
                             self.molseeq_notification(f"Aligning {dataset} {channel_name}...")
 
-                            img = channel_dict["data"].copy()
-
                             def transform_progress(progress):
                                 nonlocal iter
                                 iter += progress
                                 progress = int((iter / total_frames) * 100)
                                 progress_callback.emit(progress)
 
-                            img = transform_image(img, transform_matrix,
-                                transform_mode = transform_mode,
-                                progress_callback=transform_progress)
+                            if self.is_lazy_image(dataset, channel_name.lower()):
+
+                                img = self.get_writable_image(dataset, channel_name.lower())
+
+                                for start_index, end_index in self.get_lazy_frame_blocks([dataset], [channel_name.lower()]):
+                                    img_block = read_lazy_block(img, [start_index, end_index])
+                                    img[start_index:end_index] = transform_image(img_block, transform_matrix,
+                                        transform_mode = transform_mode,
+                                        progress_callback=transform_progress)
+
+                            else:
+
+                                img = channel_dict["data"].copy()
+
+                                img = transform_image(img, transform_matrix,
+                                    transform_mode = transform_mode,
+                                    progress_callback=transform_progress)
 
-                            self.dataset_dict[dataset][channel_name.lower()]["data"] = img.copy()
+                                self.dataset_dict[dataset][channel_name.lower()]["data"] = img.copy()
+
+                            self.record_image_stage(dataset, channel_name.lower(), "align",
+                                {"transform_matrix": np.asarray(transform_matrix).tolist(),
+                                 "transform_mode": transform_mode})
 
         except:
             print(traceback.format_exc())
             pass
 
 
-    def align_datasets(self):
+    def get_align_dict(self, align_channel):
 
-        try:
+        if "Donor Channels" in align_channel:
+            channel_mode = "Donor"
+            target_channels = ["donor", "dd", "ad"]
+        else:
+            channel_mode = "Acceptor"
+            target_channels = ["acceptor", "aa", "da"]
 
-            if self.dataset_dict != {}:
+        missing_fiducial_list = []
 
-                align_dataset = self.gui.align_reference_dataset.currentText()
-                align_channel = self.gui.align_reference_channel.currentText()
-
-                if "Donor Channels" in align_channel:
-                    channel_mode = "Donor"
-                    target_channels = ["donor", "dd", "ad"]
-                else:
-                    channel_mode = "Acceptor"
-                    target_channels = ["acceptor", "aa", "da"]
+        align_dict = {}
 
-                missing_fiducial_list = []
+        for dataset_name in self.dataset_dict.keys():
+            if dataset_name not in self.localisation_dict["localisations"].keys():
+                missing_fiducial_list.append(dataset_name)
+            else:
+                dataset_channels = list(self.dataset_dict[dataset_name].keys())
+                reference_channels = [channel.lower() for channel in dataset_channels if channel in target_channels]
 
-                align_dict = {}
-
-                for dataset_name in self.dataset_dict.keys():
-                    if dataset_name not in self.localisation_dict["localisations"].keys():
+                for channel in reference_channels:
+                    if channel not in self.localisation_dict["localisations"][dataset_name].keys():
                         missing_fiducial_list.append(dataset_name)
                     else:
-                        dataset_channels = list(self.dataset_dict[dataset_name].keys())
-                        reference_channels = [channel.lower() for channel in dataset_channels if channel in target_channels]
-
-                        for channel in reference_channels:
-                            if channel not in self.localisation_dict["localisations"][dataset_name].keys():
+                        localisation_dict = self.localisation_dict["localisations"][dataset_name][channel]
+                        if "fitted" not in localisation_dict.keys():
+                            missing_fiducial_list.append(dataset_name)
+                        else:
+                            if localisation_dict["fitted"] == False:
                                 missing_fiducial_list.append(dataset_name)
                             else:
-                                localisation_dict = self.localisation_dict["localisations"][dataset_name][channel]
-                                if "fitted" not in localisation_dict.keys():
-                                    missing_fiducial_list.append(dataset_name)
-                                else:
-                                    if localisation_dict["fitted"] == False:
-                                        missing_fiducial_list.append(dataset_name)
-                                    else:
-                                        align_dict[dataset_name] = localisation_dict["localisations"]
+                                align_dict[dataset_name] = localisation_dict["localisations"]
+
+        return align_dict, missing_fiducial_list, channel_mode
+
+    def align_datasets(self):
+
+        from molseeq.funcs.qt_worker import Worker
+
+        try:
+
+            if self.dataset_dict != {}:
+
+                align_channel = self.gui.align_reference_channel.currentText()
 
+                align_dict, missing_fiducial_list, channel_mode = self.get_align_dict(align_channel)
 
                 if len(missing_fiducial_list) > 0:
                     missing_fiducial_list = ", ".join(missing_fiducial_list)
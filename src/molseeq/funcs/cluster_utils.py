@@ -1,7 +1,7 @@
 from sklearn.cluster import DBSCAN
 import numpy as np
 import traceback
-from molseeq.funcs.utils_compute import Worker
+from molseeq.funcs.neighbour_utils import get_overlap_mask
 
 
 class _cluster_utils:
@@ -25,23 +25,8 @@ class _cluster_utils:
 
     def remove_overlapping_coords(self, coordinates, min_distance):
 
-        # Calculate all pairwise differences
-        diff = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
-
-        # Calculate squared distances
-        dist_squared = np.sum(diff ** 2, axis=-1)
-
-        # Check if the array is of integer type
-        if coordinates.dtype.kind in 'iu':
-            # Use the maximum integer value for the diagonal if the array is of integer type
-            max_int_value = np.iinfo(coordinates.dtype).max
-            np.fill_diagonal(dist_squared, max_int_value)
-        else:
-            # Use infinity for the diagonal if the array is of float type
-            np.fill_diagonal(dist_squared, np.inf)
-
         # Identify overlapping coordinates (distance less than X)
-        overlapping = np.any(dist_squared < min_distance ** 2, axis=1)
+        overlapping = get_overlap_mask(coordinates, min_distance)
 
         # Filter out overlapping coordinates
         filtered_coordinates = coordinates[~overlapping]
@@ -71,7 +56,8 @@ class _cluster_utils:
             cluster_dataset = np.vstack((locs.x, locs.y)).T
 
             # Applying DBSCAN
-            dbscan = DBSCAN(eps=eps, min_samples=min_samples, n_jobs=-1)
+            n_jobs = self.get_compute_budget("cluster")["workers"]
+            dbscan = DBSCAN(eps=eps, min_samples=min_samples, n_jobs=n_jobs)
             dbscan.fit(cluster_dataset)
 
             # Extracting labels
@@ -166,6 +152,8 @@ class _cluster_utils:
 
     def molseeq_cluster_localisations(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             dataset = self.gui.cluster_dataset.currentText()
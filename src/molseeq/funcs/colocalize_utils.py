@@ -1,7 +1,6 @@
 import traceback
 import numpy as np
 import cv2
-from molseeq.funcs.utils_compute import Worker
 
 
 class _utils_colocalize:
@@ -144,6 +143,8 @@ class _utils_colocalize:
 
     def molseeq_colocalize_localisations(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             dataset = self.gui.colo_dataset.currentText()
@@ -18,7 +18,7 @@ class _events_utils:
             if self.verbose:
                 print(f"Updating UI, init = {init}")
 
-            controls = ["molseeq_import",
+            controls = ["molseeq_import", "molseeq_save_session", "molseeq_load_session",
                         "picasso_detect", "picasso_fit", "picasso_detectfit",
                         "molseeq_compute_tform", "molseeq_apply_tform",
                         "picasso_undrift","molseeq_align_datasets",
@@ -65,6 +65,9 @@ class _events_utils:
                 self.stop_event.clear()
                 self.multiprocessing_active = False
 
+                # channel images replaced by the last operation no longer need their shared memory
+                self.release_unused_shared_images()
+
             if error is not None:
                 print(error)
 
@@ -682,11 +685,10 @@ class _events_utils:
 
             if hasattr(self, "traces_dict"):
                 if dataset_name in self.traces_dict.keys():
-                    for channel_name, channel_dict in self.traces_dict[dataset_name].items():
-                        for trace_index, trace_dict in channel_dict.items():
-                            if "gap_label" in trace_dict.keys():
-                                trace_dict["gap_label"] = gap_label
-                                trace_dict["sequence_label"] = sequence_label
+                    for channel_name, trace_store in self.traces_dict[dataset_name].items():
+                        if "gap_label" in trace_store.attributes.keys():
+                            trace_store.fill_attribute("gap_label", gap_label)
+                            trace_store.fill_attribute("sequence_label", sequence_label)
 
             self.update_overlay_text()
 
@@ -711,6 +713,8 @@ class _events_utils:
                     if dataset_name in self.traces_dict.keys():
                         self.traces_dict.pop(dataset_name)
 
+                self.release_unused_shared_images()
+
                 self.populate_dataset_combos()
                 self.update_channel_select_buttons()
                 self.update_active_image()
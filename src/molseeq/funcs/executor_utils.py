@@ -0,0 +1,416 @@
+import traceback
+import numpy as np
+import os
+import multiprocessing
+import concurrent.futures
+import time
+from collections import deque
+from threadpoolctl import threadpool_limits
+
+# rate at which the gui thread samples the progress of running compute jobs
+PROGRESS_INTERVAL = 0.1
+
+# cpu/memory limits shared by all compute operations, limits of None are set by the machine/container.
+# per operation limits (e.g. {"import": {"max_workers": 4}}) are set with set_compute_budget
+COMPUTE_BUDGET = {"cpu_fraction": 0.9,
+                  "max_workers": None,
+                  "memory_fraction": 0.5,
+                  "max_memory": None,
+                  "worker_threads": 1,
+                  "operations": {}}
+
+# jobs in flight per worker, so workers are not left idle while results are collected
+TASKS_PER_WORKER = 2
+
+# upper limit on the number of frames in a chunk of image data
+MAX_CHUNK_SIZE = 100
+
+WORKER_THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                           "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"]
+
+
+def warm_numba_kernels():
+
+    # compiles the numba kernels used by the compute jobs once per worker process
+    try:
+        from molseeq.funcs.temporal_filtering import image_temporal_filtering_jit
+
+        stop_flag = np.zeros(1, dtype=np.uint8)
+
+        for dtype in [np.uint16, np.float32]:
+            image = np.zeros((3, 2, 2), dtype=dtype)
+            image_temporal_filtering_jit(image, 1, "Median", stop_flag)
+    except:
+        pass
+
+    try:
+        from molseeq.funcs.gauss_fit import fit_gauss_2d_elliptic, fit_spots_mle_batch, initial_parameters_gpufit
+
+        spots = np.random.poisson(100, (2, 5, 5)).astype(np.float32)
+        fit_gauss_2d_elliptic(spots.reshape(2, 25), None, initial_parameters_gpufit(spots, 5))
+        fit_spots_mle_batch(spots)
+    except:
+        pass
+
+    try:
+        from molseeq.funcs.trace_compute_utils import compute_region_metrics
+
+        pixel_indices = np.arange(4, dtype=np.int64)
+        region_offsets = np.array([0, 4], dtype=np.int64)
+        metrics = np.zeros((1, 1, 5), dtype=np.float32)
+
+        for dtype in [np.uint16, np.float32]:
+            frames = np.zeros((1, 4), dtype=dtype)
+            compute_region_metrics(frames, pixel_indices, region_offsets, metrics)
+    except:
+        pass
+
+    try:
+        from picasso.localize import identify_frame
+
+        frame = np.random.poisson(100, (16, 16)).astype(np.float32)
+        identify_frame(frame, 1e6, 5, 0)
+    except:
+        pass
+
+
+def pin_worker_threads(n_threads=1):
+
+    # nested numba/BLAS thread pools oversubscribe the cpus shared by the process pool.
+    # BLAS/OpenMP libraries that are already loaded (numpy, scipy etc. are loaded before the worker
+    # initialiser runs) are limited with threadpoolctl, the environment only reaches libraries loaded later
+    for variable in WORKER_THREAD_VARIABLES:
+        os.environ[variable] = str(n_threads)
+
+    threadpool_limits(n_threads)
+
+    try:
+        import numba
+        numba.set_num_threads(max(1, min(n_threads, numba.config.NUMBA_NUM_THREADS)))
+    except:
+        pass
+
+
+def initialise_worker(n_threads=1):
+
+    try:
+        # hot modules are imported once per worker, rather than once per operation
+        import pandas
+        import scipy.ndimage
+        import cv2
+        import picasso.localize
+        import picasso.postprocess
+
+    except:
+        print(traceback.format_exc())
+        pass
+
+    try:
+        # after the imports, so the thread pools of the libraries they load are limited too
+        pin_worker_threads(n_threads)
+
+        warm_numba_kernels()
+
+    except:
+        print(traceback.format_exc())
+        pass
+
+
+def warm_worker():
+
+    return multiprocessing.current_process().pid
+
+
+def read_cgroup_file(path):
+
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except:
+        return None
+
+
+def get_cgroup_cpu_limit():
+
+    cpu_limit = None
+
+    # cgroup v2
+    cpu_max = read_cgroup_file("/sys/fs/cgroup/cpu.max")
+
+    if cpu_max is not None:
+        quota, period = cpu_max.split()[:2]
+        if quota != "max":
+            cpu_limit = int(quota) / int(period)
+
+    else:
+        # cgroup v1
+        quota = read_cgroup_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = read_cgroup_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+        if quota is not None and period is not None and int(quota) > 0:
+            cpu_limit = int(quota) / int(period)
+
+    return cpu_limit
+
+
+def get_cgroup_memory_limit():
+
+    memory_limit = None
+
+    for path in ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]:
+
+        limit = read_cgroup_file(path)
+
+        if limit is not None and limit.isdigit():
+            memory_limit = int(limit)
+            break
+
+    return memory_limit
+
+
+def get_available_cpus():
+
+    try:
+        n_cpus = len(os.sched_getaffinity(0))
+    except:
+        n_cpus = multiprocessing.cpu_count()
+
+    try:
+        cpu_limit = get_cgroup_cpu_limit()
+
+        if cpu_limit is not None:
+            n_cpus = min(n_cpus, max(1, int(np.ceil(cpu_limit))))
+
+    except:
+        print(traceback.format_exc())
+        pass
+
+    return n_cpus
+
+
+def get_available_memory():
+
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except:
+        # e.g. windows, assumes a modest workstation
+        memory = 8 * 1024 ** 3
+
+    memory_limit = get_cgroup_memory_limit()
+
+    # unlimited cgroups report a very large number
+    if memory_limit is not None and memory_limit < memory:
+        memory = memory_limit
+
+    return memory
+
+
+def set_compute_budget(operation=None, **budget):
+
+    if operation is None:
+        COMPUTE_BUDGET.update(budget)
+    else:
+        COMPUTE_BUDGET["operations"].setdefault(operation, {}).update(budget)
+
+
+def get_pool_size():
+
+    n_workers = int(get_available_cpus() * COMPUTE_BUDGET["cpu_fraction"])
+
+    if COMPUTE_BUDGET["max_workers"] is not None:
+        n_workers = min(n_workers, COMPUTE_BUDGET["max_workers"])
+
+    return max(1, n_workers)
+
+
+def get_compute_budget(operation=None):
+
+    n_workers = get_pool_size()
+    memory = int(get_available_memory() * COMPUTE_BUDGET["memory_fraction"])
+
+    if COMPUTE_BUDGET["max_memory"] is not None:
+        memory = min(memory, COMPUTE_BUDGET["max_memory"])
+
+    operation_budget = COMPUTE_BUDGET["operations"].get(operation, {})
+
+    if operation_budget.get("max_workers") is not None:
+        n_workers = max(1, min(n_workers, operation_budget["max_workers"]))
+    if operation_budget.get("max_memory") is not None:
+        memory = min(memory, operation_budget["max_memory"])
+
+    return {"workers": n_workers, "memory": memory}
+
+
+def create_process_pool(n_workers=None):
+
+    if n_workers is None:
+        n_workers = get_pool_size()
+
+    return concurrent.futures.ProcessPoolExecutor(max_workers=n_workers,
+        initializer=initialise_worker, initargs=(COMPUTE_BUDGET["worker_threads"],))
+
+
+class _executor_utils:
+
+    def get_process_pool(self):
+
+        process_pool = getattr(self, "process_pool", None)
+
+        # a pool with a crashed worker cannot accept new jobs, so it is replaced
+        if process_pool is not None and getattr(process_pool, "_broken", False):
+
+            if self.verbose:
+                print("Process pool is broken, creating a new pool")
+
+            try:
+                process_pool.shutdown(wait=False, cancel_futures=True)
+            except:
+                pass
+
+            process_pool = None
+
+        if process_pool is None:
+
+            self.process_pool_size = get_pool_size()
+            process_pool = create_process_pool(self.process_pool_size)
+            self.process_pool = process_pool
+
+        return process_pool
+
+    def get_process_pool_size(self):
+
+        self.get_process_pool()
+
+        return self.process_pool_size
+
+    def get_compute_budget(self, operation=None):
+
+        budget = get_compute_budget(operation)
+
+        # operations cannot use more workers than the shared pool has
+        budget["workers"] = max(1, min(budget["workers"], self.get_process_pool_size()))
+
+        return budget
+
+    def get_chunk_size(self, frame_bytes, operation=None, working_set=1,
+            max_chunk_size=MAX_CHUNK_SIZE):
+
+        budget = self.get_compute_budget(operation)
+
+        # every job in flight holds one chunk, times its working set (copies, intermediates etc.)
+        task_bytes = budget["memory"] / (budget["workers"] * TASKS_PER_WORKER)
+        chunk_size = int(task_bytes // max(1, frame_bytes * working_set))
+
+        return max(1, min(chunk_size, max_chunk_size))
+
+    def schedule_jobs(self, executor, jobs, job_bytes=None, operation=None,
+            prepare_job=None, release_job=None, callback=None):
+
+        # jobs are (function, *args) tuples, completed jobs are yielded as (job_index, future)
+
+        budget = self.get_compute_budget(operation)
+
+        max_tasks = budget["workers"] * TASKS_PER_WORKER
+        max_bytes = budget["memory"]
+
+        pending_jobs = deque(range(len(jobs)))
+        running_jobs = {}
+        running_bytes = 0
+
+        while len(pending_jobs) > 0 or len(running_jobs) > 0:
+
+            # back pressure, jobs are only submitted while the memory and task budget allows
+            while len(pending_jobs) > 0 and len(running_jobs) < max_tasks:
+
+                job_index = pending_jobs[0]
+
+                if job_bytes is not None:
+                    n_bytes = job_bytes[job_index]
+                else:
+                    n_bytes = 0
+
+                # a job that exceeds the budget on its own still runs, but by itself
+                if len(running_jobs) > 0 and running_bytes + n_bytes > max_bytes:
+                    break
+
+                pending_jobs.popleft()
+
+                if self.stop_event.is_set():
+                    continue
+
+                job = jobs[job_index]
+
+                if prepare_job is not None:
+                    job = prepare_job(job_index, job)
+
+                future = executor.submit(*job)
+
+                running_jobs[future] = [job_index, n_bytes]
+                running_bytes += n_bytes
+
+            if callback is not None:
+                callback()
+
+            if len(running_jobs) == 0:
+                continue
+
+            done, _ = concurrent.futures.wait(list(running_jobs.keys()),
+                timeout=PROGRESS_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+
+                job_index, n_bytes = running_jobs.pop(future)
+                running_bytes -= n_bytes
+
+                if release_job is not None:
+                    release_job(job_index)
+
+                yield job_index, future
+
+    def emit_counter_progress(self, progress_counter, total,
+            progress_callback=None, progress_range=(0, 100)):
+
+        start, end = progress_range
+
+        if progress_callback is not None and total > 0:
+            progress = min(1, progress_counter.total() / total)
+            progress_callback.emit(int(start + (progress * (end - start))))
+
+    def monitor_progress(self, futures, progress_counter, total,
+            progress_callback=None, progress_range=(0, 100), callback=None):
+
+        while any(not future.done() for future in futures):
+
+            self.emit_counter_progress(progress_counter, total,
+                progress_callback, progress_range)
+
+            if callback is not None:
+                callback()
+
+            time.sleep(PROGRESS_INTERVAL)
+
+    def warm_process_pool(self):
+
+        try:
+
+            executor = self.get_process_pool()
+
+            # starts every worker (and runs its initialiser) in the background
+            for _ in range(self.process_pool_size):
+                executor.submit(warm_worker)
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def shutdown_process_pool(self):
+
+        try:
+
+            if getattr(self, "process_pool", None) is not None:
+                self.process_pool.shutdown(wait=False, cancel_futures=True)
+                self.process_pool = None
+
+        except:
+            print(traceback.format_exc())
+            pass
@@ -3,8 +3,6 @@ import traceback
 import tifffile
 import os
 import psutil
-from qtpy.QtWidgets import QFileDialog
-from molseeq.funcs.utils_compute import Worker
 from functools import partial
 
 class _export_images_utils:
@@ -114,6 +112,8 @@ class _export_images_utils:
                     export_path = os.path.join(export_dir,file_name,".tif")
 
             if dialog == True:
+                from qtpy.QtWidgets import QFileDialog
+
                 export_path = QFileDialog.getSaveFileName(self, 'Save ALEX data', export_path, 'Text files (*.tif)')[0]
 
             export_path = os.path.normpath(export_path)
@@ -233,6 +233,8 @@ class _export_images_utils:
 
     def export_data(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             if self.dataset_dict != {}:
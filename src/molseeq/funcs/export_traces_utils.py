@@ -1,7 +1,5 @@
 import traceback
 import os
-from qtpy.QtWidgets import QFileDialog
-from molseeq.funcs.utils_compute import Worker
 from functools import partial
 import numpy as np
 import json
@@ -64,6 +62,8 @@ class _export_traces_utils:
             export_path = os.path.normpath(export_path)
 
             if dialog:
+                from qtpy.QtWidgets import QFileDialog
+
                 export_path = QFileDialog.getSaveFileName(self, "Save File", export_path, "All Files (*)")[0]
 
             export_directory = os.path.dirname(export_path)
@@ -296,7 +296,7 @@ class _export_traces_utils:
             if dataset in self.traces_dict:
                 for channel in channel_list:
                     if channel in self.traces_dict[dataset]:
-                        n_traces += len(self.traces_dict[dataset][channel].copy())
+                        n_traces += len(self.traces_dict[dataset][channel])
 
         gap_label_dict = {}
         sequence_label_dict = {}
@@ -315,9 +315,9 @@ class _export_traces_utils:
                 if dataset not in spot_locs_dict.keys():
                     spot_locs_dict[dataset] = {}
 
-                traces_dict = self.traces_dict[dataset][channel_name]
+                trace_store = self.traces_dict[dataset][channel_name]
 
-                for trace_index, trace_dict in traces_dict.items():
+                for trace_index in trace_store.keys():
 
                     if trace_index not in spot_locs_dict[dataset].keys():
                         spot_locs_dict[dataset][trace_index] = {}
@@ -354,12 +354,20 @@ class _export_traces_utils:
 
                 if channel in self.traces_dict[dataset].keys():
 
-                    channel_dict = self.traces_dict[dataset][channel].copy()
+                    trace_store = self.traces_dict[dataset][channel]
 
                     if json_dict["data"][dataset] == []:
                         json_dict["data"][dataset] = [{} for _ in range(n_traces)]
 
-                    for trace_index, trace_dict in channel_dict.items():
+                    if trace_store.has_metric(metric_key):
+                        if "efficiency" not in channel and background_mode != "None":
+                            channel_data = trace_store.get_values(metric_key, background_metric_key)
+                        else:
+                            channel_data = trace_store.get_values(metric_key)
+                    else:
+                        channel_data = None
+
+                    for position, trace_index in enumerate(trace_store.keys()):
 
                         if trace_index in spot_locs_dict[dataset].keys():
                             spot_loc = spot_locs_dict[dataset][trace_index]
@@ -378,14 +386,9 @@ class _export_traces_utils:
                         if channel_name not in json_dict["data"][dataset][trace_index]:
                             json_dict["data"][dataset][trace_index][channel_name] = []
 
-                        if metric_key in trace_dict.keys():
-                            data = trace_dict[metric_key].copy()
+                        if channel_data is not None:
 
-                            if "efficiency" not in channel and background_mode != "None":
-                                background = np.array(trace_dict[background_metric_key].copy())
-                                data = data - background
-
-                            data = np.array(data).astype(float).tolist()
+                            data = channel_data[position].astype(float).tolist()
 
                             json_dict["data"][dataset][trace_index][channel_name] = data
                             json_dict["data"][dataset][trace_index]["gap_label"] = gap_label
@@ -460,11 +463,23 @@ class _export_traces_utils:
                             background_metric_key, progress_callback=None,
                             clip_data=True)
 
+                channel_data = {}
+
+                for channel in channel_list:
+
+                    trace_store = self.traces_dict[dataset][channel]
+
+                    if "efficiency" not in channel and background_mode != "None":
+                        channel_data[channel] = trace_store.get_values(metric_key, background_metric_key)
+                    else:
+                        channel_data[channel] = trace_store.get_values(metric_key)
+
                 for trace_index in range(n_traces):
                     for channel in channel_list:
 
-                        if trace_index in self.traces_dict[dataset][channel].keys():
-                            trace_dict = self.traces_dict[dataset][channel][trace_index].copy()
+                        trace_store = self.traces_dict[dataset][channel]
+
+                        if trace_index in trace_store:
 
                             if channel.lower() in ["dd", "da", "ad", "aa"]:
                                 channel_name = channel.upper()
@@ -478,11 +493,7 @@ class _export_traces_utils:
                             if dataset not in export_dict.keys():
                                 export_dict[dataset] = []
 
-                            data = np.array(trace_dict[metric_key].copy())
-
-                            if "efficiency" not in channel and background_mode != "None":
-                                background = np.array(trace_dict[background_metric_key].copy())
-                                data = data - background
+                            data = channel_data[channel][trace_store.spot_positions[trace_index]]
 
                             data = data.astype(float).tolist()
 
@@ -515,6 +526,8 @@ class _export_traces_utils:
 
     def export_traces(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             self.gui.molseeq_export_traces.setEnabled(False)
@@ -687,20 +700,28 @@ class _export_traces_utils:
                 export_channel = list(self.traces_dict[dataset].keys())[0]
                 file_path = self.dataset_dict[dataset_name][export_channel.lower()]["path"]
 
+                channel_data = {}
+
+                for channel in channel_list:
+
+                    trace_store = self.traces_dict[dataset][channel]
+
+                    if "efficiency" not in channel and background_mode != "None":
+                        channel_data[channel] = trace_store.get_values(metric_key, background_metric_key)
+                    else:
+                        channel_data[channel] = trace_store.get_values(metric_key)
+
                 for trace_index in range(n_traces):
 
                     smd_values = []
 
                     for channel in channel_list:
 
-                        if trace_index in self.traces_dict[dataset][channel].keys():
-                            trace_dict = self.traces_dict[dataset][channel][trace_index].copy()
+                        trace_store = self.traces_dict[dataset][channel]
 
-                            data = np.array(trace_dict[metric_key].copy())
+                        if trace_index in trace_store:
 
-                            if "efficiency" not in channel and background_mode != "None":
-                                background = np.array(trace_dict[background_metric_key].copy())
-                                data = data - background
+                            data = channel_data[channel][trace_store.spot_positions[trace_index]]
 
                             smd_values.append(data)
 
@@ -0,0 +1,137 @@
+import traceback
+
+from molseeq.funcs.gauss_fit import fit_gauss_2d_elliptic
+
+# model/estimator ids used by pygpufit, so backends can be called without pygpufit installed
+GAUSS_2D_ELLIPTIC = 2
+ESTIMATOR_LSE = 0
+ESTIMATOR_MLE = 1
+
+
+class GpufitBackend:
+
+    name = "gpufit"
+    device = "GPU"
+
+    def get_status(self):
+
+        # returns (available, reason)
+        try:
+            from pygpufit import gpufit as gf
+        except:
+            return False, "missing package, install pygpufit package into napari-molseeq root directory"
+
+        if not gf.cuda_available():
+            return False, "missing CUDA"
+
+        runtime_version, driver_version = gf.get_cuda_version()
+
+        runtime_version = ".".join([str(v) for v in list(runtime_version)])
+        driver_version = ".".join([str(v) for v in list(driver_version)])
+
+        if runtime_version != driver_version:
+            return False, f"CUDA version mismatch. Runtime: {runtime_version}, Driver: {driver_version}"
+
+        return True, ""
+
+    def is_available(self):
+
+        try:
+            available, reason = self.get_status()
+        except:
+            available = False
+
+        return available
+
+    def fit(self, data, weights, model_id, initial_parameters, tolerance=1e-4,
+            max_number_iterations=25, parameters_to_fit=None, estimator_id=ESTIMATOR_LSE,
+            n_threads=None):
+
+        from pygpufit import gpufit as gf
+
+        return gf.fit(data, weights, model_id, initial_parameters,
+            tolerance=tolerance, max_number_iterations=max_number_iterations,
+            parameters_to_fit=parameters_to_fit, estimator_id=estimator_id)
+
+
+class NumbaBackend:
+
+    # cpu implementation of gf.fit for GAUSS_2D_ELLIPTIC, fits run in parallel numba threads
+
+    name = "numba"
+    device = "CPU"
+
+    def get_status(self):
+
+        return True, ""
+
+    def is_available(self):
+
+        return True
+
+    def fit(self, data, weights, model_id, initial_parameters, tolerance=1e-4,
+            max_number_iterations=25, parameters_to_fit=None, estimator_id=ESTIMATOR_LSE,
+            n_threads=None):
+
+        if model_id != GAUSS_2D_ELLIPTIC:
+            raise ValueError(f"{self.name} fitting backend only supports GAUSS_2D_ELLIPTIC (model_id {GAUSS_2D_ELLIPTIC})")
+
+        import numba
+
+        # numba thread counts are per calling thread, so the limit does not leak into other jobs
+        previous_threads = numba.get_num_threads()
+
+        if n_threads is not None:
+            numba.set_num_threads(max(1, min(n_threads, numba.config.NUMBA_NUM_THREADS)))
+
+        try:
+            result = fit_gauss_2d_elliptic(data, weights, initial_parameters,
+                tolerance=tolerance, max_number_iterations=max_number_iterations,
+                parameters_to_fit=parameters_to_fit, estimator_id=estimator_id)
+        finally:
+            numba.set_num_threads(previous_threads)
+
+        return result
+
+
+# fitting backends, fastest first
+FIT_BACKENDS = {"gpufit": GpufitBackend(),
+                "numba": NumbaBackend()}
+
+
+def register_fit_backend(backend, fastest=False):
+
+    # backends implement get_status, is_available and fit (with gf.fit arguments and results)
+    global FIT_BACKENDS
+
+    if fastest:
+        backends = {backend.name: backend}
+        backends.update({name: value for name, value in FIT_BACKENDS.items() if name != backend.name})
+        FIT_BACKENDS = backends
+    else:
+        FIT_BACKENDS[backend.name] = backend
+
+
+def get_fit_backend(name=None, use_gpu=True):
+
+    # returns the named backend, or the fastest available backend
+    if name is not None:
+        if name not in FIT_BACKENDS.keys():
+            raise ValueError(f"Unknown fitting backend {name}, available backends: {', '.join(FIT_BACKENDS.keys())}")
+        return FIT_BACKENDS[name]
+
+    fit_backend = None
+
+    for backend in FIT_BACKENDS.values():
+
+        if use_gpu == False and backend.device == "GPU":
+            continue
+
+        try:
+            if backend.is_available():
+                fit_backend = backend
+                break
+        except:
+            print(traceback.format_exc())
+
+    return fit_backend
@@ -0,0 +1,564 @@
+import numpy as np
+import math
+import time
+from numba import jit, prange
+
+# parameter layouts follow picasso, so batch fits are drop in replacements for gaussmle
+# mle: [y, x, photons, bg, sy, sx], positions in spot pixel coordinates (gaussmle, method "sigma" fits one
+#      symmetric width with sy = sx, method "sigmaxy" fits sx and sy independently)
+
+N_PARAMETERS = 6
+
+SQRT_2PI = math.sqrt(2.0 * math.pi)
+
+# newton step scaling and step limits of the mle fit, [x, y, photons, bg, sx, sy] (Smith et al. 2010)
+MLE_GAMMA = np.array([1.0, 1.0, 0.5, 1.0, 1.0, 1.0])
+MLE_MAX_JUMP = np.array([1.0, 1.0, 100.0, 2.0, 0.1, 0.1])
+
+# mle results in gaussmle order, y before x
+MLE_ORDER = np.array([1, 0, 2, 3, 5, 4])
+
+MLE_METHODS = ["sigma", "sigmaxy"]
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def solve_linear_system(A, b, x):
+
+    # gaussian elimination with partial pivoting, returns False for singular systems
+    n = b.shape[0]
+    M = A.copy()
+    v = b.copy()
+
+    for col in range(n):
+
+        pivot = col
+        for row in range(col + 1, n):
+            if abs(M[row, col]) > abs(M[pivot, col]):
+                pivot = row
+
+        if abs(M[pivot, col]) < 1e-12:
+            return False
+
+        if pivot != col:
+            for k in range(n):
+                M[col, k], M[pivot, k] = M[pivot, k], M[col, k]
+            v[col], v[pivot] = v[pivot], v[col]
+
+        for row in range(col + 1, n):
+            factor = M[row, col] / M[col, col]
+            for k in range(col, n):
+                M[row, k] -= factor * M[col, k]
+            v[row] -= factor * v[col]
+
+    for row in range(n - 1, -1, -1):
+        value = v[row]
+        for k in range(row + 1, n):
+            value -= M[row, k] * x[k]
+        x[row] = value / M[row, row]
+
+    return True
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def inverse_diagonal(M, diagonal):
+
+    n = M.shape[0]
+    unit = np.zeros(n)
+    column = np.zeros(n)
+
+    for i in range(n):
+
+        unit[:] = 0.0
+        unit[i] = 1.0
+
+        if solve_linear_system(M, unit, column):
+            diagonal[i] = column[i]
+        else:
+            diagonal[i] = np.nan
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def initial_spot_parameters(spot, theta):
+
+    # centre of mass, photons and second moment widths above the spot minimum
+    size = spot.shape[0]
+    bg = spot.min()
+
+    total = 0.0
+    cx = 0.0
+    cy = 0.0
+
+    for i in range(size):
+        for j in range(size):
+            value = spot[i, j] - bg
+            total += value
+            cx += value * j
+            cy += value * i
+
+    if total > 0:
+        cx /= total
+        cy /= total
+    else:
+        total = 1.0
+        cx = (size - 1) / 2
+        cy = (size - 1) / 2
+
+    sx = 0.0
+    sy = 0.0
+
+    for i in range(size):
+        for j in range(size):
+            value = spot[i, j] - bg
+            sx += value * (j - cx) ** 2
+            sy += value * (i - cy) ** 2
+
+    sx = math.sqrt(max(sx / total, 0.0))
+    sy = math.sqrt(max(sy / total, 0.0))
+
+    theta[0] = cx
+    theta[1] = cy
+    theta[2] = max(1.0, total)
+    theta[3] = bg
+    theta[4] = min(max(sx, 0.5), size / 2)
+    theta[5] = min(max(sy, 0.5), size / 2)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def poisson_statistics(data, model, jacobian, crlb, n_parameters=N_PARAMETERS):
+
+    # log likelihood ratio and cramer rao lower bounds of a poisson noise model, for the first n_parameters
+    n_pixels = data.shape[0]
+    fisher = np.zeros((n_parameters, n_parameters))
+    likelihood = 0.0
+
+    for k in range(n_pixels):
+
+        value = max(model[k], 1e-3)
+
+        for a in range(n_parameters):
+            for b in range(a, n_parameters):
+                fisher[a, b] += jacobian[k, a] * jacobian[k, b] / value
+
+        if data[k] > 0:
+            likelihood += data[k] * math.log(value) - value - data[k] * math.log(data[k]) + data[k]
+        else:
+            likelihood -= value
+
+    for a in range(n_parameters):
+        for b in range(a):
+            fisher[a, b] = fisher[b, a]
+
+    inverse_diagonal(fisher, crlb[:n_parameters])
+
+    return likelihood
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def integrated_gaussian(position, sigma, pixel):
+
+    return 0.5 * (math.erf((pixel - position + 0.5) / (math.sqrt(2.0) * sigma))
+                  - math.erf((pixel - position - 0.5) / (math.sqrt(2.0) * sigma)))
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def mle_model(theta, size, data, model, jacobian, numerator, denominator, symmetric):
+
+    # pixel integrated gaussian, with first/second derivatives for the newton update. symmetric models
+    # have one width (theta[4]), its derivatives are the sum of the x and y width derivatives
+    x, y, photons, bg, sx, sy = theta[0], theta[1], theta[2], theta[3], theta[4], theta[5]
+
+    if symmetric:
+        sy = sx
+
+    numerator[:] = 0.0
+    denominator[:] = 0.0
+
+    d2 = np.zeros(N_PARAMETERS)
+
+    for i in range(size):
+
+        psf_y = integrated_gaussian(y, sy, i)
+        ay = math.exp(-0.5 * ((i + 0.5 - y) / sy) ** 2)
+        by = math.exp(-0.5 * ((i - 0.5 - y) / sy) ** 2)
+
+        for j in range(size):
+
+            psf_x = integrated_gaussian(x, sx, j)
+            ax = math.exp(-0.5 * ((j + 0.5 - x) / sx) ** 2)
+            bx = math.exp(-0.5 * ((j - 0.5 - x) / sx) ** 2)
+
+            k = i * size + j
+
+            jacobian[k, 0] = -photons / SQRT_2PI / sx * (ax - bx) * psf_y
+            d2[0] = -photons / SQRT_2PI / sx ** 3 * ((j + 0.5 - x) * ax - (j - 0.5 - x) * bx) * psf_y
+
+            jacobian[k, 1] = -photons / SQRT_2PI / sy * (ay - by) * psf_x
+            d2[1] = -photons / SQRT_2PI / sy ** 3 * ((i + 0.5 - y) * ay - (i - 0.5 - y) * by) * psf_x
+
+            jacobian[k, 2] = psf_x * psf_y
+            d2[2] = 0.0
+
+            jacobian[k, 3] = 1.0
+            d2[3] = 0.0
+
+            jacobian[k, 4] = -photons / SQRT_2PI / sx ** 2 * (ax * (j - x + 0.5) - bx * (j - x - 0.5)) * psf_y
+            d2[4] = (-2.0 / sx * jacobian[k, 4] - photons / SQRT_2PI / sx ** 5
+                     * (ax * (j - x + 0.5) ** 3 - bx * (j - x - 0.5) ** 3) * psf_y)
+
+            jacobian[k, 5] = -photons / SQRT_2PI / sy ** 2 * (ay * (i - y + 0.5) - by * (i - y - 0.5)) * psf_x
+            d2[5] = (-2.0 / sy * jacobian[k, 5] - photons / SQRT_2PI / sy ** 5
+                     * (ay * (i - y + 0.5) ** 3 - by * (i - y - 0.5) ** 3) * psf_x)
+
+            if symmetric:
+                jacobian[k, 4] += jacobian[k, 5]
+                d2[4] += d2[5]
+                jacobian[k, 5] = 0.0
+                d2[5] = 0.0
+
+            model[k] = photons * psf_x * psf_y + bg
+
+            cf = 0.0
+            df = 0.0
+
+            if model[k] > 1e-3:
+                cf = min(data[k] / model[k] - 1, 1e4)
+                df = min(data[k] / model[k] ** 2, 1e4)
+
+            for a in range(N_PARAMETERS):
+                numerator[a] += jacobian[k, a] * cf
+                denominator[a] += d2[a] * cf - jacobian[k, a] ** 2 * df
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def fit_spot_mle(spot, theta, crlb, eps, max_it, symmetric):
+
+    # maximum likelihood fit of a pixel integrated gaussian, with one symmetric width (gaussmle "sigma")
+    # or free x/y widths (gaussmle "sigmaxy")
+    size = spot.shape[0]
+    n_parameters = N_PARAMETERS - 1 if symmetric else N_PARAMETERS
+    n_pixels = size * size
+
+    data = np.empty(n_pixels)
+    for i in range(size):
+        for j in range(size):
+            data[i * size + j] = spot[i, j]
+
+    fit_theta = np.empty(N_PARAMETERS)
+    fit_crlb = np.empty(N_PARAMETERS)
+    previous = np.empty(N_PARAMETERS)
+
+    initial_spot_parameters(spot, fit_theta)
+    fit_theta[3] = max(fit_theta[3], 0.01)
+
+    if symmetric:
+        fit_theta[4] = 0.5 * (fit_theta[4] + fit_theta[5])
+        fit_theta[5] = fit_theta[4]
+
+    model = np.empty(n_pixels)
+    jacobian = np.empty((n_pixels, N_PARAMETERS))
+    numerator = np.zeros(N_PARAMETERS)
+    denominator = np.zeros(N_PARAMETERS)
+
+    iterations = 0
+
+    for iteration in range(max_it):
+
+        iterations = iteration + 1
+
+        mle_model(fit_theta, size, data, model, jacobian, numerator, denominator, symmetric)
+
+        previous[:] = fit_theta
+
+        for a in range(n_parameters):
+            if denominator[a] != 0:
+                update = min(max(numerator[a] / denominator[a], -MLE_MAX_JUMP[a]), MLE_MAX_JUMP[a])
+                fit_theta[a] -= MLE_GAMMA[a] * update
+
+        fit_theta[2] = max(fit_theta[2], 1.0)
+        fit_theta[3] = max(fit_theta[3], 0.01)
+        fit_theta[4] = min(max(fit_theta[4], 0.5), size / 2)
+        fit_theta[5] = min(max(fit_theta[5], 0.5), size / 2)
+
+        if symmetric:
+            fit_theta[5] = fit_theta[4]
+
+        converged = True
+        for a in range(N_PARAMETERS):
+            if abs(fit_theta[a] - previous[a]) > eps * max(abs(previous[a]), 1e-6):
+                converged = False
+
+        if converged:
+            break
+
+    mle_model(fit_theta, size, data, model, jacobian, numerator, denominator, symmetric)
+    likelihood = poisson_statistics(data, model, jacobian, fit_crlb, n_parameters)
+
+    if symmetric:
+        fit_crlb[5] = fit_crlb[4]
+
+    for a in range(N_PARAMETERS):
+        theta[a] = fit_theta[MLE_ORDER[a]]
+        crlb[a] = fit_crlb[MLE_ORDER[a]]
+
+    return likelihood, iterations
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def fit_spots_mle_kernel(spots, eps, max_it, symmetric, theta, crlbs, likelihoods, iterations):
+
+    for n in prange(spots.shape[0]):
+        likelihoods[n], iterations[n] = fit_spot_mle(spots[n], theta[n], crlbs[n], eps, max_it, symmetric)
+
+
+def create_fit_arrays(n_spots):
+
+    theta = np.full((n_spots, N_PARAMETERS), np.nan, dtype=np.float64)
+    crlbs = np.full((n_spots, N_PARAMETERS), np.nan, dtype=np.float64)
+    likelihoods = np.full(n_spots, np.nan, dtype=np.float64)
+    iterations = np.zeros(n_spots, dtype=np.int32)
+
+    return theta, crlbs, likelihoods, iterations
+
+
+def get_fit_results(theta, crlbs, likelihoods, iterations):
+
+    # diverged fits are returned as nan
+    failed = ~np.isfinite(theta).all(axis=1)
+    theta[failed] = np.nan
+
+    return theta.astype(np.float32), crlbs.astype(np.float32), likelihoods.astype(np.float32), iterations
+
+
+def fit_spots_mle_batch(spots, eps=1e-3, max_it=1000, method="sigma"):
+
+    if method not in MLE_METHODS:
+        raise ValueError(f"Unknown mle fit method {method}, available methods: {', '.join(MLE_METHODS)}")
+
+    spots = np.ascontiguousarray(spots, dtype=np.float64)
+
+    theta, crlbs, likelihoods, iterations = create_fit_arrays(len(spots))
+
+    if len(spots) > 0:
+        fit_spots_mle_kernel(spots, eps, max_it, method == "sigma", theta, crlbs, likelihoods, iterations)
+
+    return get_fit_results(theta, crlbs, likelihoods, iterations)
+
+
+# gpufit compatible fitting, GAUSS_2D_ELLIPTIC: [amplitude, x0, y0, sx, sy, offset],
+# data points in row major order (x = point % size, y = point // size)
+
+GPUFIT_STATES = {"converged": 0, "max_iteration": 1, "singular_hessian": 2,
+                 "neg_curvature_mle": 3, "gpu_not_ready": 4}
+
+GPUFIT_ESTIMATORS = {"lse": 0, "mle": 1}
+
+
+def initial_parameters_gpufit(spots, size):
+
+    # matches picasso.gausslq.initial_parameters_gpufit
+    center = (size / 2.0) - 0.5
+    initial_width = np.amax([size / 5.0, 1.0])
+
+    spot_max = np.amax(spots, axis=(1, 2))
+    spot_min = np.amin(spots, axis=(1, 2))
+
+    initial_parameters = np.empty((len(spots), N_PARAMETERS), dtype=np.float32)
+    initial_parameters[:, 0] = spot_max - spot_min
+    initial_parameters[:, 1] = center
+    initial_parameters[:, 2] = center
+    initial_parameters[:, 3] = initial_width
+    initial_parameters[:, 4] = initial_width
+    initial_parameters[:, 5] = spot_min
+
+    return initial_parameters
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def gauss_2d_elliptic_model(theta, size, model, jacobian):
+
+    amplitude, x0, y0, sx, sy, offset = theta[0], theta[1], theta[2], theta[3], theta[4], theta[5]
+
+    for k in range(size * size):
+
+        x = k % size
+        y = k // size
+
+        dx = x - x0
+        dy = y - y0
+
+        g = math.exp(-0.5 * ((dx / sx) ** 2 + (dy / sy) ** 2))
+
+        model[k] = amplitude * g + offset
+
+        jacobian[k, 0] = g
+        jacobian[k, 1] = amplitude * g * dx / sx ** 2
+        jacobian[k, 2] = amplitude * g * dy / sy ** 2
+        jacobian[k, 3] = amplitude * g * dx ** 2 / sx ** 3
+        jacobian[k, 4] = amplitude * g * dy ** 2 / sy ** 3
+        jacobian[k, 5] = 1.0
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def gpufit_statistics(data, weights, model, jacobian, fit_mask, estimator, gradient, hessian):
+
+    # chi square, gradient and hessian of the lse/mle estimators, returns -1 for a non positive mle model
+    n_points = data.shape[0]
+
+    gradient[:] = 0.0
+    hessian[:] = 0.0
+    chi_square = 0.0
+
+    for k in range(n_points):
+
+        if estimator == 0:
+            residual = data[k] - model[k]
+            chi_square += weights[k] * residual ** 2
+            gradient_weight = weights[k] * residual
+            hessian_weight = weights[k]
+
+        else:
+            if model[k] <= 0:
+                return -1.0
+            if data[k] > 0:
+                chi_square += 2 * (model[k] - data[k] - data[k] * math.log(model[k] / data[k]))
+            else:
+                chi_square += 2 * model[k]
+            gradient_weight = data[k] / model[k] - 1
+            hessian_weight = data[k] / model[k] ** 2
+
+        for a in range(N_PARAMETERS):
+            if fit_mask[a]:
+                gradient[a] += jacobian[k, a] * gradient_weight
+                for b in range(a, N_PARAMETERS):
+                    if fit_mask[b]:
+                        hessian[a, b] += jacobian[k, a] * jacobian[k, b] * hessian_weight
+
+    for a in range(N_PARAMETERS):
+        if fit_mask[a] == 0:
+            hessian[a, a] = 1.0
+        for b in range(a):
+            hessian[a, b] = hessian[b, a]
+
+    return chi_square
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def fit_spot_gpufit(data, weights, theta, fit_mask, tolerance, max_it, estimator):
+
+    # levenberg marquardt as in gpufit, the damping is scaled by the largest hessian diagonal seen so far,
+    # rejected steps are reverted and count as iterations. returns chi square, state and iterations
+    size = int(math.sqrt(data.shape[0]) + 0.5)
+    n_points = data.shape[0]
+
+    model = np.empty(n_points)
+    jacobian = np.empty((n_points, N_PARAMETERS))
+    gradient = np.zeros(N_PARAMETERS)
+    hessian = np.zeros((N_PARAMETERS, N_PARAMETERS))
+    trial_gradient = np.zeros(N_PARAMETERS)
+    trial_hessian = np.zeros((N_PARAMETERS, N_PARAMETERS))
+    scaling = np.zeros(N_PARAMETERS)
+    A = np.zeros((N_PARAMETERS, N_PARAMETERS))
+    step = np.zeros(N_PARAMETERS)
+    trial = np.empty(N_PARAMETERS)
+
+    gauss_2d_elliptic_model(theta, size, model, jacobian)
+    chi_square = gpufit_statistics(data, weights, model, jacobian, fit_mask, estimator, gradient, hessian)
+
+    if chi_square < 0:
+        return np.nan, 3, 0
+
+    damping = 1e-3
+    state = 1
+    iterations = 0
+
+    for iteration in range(max_it):
+
+        iterations = iteration + 1
+
+        for a in range(N_PARAMETERS):
+            scaling[a] = max(scaling[a], hessian[a, a])
+
+        A[:] = hessian
+        for a in range(N_PARAMETERS):
+            A[a, a] += damping * scaling[a]
+
+        if solve_linear_system(A, gradient, step) == False:
+            state = 2
+            break
+
+        for a in range(N_PARAMETERS):
+            trial[a] = theta[a] + step[a] * fit_mask[a]
+
+        gauss_2d_elliptic_model(trial, size, model, jacobian)
+        trial_chi_square = gpufit_statistics(data, weights, model, jacobian, fit_mask, estimator,
+                                             trial_gradient, trial_hessian)
+
+        if trial_chi_square < 0:
+            state = 3
+            break
+
+        converged = abs(trial_chi_square - chi_square) < tolerance * max(1.0, trial_chi_square)
+
+        if trial_chi_square <= chi_square:
+            theta[:] = trial
+            gradient[:] = trial_gradient
+            hessian[:] = trial_hessian
+            chi_square = trial_chi_square
+            damping /= 10
+        else:
+            damping *= 10
+
+        if converged:
+            state = 0
+            break
+
+    return chi_square, state, iterations
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def fit_gpufit_kernel(data, weights, fit_mask, tolerance, max_it, estimator,
+        parameters, states, chi_squares, iterations):
+
+    for n in prange(data.shape[0]):
+        chi_squares[n], states[n], iterations[n] = fit_spot_gpufit(data[n], weights[n],
+            parameters[n], fit_mask, tolerance, max_it, estimator)
+
+
+def fit_gauss_2d_elliptic(data, weights, initial_parameters, tolerance=1e-4,
+        max_number_iterations=25, parameters_to_fit=None, estimator_id=0):
+
+    # same arguments and results as pygpufit.gpufit.fit for the GAUSS_2D_ELLIPTIC model
+    start = time.time()
+
+    data = np.ascontiguousarray(data, dtype=np.float64)
+
+    n_fits, n_points = data.shape
+
+    if int(math.sqrt(n_points) + 0.5) ** 2 != n_points:
+        raise ValueError("GAUSS_2D_ELLIPTIC data points must form a square spot")
+    if initial_parameters.shape != (n_fits, N_PARAMETERS):
+        raise ValueError("initial_parameters must have shape (n_fits, 6)")
+    if estimator_id not in GPUFIT_ESTIMATORS.values():
+        raise ValueError(f"Unknown estimator_id {estimator_id}")
+
+    if weights is None:
+        weights = np.ones(data.shape, dtype=np.float64)
+    else:
+        weights = np.ascontiguousarray(weights, dtype=np.float64)
+
+    if parameters_to_fit is None:
+        parameters_to_fit = np.ones(N_PARAMETERS, dtype=np.int32)
+    else:
+        parameters_to_fit = np.ascontiguousarray(parameters_to_fit, dtype=np.int32)
+
+    parameters = np.array(initial_parameters, dtype=np.float64)
+    states = np.zeros(n_fits, dtype=np.int32)
+    chi_squares = np.zeros(n_fits, dtype=np.float64)
+    iterations = np.zeros(n_fits, dtype=np.int32)
+
+    if n_fits > 0:
+        fit_gpufit_kernel(data, weights, parameters_to_fit, tolerance,
+            max_number_iterations, estimator_id, parameters, states, chi_squares, iterations)
+
+    return (parameters.astype(np.float32), states, chi_squares.astype(np.float32),
+            iterations, time.time() - start)
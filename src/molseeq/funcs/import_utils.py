@@ -1,18 +1,110 @@
 import traceback
 import numpy as np
 import os
-from PIL import Image
-from qtpy.QtWidgets import QFileDialog
-from molseeq.funcs.utils_compute import Worker
-import time
-import multiprocessing
-from multiprocessing import shared_memory, Manager
+from molseeq.funcs.shared_memory_utils import SharedProgressCounter
+from molseeq.funcs.lazy_array_utils import (is_lazy_array, create_lazy_array, get_lazy_array_path,
+    open_lazy_array, remove_lazy_array_file)
 from functools import partial
 import tifffile
 import concurrent.futures
 from astropy.io import fits
+import hashlib
+import json
 
-def import_image_data(dat, progress_dict={}, index=0):
+IMAGE_INDEX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".molseeq", "image_index")
+
+def read_tiff_pages(path, frame_list, page_offsets, page_bytecounts,
+        page_shape, file_dtype, row_range=None):
+
+    page_offsets = np.asarray(page_offsets, dtype=np.int64)
+    page_bytecounts = np.asarray(page_bytecounts, dtype=np.int64)
+
+    height, width = page_shape[:2]
+
+    if row_range is None:
+        row_range = (0, height)
+
+    y0, y1 = row_range
+
+    # only the requested rows are read from uncompressed pages
+    row_bytes = int(np.prod(page_shape[1:])) * np.dtype(file_dtype).itemsize
+    n_pixels = int(np.prod(page_shape[1:])) * (y1 - y0)
+    read_shape = (y1 - y0, *page_shape[1:])
+
+    if len(page_offsets) > 0 and np.all(page_offsets >= 0):
+
+        # uncompressed contiguous pages, read raw bytes straight from the page offsets
+        read_offsets = page_offsets + y0 * row_bytes
+
+        block_start = int(read_offsets.min())
+        block_end = int(read_offsets.max()) + (y1 - y0) * row_bytes
+        block_span = block_end - block_start
+
+        with open(path, "rb") as file:
+
+            if block_span <= 2 * len(read_offsets) * (y1 - y0) * row_bytes:
+
+                # pages are close together, read the whole block in one call
+                file.seek(block_start)
+                buffer = file.read(block_span)
+
+                for offset in read_offsets:
+                    img_frame = np.frombuffer(buffer, dtype=file_dtype, count=n_pixels,
+                        offset=int(offset - block_start))
+                    yield img_frame.reshape(read_shape)
+
+            else:
+
+                for offset in read_offsets:
+                    file.seek(int(offset))
+                    img_frame = np.fromfile(file, dtype=file_dtype, count=n_pixels)
+                    yield img_frame.reshape(read_shape)
+
+    else:
+
+        # compressed or tiled pages are decoded by tifffile
+        with tifffile.TiffFile(path) as tif:
+            block = tif.asarray(key=list(frame_list), maxworkers=1)
+            block = block.reshape(-1, *page_shape)
+
+            for img_frame in block:
+                yield img_frame[y0:y1]
+
+
+def read_fits_frames(path, frame_list, dtype, bzero=0, bscale=1, row_range=None):
+
+    frame_list = np.asarray(frame_list, dtype=np.int64)
+
+    # raw memmap of the primary HDU, scaling is applied per block below
+    with fits.open(path, mode="readonly", memmap=True,
+            do_not_scale_image_data=True, ignore_missing_end=True) as hdul:
+
+        data = hdul[0].data
+
+        if row_range is None:
+            row_range = (0, data.shape[-2])
+
+        y0, y1 = row_range
+
+        if len(frame_list) > 0 and np.all(np.diff(frame_list) == 1):
+            block = data[frame_list[0]:frame_list[-1] + 1, y0:y1]
+        else:
+            block = data[frame_list, y0:y1]
+
+        if bscale != 1:
+            block = block.astype(np.float64) * bscale + bzero
+        elif bzero != 0:
+            block = block.astype(np.int64) + int(bzero)
+
+        block = np.array(block, dtype=dtype)
+
+        del data
+
+    for img_frame in block:
+        yield img_frame
+
+
+def import_image_data(dat, progress_counter=None, index=0):
 
     try:
 
@@ -21,112 +113,227 @@ def import_image_data(dat, progress_dict={}, index=0):
         channel_list = dat["channel_list"]
         channel_frame_list = dat["channel_frame_list"]
         channel_images = dat["channel_images"]
+        image_shape = dat["image_shape"]
+        stop_event = dat["stop_event"]
+
+        y0, y1, x0, x1 = dat["crop"]
 
         base, ext = os.path.splitext(path)
 
         n_frames = len(frame_list)
 
-        if ext.lower() == ".tif":
+        if ext.lower() in [".tif", ".tiff"]:
 
-            with Image.open(path) as image:
+            img_frames = read_tiff_pages(path, frame_list,
+                dat["page_offsets"], dat["page_bytecounts"],
+                dat["page_shape"], dat["file_dtype"], row_range=(y0, y1))
 
-                for (frame_index, channels, channel_frame) in zip(frame_list, channel_list, channel_frame_list):
+        elif ext.lower() == ".fits":
 
-                    image_shape = dat["image_shape"]
-                    stop_event = dat["stop_event"]
+            img_frames = read_fits_frames(path, frame_list, dat["dtype"],
+                dat["bzero"], dat["bscale"], row_range=(y0, y1))
 
-                    if not stop_event.is_set():
+        channel_arrays = {}
+        for channel, shared_mem in channel_images.items():
+            if isinstance(shared_mem, str):
+                # lazy imports write straight into the disk backed channel image
+                channel_arrays[channel] = open_lazy_array(shared_mem, image_shape, dat["dtype"])
+            else:
+                channel_arrays[channel] = np.ndarray(image_shape, dtype=dat["dtype"], buffer=shared_mem.buf)
 
-                        image.seek(frame_index)
-                        img_frame = np.array(image)
+        for array_index, (img_frame, channels, channel_frame) in enumerate(zip(img_frames,
+                channel_list, channel_frame_list)):
 
-                        if len(channels) == 1:
-                            img_frames = [img_frame]
-                        else:
-                            img_frames = np.array_split(img_frame, 2, axis=-1)
+            if stop_event.is_set():
+                break
 
-                        for channel, channel_img in zip(channels, img_frames):
+            if len(channels) == 1:
+                channel_frames = [img_frame]
+            else:
+                channel_frames = np.array_split(img_frame, 2, axis=-1)
 
-                            shared_mem = channel_images[channel]
-                            np_array = np.ndarray(image_shape, dtype=dat["dtype"], buffer=shared_mem.buf)
-                            np_array[channel_frame] = channel_img
+            for channel, channel_img in zip(channels, channel_frames):
+                channel_arrays[channel][channel_frame] = channel_img[:, x0:x1]
 
-                    progress = int(((frame_index + 1) / n_frames)*100)
-                    progress_dict[index] = progress
+            if progress_counter is not None:
+                progress = int(((array_index + 1) / n_frames)*100)
+                progress_counter.set(index, progress)
 
-        elif ext.lower() == ".fits":
+    except:
+        print(traceback.format_exc())
+        pass
 
-            with fits.open(path) as hdul:
 
-                for (frame_index, channels, channel_frame) in zip(frame_list, channel_list, channel_frame_list):
 
-                    image_shape = dat["image_shape"]
-                    stop_event = dat["stop_event"]
+def get_channel_crop(image_shape, import_mode, crop=None):
 
-                    if not stop_event.is_set():
+    # crop is applied to each channel, after splitting FRET/ALEX halves with np.array_split.
+    # both halves are cropped to the width of the narrower (right) half, so they keep the same width
+    if import_mode.lower() in ["fret", "alex"]:
+        channel_width = image_shape[2]//2
+    else:
+        channel_width = image_shape[2]
 
-                        img_frame = hdul[0].data[frame_index]
+    if crop is None:
+        crop = (0, image_shape[1], 0, channel_width)
+    else:
+        y0, y1, _ = crop[0].indices(image_shape[1])
+        x0, x1, _ = crop[1].indices(channel_width)
+        crop = (y0, max(y0, y1), x0, max(x0, x1))
 
-                        if len(channels) == 1:
-                            img_frames = [img_frame]
-                        else:
-                            img_frames = np.array_split(img_frame, 2, axis=-1)
+    return crop
 
-                        for channel, channel_img in zip(channels, img_frames):
 
-                            shared_mem = channel_images[channel]
-                            np_array = np.ndarray(image_shape, dtype=dat["dtype"], buffer=shared_mem.buf)
-                            np_array[channel_frame] = channel_img
+class _import_utils:
 
-                    progress = int(((frame_index + 1) / n_frames)*100)
-                    progress_dict[index] = progress
+    def get_image_index_cache_path(self, path):
 
-    except:
-        print(traceback.format_exc())
-        pass
+        cache_name = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
 
+        return os.path.join(IMAGE_INDEX_CACHE_DIR, cache_name + ".npz")
 
+    def load_cached_image_index(self, path):
 
-class _import_utils:
+        image_index = None
+
+        try:
+
+            cache_path = self.get_image_index_cache_path(path)
+
+            if os.path.exists(cache_path):
+
+                file_stat = os.stat(path)
+
+                with np.load(cache_path, allow_pickle=False) as cache:
 
-    def create_import_shared_image(self, image_size):
+                    metadata = json.loads(str(cache["metadata"]))
 
-        shared_mem = None
+                    # the index is only valid for the exact file it was built from
+                    if (metadata["path"] == os.path.abspath(path)
+                            and metadata["mtime"] == file_stat.st_mtime_ns
+                            and metadata["image_size"] == file_stat.st_size):
+
+                        image_index = {"path": path,
+                                       "image_size": metadata["image_size"],
+                                       "n_frames": metadata["n_frames"],
+                                       "image_shape": tuple(metadata["image_shape"]),
+                                       "page_shape": tuple(metadata["page_shape"]),
+                                       "dtype": np.dtype(metadata["dtype"]),
+                                       }
+
+                        if "file_dtype" in metadata.keys():
+                            image_index["byteorder"] = metadata["byteorder"]
+                            image_index["file_dtype"] = np.dtype(metadata["file_dtype"])
+                            image_index["page_offsets"] = cache["page_offsets"]
+                            image_index["page_bytecounts"] = cache["page_bytecounts"]
+
+                        if "bzero" in metadata.keys():
+                            image_index["bzero"] = metadata["bzero"]
+                            image_index["bscale"] = metadata["bscale"]
+
+        except:
+            print(traceback.format_exc())
+            image_index = None
+
+        return image_index
+
+    def save_cached_image_index(self, image_index):
 
         try:
 
-            if self.verbose:
-                print("Creating shared image...")
+            path = image_index["path"]
+            cache_path = self.get_image_index_cache_path(path)
+
+            os.makedirs(IMAGE_INDEX_CACHE_DIR, exist_ok=True)
+
+            metadata = {"path": os.path.abspath(path),
+                        "mtime": os.stat(path).st_mtime_ns,
+                        "image_size": int(image_index["image_size"]),
+                        "n_frames": int(image_index["n_frames"]),
+                        "image_shape": [int(dim) for dim in image_index["image_shape"]],
+                        "page_shape": [int(dim) for dim in image_index["page_shape"]],
+                        "dtype": np.dtype(image_index["dtype"]).str,
+                        }
 
-            shared_mem = shared_memory.SharedMemory(create=True, size=image_size)
+            arrays = {}
+
+            if "file_dtype" in image_index.keys():
+                metadata["byteorder"] = image_index["byteorder"]
+                metadata["file_dtype"] = np.dtype(image_index["file_dtype"]).str
+                arrays["page_offsets"] = image_index["page_offsets"]
+                arrays["page_bytecounts"] = image_index["page_bytecounts"]
+
+            if "bzero" in image_index.keys():
+                metadata["bzero"] = image_index["bzero"]
+                metadata["bscale"] = image_index["bscale"]
+
+            # write to a temporary file first so a partial write is never read back
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+
+            with open(temp_path, "wb") as file:
+                np.savez(file, metadata=np.array(json.dumps(metadata)), **arrays)
+
+            os.replace(temp_path, cache_path)
 
         except:
             print(traceback.format_exc())
             pass
 
-        return shared_mem
+    def get_image_index(self, path):
 
-    def get_image_info(self, path):
+        image_index = self.load_cached_image_index(path)
+
+        if image_index is None:
+
+            image_index = self.read_image_index(path)
+
+            self.save_cached_image_index(image_index)
+
+        elif self.verbose:
+            print(f"Loaded cached image index for {path}")
+
+        return image_index
+
+    def read_image_index(self, path):
 
         if self.verbose:
-            print(f"Getting image info for {path}")
+            print(f"Getting image index for {path}")
 
         base, ext = os.path.splitext(path)
 
-        if ext.lower() == ".tif":
+        image_index = {"path": path, "image_size": os.path.getsize(path)}
 
-            image_size = os.path.getsize(path)  # Get file size directly
+        if ext.lower() in [".tif", ".tiff"]:
 
             with tifffile.TiffFile(path) as tif:
-                n_frames = len(tif.pages)  # Number of pages (frames)
-                page_shape = tif.pages[0].shape  # Dimensions of the first page
-                dtype = tif.pages[0].dtype  # Data type of the first page
 
-            image_shape = (n_frames, page_shape[0], page_shape[1])
+                pages = tif.pages
+                n_frames = len(pages)
 
-        elif ext.lower() == ".fits":
+                page_shape = pages[0].shape
+                dtype = np.dtype(pages[0].dtype)
+
+                page_offsets = np.full(n_frames, -1, dtype=np.int64)
+                page_bytecounts = np.zeros(n_frames, dtype=np.int64)
+
+                for page_index, page in enumerate(pages):
 
-            image_size = os.path.getsize(path)
+                    # only uncompressed, contiguous pages can be read from their byte offsets
+                    if page.is_contiguous and page.shape == page_shape:
+                        page_offsets[page_index] = page.dataoffsets[0]
+                        page_bytecounts[page_index] = sum(page.databytecounts)
+
+                image_index["byteorder"] = tif.byteorder
+
+            image_index["n_frames"] = n_frames
+            image_index["image_shape"] = (n_frames, page_shape[0], page_shape[1])
+            image_index["page_shape"] = tuple(page_shape)
+            image_index["dtype"] = dtype.newbyteorder("=")
+            image_index["file_dtype"] = dtype.newbyteorder(image_index["byteorder"])
+            image_index["page_offsets"] = page_offsets
+            image_index["page_bytecounts"] = page_bytecounts
+
+        elif ext.lower() == ".fits":
 
             with fits.open(path, mode='readonly', ignore_missing_end=True) as hdul:
 
@@ -151,6 +358,28 @@ class _import_utils:
 
                 dtype = bitpix_to_dtype[header['BITPIX']]
 
+                image_index["bzero"] = header.get('BZERO', 0)
+                image_index["bscale"] = header.get('BSCALE', 1)
+
+            image_index["n_frames"] = n_frames
+            image_index["image_shape"] = image_shape
+            image_index["page_shape"] = tuple(page_shape)
+            image_index["dtype"] = dtype
+
+        return image_index
+
+    def get_image_info(self, path):
+
+        if self.verbose:
+            print(f"Getting image info for {path}")
+
+        image_index = self.get_image_index(path)
+
+        n_frames = image_index["n_frames"]
+        image_shape = image_index["image_shape"]
+        dtype = image_index["dtype"]
+        image_size = image_index["image_size"]
+
         return n_frames, image_shape, dtype, image_size
 
     def format_import_path(self, path):
@@ -178,6 +407,154 @@ class _import_utils:
 
         return path
 
+    def get_import_frame_window(self):
+
+        frame_window = slice(None)
+
+        try:
+
+            frame_window_text = self.gui.molseeq_import_frames.text().strip()
+
+            if frame_window_text != "":
+
+                window_values = [value.strip() for value in frame_window_text.split(":")]
+                window_values = [int(value) if value != "" else None for value in window_values]
+
+                if len(window_values) == 1:
+                    frame_window = slice(window_values[0], None)
+                elif len(window_values) <= 3:
+                    frame_window = slice(*window_values)
+                else:
+                    raise ValueError
+
+                if frame_window.step is not None and frame_window.step < 1:
+                    raise ValueError
+
+        except:
+            print(f"Invalid frame window, expected start:stop:step, importing all frames")
+            frame_window = slice(None)
+
+        return frame_window
+
+    def get_import_crop(self):
+
+        crop = None
+
+        try:
+
+            crop_text = self.gui.molseeq_import_crop.text().strip()
+
+            if crop_text != "":
+
+                crop = []
+
+                for crop_range in crop_text.split(","):
+
+                    start, stop = [value.strip() for value in crop_range.split(":")]
+
+                    start = int(start) if start != "" else None
+                    stop = int(stop) if stop != "" else None
+
+                    crop.append(slice(start, stop))
+
+                if len(crop) != 2:
+                    raise ValueError
+
+        except:
+            print(f"Invalid crop, expected y0:y1, x0:x1, importing full frames")
+            crop = None
+
+        return crop
+
+    def get_import_frame_lists(self, image_index, import_mode, import_limit_combo,
+            channel_layout, alex_first_frame, frame_window=slice(None), crop=None):
+
+        n_frames = image_index["n_frames"]
+        image_shape = image_index["image_shape"]
+
+        crop = get_channel_crop(image_shape, import_mode, crop)
+
+        if import_mode.lower() == "alex":
+            # ALEX windows are in excitation cycles (frame pairs)
+            n_channel_frames = n_frames//2
+        else:
+            n_channel_frames = n_frames
+
+        channel_frames = list(range(n_channel_frames))[frame_window]
+
+        if import_limit_combo != "None":
+            channel_frames = channel_frames[:int(import_limit_combo)]
+
+        import_limit = len(channel_frames)
+
+        if import_mode.lower() in ["donor", "acceptor", "dd", "da", "ad", "aa", "single channel"]:
+
+            frame_list = channel_frames
+
+            if import_mode.lower() == "single channel":
+                channel_names = ["data"]
+            else:
+                channel_names = [import_mode.lower()]
+
+            channel_list = [channel_names] * len(frame_list)
+            channel_frame_list = list(range(len(frame_list)))
+
+        elif import_mode.lower() == "fret":
+
+            frame_list = channel_frames
+
+            if channel_layout.lower() == "donor-acceptor":
+                channel_names = ["donor", "acceptor"]
+            else:
+                channel_names = ["acceptor", "donor"]
+
+            channel_list = [channel_names] * len(frame_list)
+            channel_frame_list = list(range(len(frame_list)))
+
+        elif import_mode.lower() == "alex":
+
+            frame_list = []
+            for channel_frame in channel_frames:
+                frame_list.extend([channel_frame * 2, channel_frame * 2 + 1])
+
+            channel_frame_list = np.repeat(np.arange(len(channel_frames)), 2)
+
+            channel_list = []
+
+            for frame in frame_list:
+                if frame % 2 == 0:
+                    if alex_first_frame.lower() == "donor":
+                        channel_ex = "d"
+                    else:
+                        channel_ex = "a"
+                else:
+                    if alex_first_frame.lower() == "donor":
+                        channel_ex = "a"
+                    else:
+                        channel_ex = "d"
+
+                if channel_layout.lower() == "donor-acceptor":
+                    channel_names = [f"{channel_ex}d", f"{channel_ex}a"]
+                else:
+                    channel_names = [f"{channel_ex}a", f"{channel_ex}d"]
+
+                channel_list.append(channel_names)
+
+            channel_names = np.unique(channel_list).tolist()
+
+        channel_shape = (len(channel_frames), crop[1] - crop[0], crop[3] - crop[2])
+
+        frame_lists = {"import_limit": import_limit,
+                       "frame_list": frame_list,
+                       "channel_names": channel_names,
+                       "channel_list": channel_list,
+                       "channel_frame_list": channel_frame_list,
+                       "channel_shape": channel_shape,
+                       "crop": crop,
+                       }
+
+        return frame_lists
+
     def populate_import_lists(self, progress_callback=None, paths=[]):
 
         image_list = []
@@ -193,6 +570,12 @@ class _import_utils:
             import_limit_combo = self.gui.molseeq_import_limt.currentText()
             channel_layout = self.gui.molseeq_channel_layout.currentText()
             alex_first_frame = self.gui.molseeq_alex_first_frame.currentText()
+            concat_images = self.gui.molseeq_concatenate.isChecked()
+            frame_window = self.get_import_frame_window()
+            crop = self.get_import_crop()
+            import_lazy = self.get_import_lazy()
+
+            import_plans = {}
 
             for path_index, path in enumerate(paths):
 
@@ -201,293 +584,410 @@ class _import_utils:
 
                 if self.gui.molseeq_append.isChecked():
                     dataset_name = self.gui.molseeq_append_dataset.currentText()
+                elif concat_images and len(import_plans) > 0:
+                    dataset_name = list(import_plans.keys())[0]
                 else:
                     dataset_name = file_name
 
-                if dataset_name not in shared_images.keys():
-                    shared_images[dataset_name] = {}
+                image_index = self.get_image_index(path)
 
-                n_frames, image_shape, dtype, image_size = self.get_image_info(path)
+                file_plan = self.get_import_frame_lists(image_index, import_mode,
+                    import_limit_combo, channel_layout, alex_first_frame,
+                    frame_window=frame_window, crop=crop)
 
-                if import_mode.lower() in ["donor", "acceptor", "dd", "da", "ad", "aa"]:
+                file_plan["path"] = path
+                file_plan["image_index"] = image_index
 
-                    if import_limit_combo != "None":
-                        import_limit = int(self.gui.molseeq_import_limt.currentText())
-                    else:
-                        import_limit = n_frames
+                if concat_images and dataset_name in import_plans.keys():
+
+                    dataset_plan = import_plans[dataset_name]
+
+                    if file_plan["channel_shape"][1:] != dataset_plan[0]["channel_shape"][1:]:
+                        print(f"Cannot concatenate {file_name}, image shape does not match")
+                        continue
 
-                    image_shape = (import_limit, image_shape[1], image_shape[2])
+                    dataset_plan.append(file_plan)
+
+                else:
+                    import_plans[dataset_name] = [file_plan]
 
-                    frame_list = list(range(n_frames))[:import_limit]
+            for dataset_name, dataset_plan in import_plans.items():
 
-                    unique_frames = np.unique(frame_list)
-                    n_frames = len(unique_frames)
+                # allocate the full (concatenated) channel images once, each file writes at its frame offset
+                n_channel_frames = sum([file_plan["channel_shape"][0] for file_plan in dataset_plan])
+                image_shape = (n_channel_frames, *dataset_plan[0]["channel_shape"][1:])
+                channel_names = dataset_plan[0]["channel_names"]
 
-                    channel_names = [import_mode.lower()]
-                    channel_list = [channel_names] * n_frames
+                # stacks are always cast to uint16 by the workers, so the channel images are used without a copy
+                dtype = np.dtype(np.uint16)
 
-                    channel_images = {}
-                    for channel in channel_names:
+                shared_images[dataset_name] = {}
 
-                        if self.verbose:
-                            print(f"Creating image memory for {dataset_name} {channel}...")
+                for channel in channel_names:
 
-                        shared_image = self.create_import_shared_image(image_size)
-                        channel_images[channel] = shared_image
-                        shared_images[dataset_name][channel] = shared_image
+                    if self.verbose:
+                        print(f"Creating shared image for {dataset_name} {channel}...")
 
-                    image_dict = {"path": path,
+                    if import_lazy:
+                        shared_image = get_lazy_array_path()
+                        create_lazy_array(image_shape, dtype, path=shared_image).flush()
+                    else:
+                        shared_image = self.get_shared_image_store().allocate(image_shape, dtype).shared_mem
+
+                    shared_images[dataset_name][channel] = shared_image
+
+                frame_offset = 0
+
+                for file_plan in dataset_plan:
+
+                    image_dict = {"path": file_plan["path"],
                                   "dataset_name": dataset_name,
-                                  "n_frames": n_frames,
+                                  "n_frames": len(file_plan["frame_list"]),
                                   "channel_names": channel_names,
-                                  "channel_list": channel_list,
-                                  "frame_list": frame_list,
-                                  "channel_frame_list": frame_list,
-                                  "channel_images": channel_images,
+                                  "channel_list": file_plan["channel_list"],
+                                  "frame_list": file_plan["frame_list"],
+                                  "channel_frame_list": np.asarray(file_plan["channel_frame_list"]) + frame_offset,
+                                  "channel_images": shared_images[dataset_name],
                                   "image_shape": image_shape,
+                                  "crop": file_plan["crop"],
                                   "channel_layout": channel_layout,
                                   "alex_first_frame": alex_first_frame,
                                   "dtype": dtype,
+                                  "image_index": file_plan["image_index"],
                                   "import_mode": import_mode.lower()}
 
                     image_list.append(image_dict)
 
-                elif import_mode.lower() == "single channel":
+                    frame_offset += file_plan["channel_shape"][0]
 
-                    if import_limit_combo != "None":
-                        import_limit = int(self.gui.molseeq_import_limt.currentText())
-                    else:
-                        import_limit = n_frames
+                import_dict[dataset_name] = {"path": dataset_plan[0]["path"],
+                                             "import_mode": import_mode.lower(),
+                                             "import_limit": dataset_plan[0]["import_limit"],
+                                             "channel_layout": channel_layout,
+                                             "alex_first_frame": alex_first_frame,
+                                             "image_shape": image_shape,
+                                             "dtype": dtype,
+                                             "concatenate": concat_images,}
+
+        except:
+            print(traceback.format_exc())
+
+        return image_list, shared_images, import_dict
 
-                    image_shape = (import_limit, image_shape[1], image_shape[2])
+    def populate_import_compute_jobs(self, image_list):
 
-                    frame_list = list(range(n_frames))[:import_limit]
+        if self.verbose:
+            print(f"Populating import compute jobs.")
 
-                    unique_frames = np.unique(frame_list)
-                    n_frames = len(unique_frames)
+        compute_jobs = []
 
-                    channel_names = ["data"]
-                    channel_list = [channel_names] * n_frames
+        cpu_count = self.get_compute_budget("import")["workers"]
 
-                    channel_images = {}
-                    for channel in channel_names:
-                        if self.verbose:
-                            print(f"Creating image memory for {dataset_name} {channel}...")
+        for image_dict in image_list:
 
-                        shared_image = self.create_import_shared_image(image_size)
-                        channel_images[channel] = shared_image
-                        shared_images[dataset_name][channel] = shared_image
+            frame_list = np.asarray(image_dict["frame_list"])
+            channel_list = image_dict["channel_list"]
+            channel_frame_list = np.asarray(image_dict["channel_frame_list"])
 
-                    image_dict = {"path": path,
-                                  "dataset_name": dataset_name,
-                                  "n_frames": n_frames,
-                                  "channel_names": channel_names,
-                                  "channel_list": channel_list,
-                                  "frame_list": frame_list,
-                                  "channel_frame_list": frame_list,
-                                  "channel_images": channel_images,
-                                  "image_shape": image_shape,
-                                  "channel_layout": channel_layout,
-                                  "alex_first_frame": alex_first_frame,
-                                  "dtype": dtype,
-                                  "import_mode": import_mode.lower()}
+            image_dict = image_dict.copy()
+            image_index = image_dict.pop("image_index")
 
-                    image_list.append(image_dict)
+            n_frames = len(frame_list)
+            block_size = max(1, min(100, int(np.ceil(n_frames / cpu_count))))
 
-                elif import_mode.lower() == "fret":
+            # split each file into contiguous frame blocks, read in parallel
+            for block_start in range(0, n_frames, block_size):
 
-                    if import_limit_combo != "None":
-                        import_limit = int(self.gui.molseeq_import_limt.currentText())
-                    else:
-                        import_limit = n_frames
+                block_end = min(block_start + block_size, n_frames)
+                block_frames = frame_list[block_start:block_end]
 
-                    frame_list = list(range(n_frames))[:import_limit]
+                compute_job = {**image_dict,
+                               "frame_list": block_frames.tolist(),
+                               "channel_list": channel_list[block_start:block_end],
+                               "channel_frame_list": channel_frame_list[block_start:block_end].tolist(),
+                               "page_shape": image_index["page_shape"],
+                               "stop_event": self.stop_event}
 
-                    if channel_layout.lower() == "donor-acceptor":
-                        channel_names = ["donor", "acceptor"]
-                    else:
-                        channel_names = ["acceptor", "donor"]
+                if "page_offsets" in image_index.keys():
+                    compute_job["page_offsets"] = image_index["page_offsets"][block_frames]
+                    compute_job["page_bytecounts"] = image_index["page_bytecounts"][block_frames]
+                    compute_job["file_dtype"] = image_index["file_dtype"]
 
-                    image_shape = (import_limit, image_shape[1], image_shape[2]//2)
+                if "bzero" in image_index.keys():
+                    compute_job["bzero"] = image_index["bzero"]
+                    compute_job["bscale"] = image_index["bscale"]
 
-                    unique_frames = np.unique(frame_list)
-                    n_frames = len(unique_frames)
+                compute_jobs.append(compute_job)
 
-                    channel_list = [channel_names] * n_frames
+        return compute_jobs
 
-                    channel_images = {}
-                    for channel in channel_names:
+    def process_compute_jobs(self, compute_jobs, progress_callback=None,
+            block_callback=None):
 
-                        if self.verbose:
-                            print(f"Creating shared image for {dataset_name} {channel}...")
+        if self.verbose:
+            print(f"Processing {len(compute_jobs)} compute jobs.")
 
-                        shared_image = self.create_import_shared_image(image_size//2)
-                        channel_images[channel] = shared_image
-                        shared_images[dataset_name][channel] = shared_image
+        timeout_duration = 10  # Timeout in seconds
 
-                    image_dict = {"path": path,
-                                  "dataset_name": dataset_name,
-                                  "n_frames": n_frames,
-                                  "channel_names": channel_names,
-                                  "channel_list": channel_list,
-                                  "frame_list": frame_list,
-                                  "channel_frame_list": frame_list,
-                                  "channel_images": channel_images,
-                                  "image_shape": image_shape,
-                                  "channel_layout": channel_layout,
-                                  "alex_first_frame": alex_first_frame,
-                                  "dtype": dtype,
-                                  "import_mode": import_mode.lower()}
+        progress_counter = SharedProgressCounter(len(compute_jobs))
 
-                    image_list.append(image_dict)
+        executor = self.get_process_pool()
 
-                elif import_mode.lower() == "alex":
+        # Submit all jobs and store the future objects
+        futures = [executor.submit(import_image_data, job, progress_counter, i) for i, job in enumerate(compute_jobs)]
 
-                    if import_limit_combo != "None":
-                        import_limit = int(self.gui.molseeq_import_limt.currentText())
-                    else:
-                        import_limit = n_frames
+        completed_jobs = set()
 
-                    frame_list = list(range(n_frames))
+        if block_callback is not None:
+            callback = partial(self.process_completed_blocks, futures,
+                compute_jobs, completed_jobs, block_callback)
+        else:
+            callback = None
 
-                    even_frames = frame_list[::2][:import_limit]
-                    odd_frames = frame_list[1::2][:import_limit]
+        # per job progress is stored as a percentage
+        self.monitor_progress(futures, progress_counter, len(compute_jobs) * 100,
+            progress_callback, callback=callback)
 
-                    frame_list = np.unique(np.concatenate([even_frames, odd_frames]))
-                    frame_list = np.sort(frame_list).tolist()
-                    channel_frame_list = np.repeat(np.arange(len(frame_list)//2), 2)
+        # Wait for all futures to complete
+        concurrent.futures.wait(futures)
 
-                    n_frames = len(frame_list)
-                    image_shape = (n_frames//2, image_shape[1], image_shape[2]//2)
+        if block_callback is not None:
+            self.process_completed_blocks(futures, compute_jobs,
+                completed_jobs, block_callback)
 
-                    channel_list = []
+        # Retrieve and process results
+        results = [future.result() for future in futures]
 
-                    for frame in frame_list:
-                        if frame % 2 == 0:
-                            if alex_first_frame.lower() == "donor":
-                                channel_ex = "d"
-                            else:
-                                channel_ex = "a"
-                        else:
-                            if alex_first_frame.lower() == "donor":
-                                channel_ex = "a"
-                            else:
-                                channel_ex = "d"
+        progress_counter.close()
 
-                        if channel_layout.lower() == "donor-acceptor":
-                            channel_names = [f"{channel_ex}d", f"{channel_ex}a"]
-                        else:
-                            channel_names = [f"{channel_ex}a", f"{channel_ex}d"]
+        if self.verbose:
+            print("Finished processing compute jobs.")
 
-                        channel_list.append(channel_names)
+    def process_completed_blocks(self, futures, compute_jobs,
+            completed_jobs, block_callback):
 
-                    channel_names = np.unique(channel_list)
+        new_jobs = [job_index for job_index, future in enumerate(futures)
+                    if future.done() and job_index not in completed_jobs]
 
-                    channel_images = {}
-                    for channel in channel_names:
+        if len(new_jobs) > 0:
+            block_callback([compute_jobs[job_index] for job_index in new_jobs])
 
-                        if self.verbose:
-                            print(f"Creating shared memory for {dataset_name} {channel}...")
+        completed_jobs.update(new_jobs)
 
-                        shared_image = self.create_import_shared_image(image_size//4)
-                        channel_images[channel] = shared_image
-                        shared_images[dataset_name][channel] = shared_image
+        return completed_jobs
 
-                    image_dict = {"path": path,
-                                  "dataset_name": dataset_name,
-                                  "n_frames": n_frames,
-                                  "channel_names": channel_names,
-                                  "channel_list": channel_list,
-                                  "frame_list": frame_list,
-                                  "channel_frame_list": channel_frame_list,
-                                  "channel_images": channel_images,
-                                  "image_shape": image_shape,
-                                  "channel_layout": channel_layout,
-                                  "alex_first_frame": alex_first_frame,
-                                  "dtype": dtype,
-                                  "import_mode": import_mode.lower()}
+    def populate_channel_dict(self, image, channel_name, path,
+            import_mode, channel_layout, alex_first_frame):
 
-                    image_list.append(image_dict)
+        if channel_name in ["donor", "acceptor", "da", "dd"]:
+            excitation = "d"
+        else:
+            excitation = "a"
+
+        if channel_name in ["donor", "ad", "dd"]:
+            emission = "d"
+        else:
+            emission = "a"
 
-                channel_layout = self.gui.molseeq_channel_layout.currentText()
-                alex_first_frame = self.gui.molseeq_alex_first_frame.currentText()
+        if import_mode.lower() == "fret":
+            fret = True
+        else:
+            fret = False
 
-                if dataset_name not in import_dict.keys():
-                    import_dict[dataset_name] = {"path":path,
-                                                 "import_mode": import_mode.lower(),
-                                                 "import_limit": import_limit,
-                                                 "channel_layout": channel_layout,
-                                                 "alex_first_frame": alex_first_frame,
-                                                 "image_shape": image_shape,
-                                                 "dtype": dtype,}
+        channel_ref = f"{excitation}{emission}"
 
+        channel_dict = {"data": image,
+                        "path": path,
+                        "channel_ref": channel_ref,
+                        "excitation": excitation,
+                        "emission": emission,
+                        "channel_layout": channel_layout,
+                        "alex_first_frame": alex_first_frame,
+                        "FRET": fret,
+                        "import_mode": import_mode,
+                        "gap_label": None,
+                        "sequence_label": None,
+                        "provenance": [{"stage": "import",
+                                        "params": {"path": path,
+                                                   "import_mode": import_mode,
+                                                   "channel_layout": channel_layout,
+                                                   "alex_first_frame": alex_first_frame,
+                                                   "frame_window": self.gui.molseeq_import_frames.text(),
+                                                   "crop": self.gui.molseeq_import_crop.text(),
+                                                   "import_limit": self.gui.molseeq_import_limt.currentText()}}],
+                        }
+
+        return channel_dict
+
+    def add_import_dataset(self, dataset_name, image_dict):
+
+        if dataset_name not in self.dataset_dict.keys():
+            self.dataset_dict[dataset_name] = image_dict
+        else:
+            for channel_name, channel_dict in image_dict.items():
+                self.dataset_dict[dataset_name][channel_name] = channel_dict
+
+    def get_memmap_image(self, path):
+
+        image = None
+
+        try:
+
+            base, ext = os.path.splitext(path)
+
+            if ext.lower() in [".tif", ".tiff"]:
+
+                image = tifffile.memmap(path, mode="r")
+
+                if image.dtype.isnative == False:
+                    # numba/shared memory consumers require native byte order
+                    print(f"Cannot memory map {path}, non-native byte order")
+                    image = None
+                elif image.ndim == 2:
+                    image = image[np.newaxis]
+                elif image.ndim != 3:
+                    print(f"Cannot memory map {path}, unsupported image shape {image.shape}")
+                    image = None
+
+        except ValueError:
+            # compressed or non-contiguous pages cannot be memory mapped
+            print(f"Cannot memory map {path}, image data is not contiguous")
+            image = None
         except:
             print(traceback.format_exc())
+            image = None
 
-        return image_list, shared_images, import_dict
+        return image
 
-    def populate_import_compute_jobs(self, image_list):
+    def get_memmap_channel_images(self, image, import_mode, import_limit,
+            channel_layout, alex_first_frame, frame_window=slice(None), crop=None):
 
-        if self.verbose:
-            print(f"Populating import compute jobs.")
+        channel_images = {}
 
-        compute_jobs = []
+        n_frames, height, width = image.shape
 
-        for image_dict in image_list:
+        # split width the same way as np.array_split(img, 2, axis=-1)
+        split_index = width - (width // 2)
 
-            frame_list = np.unique(image_dict["frame_list"])
-            channel_list = image_dict["channel_list"]
-            channel_frame_list = image_dict["channel_frame_list"]
+        if channel_layout.lower() == "donor-acceptor":
+            emission_names = ["d", "a"]
+        else:
+            emission_names = ["a", "d"]
 
-            compute_jobs.append({"frame_list": frame_list,
-                                 "channel_list": channel_list,
-                                 "channel_frame_list": channel_frame_list,
-                                 "stop_event": self.stop_event,
-                                 **image_dict})
+        if import_mode in ["donor", "acceptor", "dd", "da", "ad", "aa"]:
 
-        return compute_jobs
+            channel_images[import_mode] = image[frame_window][:import_limit]
 
-    def process_compute_jobs(self, compute_jobs, progress_callback=None):
+        elif import_mode == "single channel":
 
-        if self.verbose:
-            print(f"Processing {len(compute_jobs)} compute jobs.")
+            channel_images["data"] = image[frame_window][:import_limit]
 
-        cpu_count = int(multiprocessing.cpu_count() * 0.75)
-        timeout_duration = 10  # Timeout in seconds
+        elif import_mode == "fret":
+
+            if channel_layout.lower() == "donor-acceptor":
+                channel_names = ["donor", "acceptor"]
+            else:
+                channel_names = ["acceptor", "donor"]
 
-        with Manager() as manager:
-            progress_dict = manager.dict()
+            image = image[frame_window][:import_limit]
 
-            with concurrent.futures.ProcessPoolExecutor(max_workers=cpu_count) as executor:
+            channel_images[channel_names[0]] = image[:, :, :split_index]
+            channel_images[channel_names[1]] = image[:, :, split_index:]
 
-                # Submit all jobs and store the future objects
-                futures = [executor.submit(import_image_data, job, progress_dict, i) for i, job in enumerate(compute_jobs)]
+        elif import_mode == "alex":
 
-                while any(not future.done() for future in futures):
-                    # Calculate and emit progress
-                    total_progress = sum(progress_dict.values())
-                    overall_progress = int((total_progress / len(compute_jobs)))
-                    if progress_callback is not None:
-                        progress_callback.emit(overall_progress)
-                    time.sleep(0.1)  # Update frequency
+            if alex_first_frame.lower() == "donor":
+                excitation_names = ["d", "a"]
+            else:
+                excitation_names = ["a", "d"]
 
-                # Wait for all futures to complete
-                concurrent.futures.wait(futures)
+            n_channel_frames = n_frames // 2
 
-                # Retrieve and process results
-                results = [future.result() for future in futures]
+            for frame_offset, excitation in enumerate(excitation_names):
 
-        if self.verbose:
-            print("Finished processing compute jobs.")
+                excitation_image = image[frame_offset::2][:n_channel_frames]
+                excitation_image = excitation_image[frame_window][:import_limit]
+
+                left_channel = f"{excitation}{emission_names[0]}"
+                right_channel = f"{excitation}{emission_names[1]}"
+
+                channel_images[left_channel] = excitation_image[:, :, :split_index]
+                channel_images[right_channel] = excitation_image[:, :, split_index:]
+
+        # crop the channel views (read-only) with the same channel crop as imported stacks
+        y0, y1, x0, x1 = get_channel_crop(image.shape, import_mode, crop)
+
+        for channel_name, channel_image in channel_images.items():
+            channel_images[channel_name] = channel_image[:, y0:y1, x0:x1]
+
+        return channel_images
 
-    def populate_import_dataset_dict(self, import_dict):
+    def populate_memmap_dataset_dict(self, paths=[]):
+
+        unmapped_paths = []
 
         try:
 
-            concat_images = self.gui.molseeq_concatenate.isChecked()
+            if self.verbose:
+                print("Memory mapping images...")
+
+            import_mode = self.gui.molseeq_import_mode.currentText().lower()
+            import_limit_combo = self.gui.molseeq_import_limt.currentText()
+            channel_layout = self.gui.molseeq_channel_layout.currentText()
+            alex_first_frame = self.gui.molseeq_alex_first_frame.currentText()
+
+            if import_limit_combo != "None":
+                import_limit = int(import_limit_combo)
+            else:
+                import_limit = None
+
+            frame_window = self.get_import_frame_window()
+            crop = self.get_import_crop()
+
+            for path in paths:
+
+                import_path = self.format_import_path(path)
+
+                image = self.get_memmap_image(import_path)
+
+                if image is None:
+                    unmapped_paths.append(path)
+                    continue
+
+                if self.gui.molseeq_append.isChecked():
+                    dataset_name = self.gui.molseeq_append_dataset.currentText()
+                else:
+                    dataset_name = os.path.basename(import_path)
+
+                channel_images = self.get_memmap_channel_images(image, import_mode,
+                    import_limit, channel_layout, alex_first_frame,
+                    frame_window=frame_window, crop=crop)
+
+                image_dict = {}
+
+                for channel_name, channel_image in channel_images.items():
+                    image_dict[channel_name] = self.populate_channel_dict(channel_image,
+                        channel_name, import_path, import_mode, channel_layout, alex_first_frame)
+
+                self.add_import_dataset(dataset_name, image_dict)
+
+        except:
+            print(traceback.format_exc())
+
+        return unmapped_paths
+
+    def populate_streaming_dataset_dict(self, import_dict):
+
+        self.import_frames_done = {}
+        self.import_frame_offsets = {}
+        self.import_in_place = {}
+
+        import_lazy = self.get_import_lazy()
+
+        try:
 
             if self.verbose:
-                print("Populating dataset dict")
+                print("Preallocating streaming dataset dict")
 
             for dataset_name, dataset_dict in import_dict.items():
 
@@ -495,91 +995,148 @@ class _import_utils:
 
                 path = dataset_dict["path"]
                 image_shape = dataset_dict["image_shape"]
-                dtype = dataset_dict["dtype"]
                 import_mode = dataset_dict["import_mode"]
                 channel_layout = dataset_dict["channel_layout"]
                 alex_first_frame = dataset_dict["alex_first_frame"]
+                concat_images = dataset_dict["concatenate"]
 
-                dataset_images = self.shared_images[dataset_name]
+                self.import_frames_done[dataset_name] = {}
+                self.import_frame_offsets[dataset_name] = {}
+                self.import_in_place[dataset_name] = {}
 
-                channel_names = dataset_images.keys()
+                for channel_name in self.shared_images[dataset_name].keys():
 
-                for channel_name, shared_mem in dataset_images.items():
+                    frame_offset = 0
 
-                    image = np.ndarray(image_shape, dtype=dtype, buffer=shared_mem.buf).copy()
-                    image = image.astype(np.uint16)
+                    if (concat_images and dataset_name in self.dataset_dict.keys()
+                            and channel_name in self.dataset_dict[dataset_name].keys()):
 
-                    shared_mem.close()
-                    shared_mem.unlink()
+                        # concatenating onto an existing channel, new frames are written after its frames
+                        channel_dict = self.dataset_dict[dataset_name][channel_name]
+                        dataset_image = channel_dict["data"]
 
-                    if channel_name not in image_dict.keys():
-                        image_dict[channel_name] = {"data": []}
+                        if dataset_image.shape[1:] != tuple(image_shape[1:]):
+                            print(f"Cannot concatenate {channel_name} onto {dataset_name}, image shape does not match")
+                            self.import_frame_offsets[dataset_name][channel_name] = None
+                            continue
 
-                    if channel_name.lower() in ["donor", "acceptor"]:
-                        channel_display_name = channel_name.capitalize()
-                    else:
-                        channel_display_name = channel_name.upper()
+                        frame_offset = dataset_image.shape[0]
 
-                    if channel_name in ["donor", "acceptor", "da", "dd"]:
-                        excitation = "d"
-                    else:
-                        excitation = "a"
+                        image = self.create_channel_array((frame_offset + image_shape[0], *image_shape[1:]),
+                            np.uint16, lazy=import_lazy or is_lazy_array(dataset_image))
+                        image[:frame_offset] = dataset_image
 
-                    if channel_name in ["donor", "ad", "dd"]:
-                        emission = "d"
-                    else:
-                        emission = "a"
+                        channel_dict["data"] = image
+
+                        self.record_image_stage(dataset_name, channel_name, "concatenate", {"path": path})
 
-                    if import_mode.lower() == "fret":
-                        fret = True
-                    else:
-                        fret = False
-
-                    channel_ref = f"{excitation}{emission}"
-
-                    image_dict[channel_name]["data"] = image
-                    image_dict[channel_name]["path"] = path
-                    image_dict[channel_name]["channel_ref"] = channel_ref
-                    image_dict[channel_name]["excitation"] = excitation
-                    image_dict[channel_name]["emission"] = emission
-                    image_dict[channel_name]["channel_layout"] = channel_layout
-                    image_dict[channel_name]["alex_first_frame"] = alex_first_frame
-                    image_dict[channel_name]["FRET"] = fret
-                    image_dict[channel_name]["import_mode"] = import_mode
-                    image_dict[channel_name]["gap_label"] = None
-                    image_dict[channel_name]["sequence_label"] = None
-
-                if concat_images == False:
-
-                    if dataset_name not in self.dataset_dict.keys():
-                        self.dataset_dict[dataset_name] = image_dict
                     else:
-                        for channel_name, channel_dict in image_dict.items():
-                            self.dataset_dict[dataset_name][channel_name] = channel_dict
 
-                else:
-                    dataset_name = list(import_dict.keys())[0]
+                        # the import workers write directly into this image, no copy is needed
+                        shared_image = self.shared_images[dataset_name][channel_name]
+
+                        if import_lazy:
+                            image = open_lazy_array(shared_image, image_shape, np.uint16)
+                        else:
+                            image = self.get_shared_image_store().blocks[shared_image.name].array
+
+                        self.import_in_place[dataset_name][channel_name] = True
+
+                        channel_dict = self.populate_channel_dict(image,
+                            channel_name, path, import_mode, channel_layout, alex_first_frame)
+
+                        image_dict[channel_name] = channel_dict
+
+                    channel_dict["frames_available"] = frame_offset
+
+                    self.import_frames_done[dataset_name][channel_name] = np.zeros(image_shape[0], dtype=bool)
+                    self.import_frame_offsets[dataset_name][channel_name] = frame_offset
+
+                self.add_import_dataset(dataset_name, image_dict)
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def copy_import_blocks(self, compute_jobs, preview_callback=None):
+
+        updated_datasets = []
+
+        try:
+
+            if self.stop_event.is_set():
+                return
+
+            for job in compute_jobs:
+
+                dataset_name = job["dataset_name"]
+                channel_list = job["channel_list"]
+                channel_frame_list = job["channel_frame_list"]
+
+                for channel_name, shared_mem in job["channel_images"].items():
+
+                    channel_frames = [channel_frame for channel_frame, channels
+                                      in zip(channel_frame_list, channel_list) if channel_name in channels]
+
+                    frame_offset = self.import_frame_offsets[dataset_name][channel_name]
+
+                    if len(channel_frames) == 0 or frame_offset is None:
+                        continue
+
+                    channel_frames = np.asarray(channel_frames)
+
+                    channel_dict = self.dataset_dict[dataset_name][channel_name]
+
+                    if self.import_in_place[dataset_name].get(channel_name, False) == False:
 
-                    if dataset_name not in self.dataset_dict.keys():
-                        self.dataset_dict[dataset_name] = image_dict
+                        if isinstance(shared_mem, str):
+                            shared_image = open_lazy_array(shared_mem, job["image_shape"], job["dtype"])
+                        else:
+                            shared_image = np.ndarray(job["image_shape"], dtype=job["dtype"], buffer=shared_mem.buf)
+
+                        channel_dict["data"][channel_frames + frame_offset] = shared_image[channel_frames]
+
+                    # frames available is the length of the contiguous imported run from frame 0
+                    frames_done = self.import_frames_done[dataset_name][channel_name]
+                    frames_done[channel_frames] = True
+
+                    if np.all(frames_done):
+                        frames_available = len(frames_done)
                     else:
-                        for channel_name, channel_dict in image_dict.items():
-                            if channel_name not in self.dataset_dict[dataset_name].keys():
-                                self.dataset_dict[dataset_name][channel_name] = channel_dict
-                            else:
-                                dataset_image = self.dataset_dict[dataset_name][channel_name]["data"]
-                                new_image = image_dict[channel_name]["data"]
+                        frames_available = int(np.argmin(frames_done))
 
-                                if dataset_image.shape[1:] == new_image.shape[1:]:
+                    channel_dict["frames_available"] = frame_offset + frames_available
 
-                                    dataset_image = np.concatenate([dataset_image, new_image], axis=0)
+                if dataset_name not in updated_datasets:
+                    updated_datasets.append(dataset_name)
 
-                                    self.dataset_dict[dataset_name][channel_name]["data"] = dataset_image
+            if preview_callback is not None:
+                for dataset_name in updated_datasets:
+                    preview_callback.emit(dataset_name)
 
         except:
             print(traceback.format_exc())
             pass
 
+    def finalise_streaming_dataset_dict(self):
+
+        if hasattr(self, "import_frames_done"):
+
+            for dataset_name, dataset_frames in self.import_frames_done.items():
+                for channel_name, frames_done in dataset_frames.items():
+
+                    if self.import_frame_offsets[dataset_name][channel_name] is None:
+                        continue
+
+                    channel_dict = self.dataset_dict[dataset_name][channel_name]
+
+                    if np.all(frames_done) and "frames_available" in channel_dict.keys():
+                        channel_dict.pop("frames_available")
+
+            self.import_frames_done = {}
+            self.import_frame_offsets = {}
+            self.import_in_place = {}
+
     def closed_import_shared_images(self):
 
         if hasattr(self, "shared_images"):
@@ -589,22 +1146,42 @@ class _import_utils:
 
             for dataset_name, dataset_dict in self.shared_images.items():
                 for channel_name, shared_mem in dataset_dict.items():
-                    shared_mem.close()
-                    shared_mem.unlink()
+                    if isinstance(shared_mem, str):
+                        remove_lazy_array_file(shared_mem)
 
-    def _molseeq_import_data(self, progress_callback=None, paths=[]):
+            self.shared_images = {}
+
+            # arena blocks that were not kept as channel data (e.g. concatenated) are released
+            self.release_unused_shared_images()
+
+    def _molseeq_import_data(self, progress_callback=None, paths=[], preview_callback=None):
 
         try:
 
-            image_list, self.shared_images, import_dict = self.populate_import_lists(paths=paths)
+            if self.gui.molseeq_import_memmap.isChecked():
+                if self.gui.molseeq_concatenate.isChecked():
+                    print("Memory mapping is not supported when concatenating files, importing into memory")
+                else:
+                    paths = self.populate_memmap_dataset_dict(paths=paths)
+
+            if len(paths) > 0:
+
+                image_list, self.shared_images, import_dict = self.populate_import_lists(paths=paths)
+
+                compute_jobs = self.populate_import_compute_jobs(image_list)
 
-            compute_jobs = self.populate_import_compute_jobs(image_list)
+                # frames are copied into the dataset dict as each block completes
+                self.populate_streaming_dataset_dict(import_dict)
 
-            self.process_compute_jobs(compute_jobs, progress_callback=progress_callback)
+                block_callback = partial(self.copy_import_blocks,
+                    preview_callback=preview_callback)
 
-            self.populate_import_dataset_dict(import_dict)
+                self.process_compute_jobs(compute_jobs, progress_callback=progress_callback,
+                    block_callback=block_callback)
 
-            self.closed_import_shared_images()
+                self.finalise_streaming_dataset_dict()
+
+                self.closed_import_shared_images()
 
         except:
             print(traceback.format_exc())
@@ -748,6 +1325,30 @@ class _import_utils:
 
                 self.localisation_dict["localisations"][dataset_name] = fiducial_dict
 
+    def _molseeq_import_data_preview(self, dataset_name):
+
+        try:
+
+            if self.gui.molseeq_dataset_selector.findText(dataset_name) == -1:
+
+                if self.verbose:
+                    print(f"Showing import preview for {dataset_name}")
+
+                self.initialise_localisation_dict()
+                self.populate_dataset_combos()
+
+                self.update_channel_select_buttons()
+                self.populate_channel_selectors()
+                self.update_active_image(dataset=dataset_name)
+
+            elif self.active_dataset == dataset_name and hasattr(self, "image_layer"):
+
+                self.image_layer.refresh()
+
+        except:
+            print(traceback.format_exc())
+            pass
+
     def _molseeq_import_data_finished(self):
 
         if self.verbose:
@@ -770,6 +1371,9 @@ class _import_utils:
 
     def molseeq_import_data(self):
 
+        from molseeq.funcs.qt_worker import Worker
+        from qtpy.QtWidgets import QFileDialog
+
         try:
 
             append_dataset = self.gui.molseeq_append_dataset.currentText()
@@ -779,7 +1383,7 @@ class _import_utils:
             else:
 
                 desktop = os.path.expanduser("~/Desktop")
-                paths = QFileDialog.getOpenFileNames(self, 'Open file', desktop, "Image files (*.tif *.fits)")[0]
+                paths = QFileDialog.getOpenFileNames(self, 'Open file', desktop, "Image files (*.tif *.tiff *.fits)")[0]
 
                 paths = [path for path in paths if path != ""]
 
@@ -788,6 +1392,8 @@ class _import_utils:
                     self.update_ui(init=True)
 
                     self.worker = Worker(self._molseeq_import_data, paths=paths)
+                    self.worker.kwargs["preview_callback"] = self.worker.signals.preview
+                    self.worker.signals.preview.connect(self._molseeq_import_data_preview)
                     self.worker.signals.progress.connect(partial(self.molseeq_progress,
                         progress_bar=self.gui.molseeq_import_progressbar))
                     self.worker.signals.finished.connect(self._molseeq_import_data_finished)
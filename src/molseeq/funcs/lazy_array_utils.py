@@ -0,0 +1,316 @@
+import traceback
+import numpy as np
+import os
+import tempfile
+import uuid
+
+LAZY_ARRAY_DIR = os.path.join(os.path.expanduser("~"), ".molseeq", "lazy_arrays")
+
+# maximum size of a block of lazy image data that is loaded into RAM/shared memory at once
+LAZY_BLOCK_BYTES = 512 * 1024 ** 2
+
+
+def is_lazy_array(image):
+
+    if isinstance(image, (np.memmap, H5LazyArray)):
+        return True
+
+    # dask (or other chunked) arrays, duck typed so dask stays optional
+    if hasattr(image, "compute") and hasattr(image, "chunks"):
+        return True
+
+    return False
+
+
+class H5LazyArray:
+
+    # read only array backed by a chunked/compressed h5 dataset, chunks are read and decompressed
+    # as blocks of frames are indexed, rather than when the file is loaded
+
+    def __init__(self, path, name, shape, dtype, chunks=None):
+
+        self.path = path
+        self.name = name
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = np.dtype(dtype)
+        self.chunks = chunks
+
+        self.h5_file = None
+
+    @classmethod
+    def from_dataset(cls, path, dataset):
+
+        return cls(path, dataset.name, dataset.shape, dataset.dtype, dataset.chunks)
+
+    @property
+    def ndim(self):
+
+        return len(self.shape)
+
+    @property
+    def size(self):
+
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+
+        return self.size * self.dtype.itemsize
+
+    def get_dataset(self):
+
+        # the file is opened on first read and stays open for the lifetime of the array
+        if self.h5_file is None:
+            import h5py
+            self.h5_file = h5py.File(self.path, "r")
+
+        return self.h5_file[self.name]
+
+    def __getitem__(self, index):
+
+        try:
+            return self.get_dataset()[index]
+        except (TypeError, ValueError):
+            # selections h5py cannot read directly (negative steps, unsorted indices etc.)
+            return self.compute()[index]
+
+    def __len__(self):
+
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+
+        array = self.compute()
+
+        if dtype is not None:
+            array = array.astype(dtype)
+
+        return array
+
+    def compute(self):
+
+        return self.get_dataset()[()]
+
+    def copy(self):
+
+        return self.compute()
+
+    def close(self):
+
+        if self.h5_file is not None:
+            self.h5_file.close()
+            self.h5_file = None
+
+    def __getstate__(self):
+
+        # open h5 files do not pickle, the file is reopened by the receiving process
+        state = self.__dict__.copy()
+        state["h5_file"] = None
+
+        return state
+
+
+def read_lazy_block(image, frame_range=None, row_range=None):
+
+    if frame_range is None:
+        frame_range = [0, image.shape[0]]
+    if row_range is None:
+        row_range = [0, image.shape[1]]
+
+    block = image[frame_range[0]:frame_range[1], row_range[0]:row_range[1]]
+
+    # loads memmap/dask/h5 blocks into RAM
+    return np.array(block)
+
+
+def create_lazy_array(shape, dtype, path=None):
+
+    os.makedirs(LAZY_ARRAY_DIR, exist_ok=True)
+
+    shape = tuple(int(dim) for dim in shape)
+
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+
+    if path is None:
+        # the temporary file is removed by the os once the memmap is released
+        path = tempfile.TemporaryFile(dir=LAZY_ARRAY_DIR, suffix=".dat")
+
+    return np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+
+
+def get_lazy_array_path():
+
+    os.makedirs(LAZY_ARRAY_DIR, exist_ok=True)
+
+    return os.path.join(LAZY_ARRAY_DIR, f"{uuid.uuid4().hex}.dat")
+
+
+def open_lazy_array(path, shape, dtype):
+
+    shape = tuple(int(dim) for dim in shape)
+
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+def remove_lazy_array_file(path):
+
+    try:
+        # open memmaps keep their data until released (posix), windows keeps mapped files
+        os.remove(path)
+    except:
+        pass
+
+
+def get_lazy_block_size(frame_bytes, block_bytes=LAZY_BLOCK_BYTES):
+
+    return max(1, int(block_bytes // max(1, frame_bytes)))
+
+
+class _lazy_array_utils:
+
+    def is_lazy_image(self, dataset, channel):
+
+        lazy_image = False
+
+        try:
+            lazy_image = is_lazy_array(self.dataset_dict[dataset][channel]["data"])
+        except:
+            pass
+
+        return lazy_image
+
+    def get_lazy_images(self, dataset_list=None, channel_list=None):
+
+        lazy_images = []
+
+        if dataset_list is None:
+            dataset_list = list(self.dataset_dict.keys())
+
+        for dataset_name in dataset_list:
+            if dataset_name not in self.dataset_dict.keys():
+                continue
+            for channel_name in self.dataset_dict[dataset_name].keys():
+                if channel_list is None or channel_name in channel_list:
+                    if self.is_lazy_image(dataset_name, channel_name):
+                        lazy_images.append([dataset_name, channel_name])
+
+        return lazy_images
+
+    def get_import_lazy(self):
+
+        import_lazy = False
+
+        try:
+            import_lazy = self.gui.molseeq_import_lazy.isChecked()
+        except:
+            pass
+
+        return import_lazy
+
+    def create_channel_array(self, shape, dtype, lazy=False):
+
+        if lazy:
+            image = create_lazy_array(shape, dtype)
+        else:
+            image = np.zeros(shape, dtype=dtype)
+
+        return image
+
+    def get_writable_image(self, dataset, channel):
+
+        channel_dict = self.dataset_dict[dataset][channel]
+
+        image = channel_dict["data"]
+
+        writable = isinstance(image, np.ndarray) and image.flags.writeable
+
+        if writable == False:
+
+            if self.verbose:
+                print(f"Copying read only image {dataset} {channel} to a lazy array")
+
+            # read only memmaps/dask arrays are copied block by block to a writable lazy array
+            lazy_image = create_lazy_array(image.shape, image.dtype)
+
+            frame_bytes = int(np.prod(image.shape[1:])) * np.dtype(image.dtype).itemsize
+            block_size = get_lazy_block_size(frame_bytes)
+
+            for start_index in range(0, image.shape[0], block_size):
+                end_index = min(start_index + block_size, image.shape[0])
+                lazy_image[start_index:end_index] = read_lazy_block(image, [start_index, end_index])
+
+            channel_dict["data"] = lazy_image
+            image = lazy_image
+
+        return image
+
+    def get_lazy_frame_blocks(self, dataset_list=None, channel_list=None, block_bytes=LAZY_BLOCK_BYTES):
+
+        frame_blocks = []
+
+        try:
+
+            if dataset_list is None:
+                dataset_list = list(self.dataset_dict.keys())
+
+            n_frames = 0
+            frame_bytes = 0
+
+            for dataset_name in dataset_list:
+                if dataset_name not in self.dataset_dict.keys():
+                    continue
+                for channel_name, channel_dict in self.dataset_dict[dataset_name].items():
+                    if channel_list is None or channel_name in channel_list:
+                        image = channel_dict["data"]
+                        n_frames = max(n_frames, self.get_frames_available(dataset_name, channel_name))
+                        frame_bytes += int(np.prod(image.shape[1:])) * np.dtype(image.dtype).itemsize
+
+            # blocks are shared across all images, so one block of every image fits in the budget
+            block_size = get_lazy_block_size(frame_bytes, block_bytes)
+
+            for start_index in range(0, n_frames, block_size):
+                frame_blocks.append([start_index, min(start_index + block_size, n_frames)])
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+        return frame_blocks
+
+    def get_lazy_row_blocks(self, dataset_list=None, channel_list=None, block_bytes=LAZY_BLOCK_BYTES):
+
+        row_blocks = []
+
+        try:
+
+            if dataset_list is None:
+                dataset_list = list(self.dataset_dict.keys())
+
+            n_rows = 0
+            row_bytes = 0
+
+            for dataset_name in dataset_list:
+                if dataset_name not in self.dataset_dict.keys():
+                    continue
+                for channel_name, channel_dict in self.dataset_dict[dataset_name].items():
+                    if channel_list is None or channel_name in channel_list:
+                        image = channel_dict["data"]
+                        n_frames, height, width = image.shape
+                        n_rows = max(n_rows, height)
+                        row_bytes += n_frames * width * np.dtype(image.dtype).itemsize
+
+            # rows span every frame, for stages that need the full time series of each pixel
+            block_size = get_lazy_block_size(row_bytes, block_bytes)
+
+            for start_index in range(0, n_rows, block_size):
+                row_blocks.append([start_index, min(start_index + block_size, n_rows)])
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+        return row_blocks
@@ -1,4 +1,3 @@
-from molseeq.funcs.utils_compute import Worker
 from functools import partial
 from concurrent.futures import ThreadPoolExecutor
 import concurrent
@@ -10,8 +9,8 @@ import shutil
 from pathlib import Path
 import traceback
 import numpy as np
-from qtpy.QtWidgets import QFileDialog
 import pandas as pd
+from molseeq.funcs.localisation_table import LocalisationTable
 
 class picasso_loc_utils():
 
@@ -348,6 +347,9 @@ class _loc_utils():
 
     def import_picaaso_localisations(self):
 
+        from molseeq.funcs.qt_worker import Worker
+        from qtpy.QtWidgets import QFileDialog
+
         try:
 
             dataset = self.gui.import_picasso_dataset.currentText()
@@ -422,6 +424,7 @@ class _loc_utils():
             export_loc_mode = self.gui.locs_export_mode.currentText()
 
             export_loc_jobs = []
+            export_paths = []
 
             if export_dataset == "All Datasets":
                 dataset_list = list(self.dataset_dict.keys())
@@ -535,12 +538,20 @@ class _loc_utils():
                         if progress_callback is not None:
                             progress_callback.emit(progress)
 
+                for job in export_loc_jobs:
+                    if job["export_mode"] == "Picasso HDF5":
+                        export_paths.extend([job["hdf5_path"], job["info_path"]])
+                    elif job["export_path"] != "":
+                        export_paths.append(job["export_path"])
 
         except:
             self.update_ui()
             print(traceback.format_exc())
+            export_paths = []
             pass
 
+        return export_paths
+
 
     def export_locs_finished(self):
 
@@ -556,6 +567,8 @@ class _loc_utils():
 
     def initialise_export_locs(self, event=None, export_dataset = "", export_channel = ""):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             if export_dataset == "" or export_dataset not in self.dataset_dict.keys():
@@ -574,6 +587,24 @@ class _loc_utils():
             self.update_ui()
             pass
 
+    def get_localisation_centres(self, locs, mode = "localisations"):
+
+        loc_centres = []
+
+        try:
+
+            for loc in locs:
+                frame = int(loc.frame)
+                if mode == "localisations":
+                    loc_centres.append([frame, loc.y, loc.x])
+                else:
+                    loc_centres.append([loc.y, loc.x])
+
+        except:
+            print(traceback.format_exc())
+
+        return loc_centres
+
     def get_loc_dict(self, dataset_name="", channel_name="", type = "localisations"):
 
         loc_dict = {}
@@ -612,6 +643,34 @@ class _loc_utils():
         return loc_dict, n_localisations, fitted
 
 
+    def get_loc_table(self, dataset_name="", channel_name="", type = "localisations"):
+
+        # frame indexed table of the stored locs, rebuilt only when the stored locs are replaced
+        loc_table = LocalisationTable({})
+
+        try:
+
+            loc_dict, n_locs, fitted = self.get_loc_dict(dataset_name, channel_name, type=type)
+
+            locs = loc_dict.get("localisations", [])
+
+            if hasattr(self, "loc_table_cache") == False:
+                self.loc_table_cache = {}
+
+            cache_key = (type.lower(), dataset_name, channel_name)
+            cached_locs, loc_table = self.loc_table_cache.get(cache_key, (None, None))
+
+            if cached_locs is not locs or loc_table is None or len(loc_table) != len(locs):
+                loc_table = LocalisationTable.from_records(locs)
+                self.loc_table_cache[cache_key] = (locs, loc_table)
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+        return loc_table
+
+
     def update_loc_dict(self, dataset_name="", channel_name="", type = "localisations", loc_dict = {}):
 
         try:
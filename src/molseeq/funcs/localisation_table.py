@@ -0,0 +1,248 @@
+import numpy as np
+
+# fields stored as integer codes into a list of values, rather than as a string per localisation
+CATEGORICAL_FIELDS = ["dataset", "channel"]
+
+
+class LocalisationTable:
+
+    # struct of arrays localisation store. columns are plain numpy arrays (views of the source records
+    # where possible), categorical columns hold codes. rows keep their insertion order, frames are indexed
+    # with CSR style frame_offsets, so frame slicing does not scan the table
+
+    def __init__(self, columns, categories=None):
+
+        self.columns = dict(columns)
+        self.categories = dict(categories or {})
+
+        self._frame_index = None
+
+    @classmethod
+    def from_records(cls, locs, **fields):
+
+        # fields (e.g. dataset="name") are added as constant categorical columns before the record fields
+        columns = {}
+        categories = {}
+
+        n_locs = len(locs)
+
+        for name, value in fields.items():
+            columns[name] = np.zeros(n_locs, dtype=np.int32)
+            categories[name] = [value]
+
+        if getattr(locs, "dtype", None) is not None and locs.dtype.names is not None:
+
+            locs = np.asarray(locs)
+
+            for name in locs.dtype.names:
+
+                if name in fields.keys():
+                    continue
+
+                if name in CATEGORICAL_FIELDS:
+                    values, codes = np.unique(locs[name].astype(str), return_inverse=True)
+                    columns[name] = codes.astype(np.int32)
+                    categories[name] = [str(value) for value in values]
+                else:
+                    columns[name] = locs[name]
+
+        return cls(columns, categories)
+
+    @classmethod
+    def concatenate(cls, tables):
+
+        tables = [table for table in tables if table is not None]
+
+        if len(tables) == 0:
+            return cls({})
+
+        names = tables[0].names
+        columns = {}
+        categories = {}
+
+        for name in names:
+
+            if name in tables[0].categories.keys():
+
+                values = []
+                for table in tables:
+                    values.extend([value for value in table.categories[name] if value not in values])
+
+                # codes of each table are remapped onto the combined categories
+                codes = [np.array([values.index(value) for value in table.categories[name]],
+                                  dtype=np.int32)[table.columns[name]] for table in tables]
+
+                columns[name] = np.concatenate(codes)
+                categories[name] = values
+
+            else:
+                columns[name] = np.concatenate([table.columns[name] for table in tables])
+
+        return cls(columns, categories)
+
+    @property
+    def names(self):
+
+        return list(self.columns.keys())
+
+    def __len__(self):
+
+        if len(self.columns) == 0:
+            return 0
+
+        return len(next(iter(self.columns.values())))
+
+    def __getattr__(self, name):
+
+        columns = self.__dict__.get("columns", {})
+
+        if name not in columns.keys():
+            raise AttributeError(name)
+
+        return self.get_column(name)
+
+    def __getitem__(self, key):
+
+        if type(key) == str:
+            return self.get_column(key)
+
+        columns = {name: column[key] for name, column in self.columns.items()}
+
+        return LocalisationTable(columns, self.categories)
+
+    def get_column(self, name):
+
+        column = self.columns[name]
+
+        if name in self.categories.keys():
+            column = np.array(self.categories[name], dtype=object)[column]
+
+        return column
+
+    def set_column(self, name, values):
+
+        self.columns[name] = np.asarray(values)
+
+        if name == "frame":
+            self._frame_index = None
+
+    def get_values(self, name):
+
+        # categorical values that are present in the table
+        if name not in self.categories.keys():
+            return list(np.unique(self.columns[name]))
+
+        codes = np.unique(self.columns[name])
+
+        return [self.categories[name][code] for code in codes]
+
+    def select(self, **fields):
+
+        mask = np.ones(len(self), dtype=bool)
+
+        for name, value in fields.items():
+
+            if name in self.categories.keys():
+                if value in self.categories[name]:
+                    mask &= self.columns[name] == self.categories[name].index(value)
+                else:
+                    mask[:] = False
+            else:
+                mask &= self.columns[name] == value
+
+        return self[mask]
+
+    def copy(self):
+
+        columns = {name: column.copy() for name, column in self.columns.items()}
+
+        return LocalisationTable(columns, {name: list(values) for name, values in self.categories.items()})
+
+    def get_frame_index(self):
+
+        # (frame_order, frame_offsets), frame_order is None for frame sorted tables
+        if self._frame_index is None:
+
+            if "frame" not in self.columns.keys() or len(self) == 0:
+                frames = np.zeros(len(self), dtype=np.int64)
+            else:
+                frames = self.columns["frame"].astype(np.int64)
+
+            if len(frames) < 2 or np.all(frames[1:] >= frames[:-1]):
+                frame_order = None
+            else:
+                frame_order = np.argsort(frames, kind="stable")
+                frames = frames[frame_order]
+
+            n_frames = int(frames[-1]) + 1 if len(frames) > 0 else 0
+
+            frame_offsets = np.zeros(n_frames + 1, dtype=np.int64)
+            frame_offsets[1:] = np.cumsum(np.bincount(frames, minlength=n_frames))
+
+            self._frame_index = (frame_order, frame_offsets)
+
+        return self._frame_index
+
+    @property
+    def frame_offsets(self):
+
+        frame_order, frame_offsets = self.get_frame_index()
+
+        return frame_offsets
+
+    def get_frames(self, start_index, end_index):
+
+        # rows of frames start_index to end_index (inclusive), views of the table when it is frame sorted
+        frame_order, frame_offsets = self.get_frame_index()
+
+        n_frames = len(frame_offsets) - 1
+
+        start_index = min(max(int(start_index), 0), n_frames)
+        end_index = min(max(int(end_index) + 1, start_index), n_frames)
+
+        rows = slice(frame_offsets[start_index], frame_offsets[end_index])
+
+        if frame_order is not None:
+            rows = frame_order[rows]
+
+        return self[rows]
+
+    def get_frame(self, frame_index):
+
+        return self.get_frames(frame_index, frame_index)
+
+    def has_frame(self, frame_index):
+
+        frame_offsets = self.frame_offsets
+
+        if frame_index < 0 or frame_index >= len(frame_offsets) - 1:
+            return False
+
+        return frame_offsets[frame_index + 1] > frame_offsets[frame_index]
+
+    def sort_by_frame(self):
+
+        frame_order, frame_offsets = self.get_frame_index()
+
+        if frame_order is None:
+            return self
+
+        return self[frame_order]
+
+    def to_records(self, exclude=()):
+
+        names = [name for name in self.names if name not in exclude]
+
+        dtype = []
+        for name in names:
+            if name in self.categories.keys():
+                dtype.append((name, object))
+            else:
+                dtype.append((name, self.columns[name].dtype))
+
+        locs = np.empty(len(self), dtype=dtype)
+
+        for name in names:
+            locs[name] = self.get_column(name)
+
+        return locs.view(np.recarray)
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def get_overlapping_pairs(coordinates, min_distance):
+
+    # index pairs (i < j) of coordinates closer than min_distance, strictly less than as with
+    # the pairwise distance matrix it replaces. coordinates that are not finite have no neighbours
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+
+    pairs = np.empty((0, 2), dtype=np.intp)
+
+    if len(coordinates) > 1 and min_distance > 0:
+
+        finite_indices = np.flatnonzero(np.isfinite(coordinates).all(axis=1))
+
+        if len(finite_indices) > 1:
+
+            finite_coordinates = coordinates[finite_indices]
+
+            tree = cKDTree(finite_coordinates)
+            pairs = tree.query_pairs(r=min_distance, output_type="ndarray")
+
+            if len(pairs) > 0:
+                # query_pairs includes pairs at exactly min_distance
+                diff = finite_coordinates[pairs[:, 0]] - finite_coordinates[pairs[:, 1]]
+                pairs = pairs[np.sum(diff ** 2, axis=1) < min_distance ** 2]
+
+            pairs = finite_indices[pairs].reshape(-1, 2)
+
+    return pairs
+
+
+def get_overlap_mask(coordinates, min_distance):
+
+    # True for every coordinate with another coordinate closer than min_distance
+    overlapping = np.zeros(len(coordinates), dtype=bool)
+
+    pairs = get_overlapping_pairs(coordinates, min_distance)
+
+    overlapping[pairs.ravel()] = True
+
+    return overlapping
@@ -3,60 +3,58 @@ import traceback
 
 import pandas as pd
 
-from molseeq.funcs.utils_compute import Worker
+from molseeq.funcs.shared_memory_utils import SharedProgressCounter
+from molseeq.funcs.gauss_fit import initial_parameters_gpufit
+from molseeq.funcs.fit_backends import get_fit_backend, GAUSS_2D_ELLIPTIC
+from molseeq.funcs.neighbour_utils import get_overlap_mask
+from molseeq.funcs.localisation_table import LocalisationTable, CATEGORICAL_FIELDS
 import time
 import os
 from multiprocessing import shared_memory
-from picasso import localize
 from picasso.localize import get_spots, identify_frame
-from picasso.gaussmle import gaussmle
-from picasso import gausslq
 from picasso import postprocess
 from functools import partial
 import concurrent.futures
 import multiprocessing
 from picasso.render import render
 from shapely.geometry import Point, Polygon
-from multiprocessing import Manager, Event
 import numba
 from numba import jit, types,typed
 from numba.typed import Dict
 import numpy as np
 import pandas as pd
 
+# memory used by a detection job relative to the size of its image chunk (chunk copy, filtered frames etc.)
+DETECT_WORKING_SET = 10
 
+# number of spots per fitting backend call when fitting outside the detection workers
+FIT_BATCH_SPOTS = 50000
 
+# convergence settings of the GAUSS_2D_ELLIPTIC fits, the same for every backend and fit path
+FIT_TOLERANCE = 1e-2
+FIT_MAX_ITERATIONS = 20
 
 
 
-def remove_overlapping_locs(locs, box_size):
 
-    try:
 
-        coordinates = np.vstack((locs.y, locs.x)).T
+def remove_overlapping_locs(locs, box_size):
 
-        # Calculate all pairwise differences
-        diff = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+    non_overlapping_locs = locs
 
-        # Calculate squared distances
-        dist_squared = np.sum(diff ** 2, axis=-1)
+    try:
 
-        # Check if the array is of integer type
-        if coordinates.dtype.kind in 'iu':
-            # Use the maximum integer value for the diagonal if the array is of integer type
-            max_int_value = np.iinfo(coordinates.dtype).max
-            np.fill_diagonal(dist_squared, max_int_value)
-        else:
-            # Use infinity for the diagonal if the array is of float type
-            np.fill_diagonal(dist_squared, np.inf)
+        if len(locs) > 1:
 
-        # Identify overlapping coordinates (distance less than X)
-        overlapping = np.any(dist_squared < box_size ** 2, axis=1)
+            coordinates = np.vstack((locs.y, locs.x)).T
 
-        non_overlapping_locs = locs[~overlapping]
-        non_overlapping_locs = np.array(non_overlapping_locs).view(np.recarray)
+            overlapping = get_overlap_mask(coordinates, box_size)
+
+            non_overlapping_locs = locs[~overlapping]
+            non_overlapping_locs = np.array(non_overlapping_locs).view(np.recarray)
 
     except:
+        print(traceback.format_exc())
         pass
 
     return non_overlapping_locs
@@ -105,20 +103,26 @@ def locs_from_fits(locs, theta, box, em=False, gpu_fit=False):
             bg = theta[:, 3]
             net_gradient = locs.net_gradient
 
-        locs = pd.DataFrame(locs)
-
-        locs["x"] = x
-        locs["y"] = y
-        locs["photons"] = photons
-        locs["sx"] = sx
-        locs["sy"] = sy
-        locs["bg"] = bg
-        locs["lpx"] = lpx
-        locs["lpy"] = lpy
-        locs["ellipticity"] = ellipticity
-        locs["net_gradient"] = net_gradient
-
-        locs = locs.to_records(index=False)
+        if isinstance(locs, LocalisationTable):
+            loc_table = LocalisationTable(locs.columns, locs.categories)
+        else:
+            loc_table = LocalisationTable.from_records(locs)
+
+        loc_table.set_column("x", x)
+        loc_table.set_column("y", y)
+        loc_table.set_column("photons", photons)
+        loc_table.set_column("sx", sx)
+        loc_table.set_column("sy", sy)
+        loc_table.set_column("bg", bg)
+        loc_table.set_column("lpx", lpx)
+        loc_table.set_column("lpy", lpy)
+        loc_table.set_column("ellipticity", ellipticity)
+        loc_table.set_column("net_gradient", net_gradient)
+
+        if isinstance(locs, LocalisationTable):
+            locs = loc_table
+        else:
+            locs = loc_table.to_records()
 
     except:
         pass
@@ -126,20 +130,26 @@ def locs_from_fits(locs, theta, box, em=False, gpu_fit=False):
     return locs
 
 
-def fit_spots_lq(spots, locs, box, progress_list):
+def fit_spot_parameters(spots, fit_backend, tolerance=FIT_TOLERANCE,
+        max_number_iterations=FIT_MAX_ITERATIONS, n_threads=None):
 
-    theta = np.empty((len(spots), 6), dtype=np.float32)
-    theta.fill(np.nan)
-    for i, spot in enumerate(spots):
+    # GAUSS_2D_ELLIPTIC fit of a batch of spots, photons are the integrated gaussian amplitude
+    size = spots.shape[1]
 
-        theta[i] = gausslq.fit_spot(spot)
-        progress_list.append(1)
+    initial_parameters = initial_parameters_gpufit(spots, size)
+    spots = spots.reshape(len(spots), size * size).astype(np.float32)
 
-    locs = locs_from_fits(locs, theta, box, gpu_fit=False)
+    result = fit_backend.fit(spots, None, GAUSS_2D_ELLIPTIC,
+        initial_parameters, tolerance=tolerance,
+        max_number_iterations=max_number_iterations, n_threads=n_threads)
 
-    return locs
+    parameters, states, chi_squares, number_iterations, exec_time = result
+
+    parameters[:, 0] *= 2.0 * np.pi * parameters[:, 3] * parameters[:, 4]
 
-def detect_picaso_locs(dat, progress_list, fit_list):
+    return parameters
+
+def detect_picaso_locs(dat, progress_counter, job_index):
 
     result = None
 
@@ -155,6 +165,7 @@ def detect_picaso_locs(dat, progress_list, fit_list):
         fit = dat["fit"]
         remove_overlapping = dat["remove_overlapping"]
         stop_event = dat["stop_event"]
+        fuse_fit = dat.get("fuse_fit", False)
 
         loc_list = []
         spot_list = []
@@ -163,12 +174,16 @@ def detect_picaso_locs(dat, progress_list, fit_list):
 
             # Access the shared memory
             shared_mem = shared_memory.SharedMemory(name=dat["shared_memory_name"])
-            np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
+            np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf,
+                offset=dat.get("offset", 0))
 
             image_chunk = np_array.copy()
 
             for array_index, frame in enumerate(image_chunk):
 
+                if stop_event.is_set():
+                    break
+
                 frame_index = start_index + array_index
 
                 locs = identify_frame(frame, min_net_gradient,
@@ -187,110 +202,41 @@ def detect_picaso_locs(dat, progress_list, fit_list):
 
                         locs.frame = frame_index
 
-                        locs = pd.DataFrame(locs)
-
-                        #instert dataset at column 0
-                        locs.insert(0, "dataset", dataset)
-                        locs.insert(1, "channel", channel)
-
-                        locs = locs.to_records(index=False)
-
-                        for loc, spot in zip(locs, spot_data):
-                            loc_list.append(loc)
-                            spot_list.append(spot)
-
-                        progress_list.append(1)
+                        loc_list.append(locs)
+                        spot_list.append(spot_data)
 
                     except:
                         pass
 
-            if len(loc_list) > 0:
-                result = loc_list, spot_list
-
-    except:
-        print(traceback.format_exc())
-        result = None
-
-
-    return result
-
-def picasso_detect(dat, progress_list):
-
-    result = None
-
-    try:
-
-        frame_index = dat["frame_index"]
-        min_net_gradient = dat["min_net_gradient"]
-        box_size = dat["box_size"]
-        roi = dat["roi"]
-        dataset = dat["dataset"]
-        channel = dat["channel"]
-        detect = dat["detect"]
-        fit = dat["fit"]
-        remove_overlapping = dat["remove_overlapping"]
-        stop_event = dat["stop_event"]
-
-        if not stop_event.is_set():
-
-            # Access the shared memory
-            shared_mem = shared_memory.SharedMemory(name=dat["shared_memory_name"])
-            np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
-
-            frame = np_array.copy()
-
-            if detect:
-                locs = identify_frame(frame, min_net_gradient, box_size, 0, roi=roi)
-
-                if remove_overlapping:
-                    # overlapping removed prior to fitting to increase speed
-                    locs = remove_overlapping_locs(locs, box_size)
-
-            else:
-                locs = dat["frame_locs"]
-
-            expected_loc_length = 4
+                if fuse_fit == False:
+                    progress_counter.add(job_index)
 
-            if fit:
-                expected_loc_length = 12
-                try:
-                    image = np.expand_dims(frame, axis=0)
-                    camera_info = {"baseline": 100.0, "gain": 1, "sensitivity": 1.0, "qe": 0.9, }
-                    spot_data = get_spots(image, locs, box_size, camera_info)
-
-                    theta, CRLBs, likelihoods, iterations = gaussmle(spot_data, eps=0.001, max_it=1000, method="sigma")
-                    locs = localize.locs_from_fits(locs.copy(), theta, CRLBs, likelihoods, iterations, box_size)
-
-                    locs.frame = frame_index
-
-                    if remove_overlapping:
-                        # sometimes locs can overlap after fitting
-                        locs = remove_overlapping_locs(locs, box_size)
-
-                except:
-                    # print(traceback.format_exc())
-                    pass
-
-            for loc in locs:
-                loc.frame = frame_index
-
-            if len(locs) > 0:
+            if len(loc_list) > 0:
 
-                locs = [loc for loc in locs if len(loc) == expected_loc_length]
-                locs = np.array(locs).view(np.recarray)
+                # dataset/channel are categorical columns of the table, not a string per loc
+                locs = LocalisationTable.from_records(np.hstack(loc_list),
+                    dataset=dataset, channel=channel)
+                spots = np.concatenate(spot_list, axis=0)
+
+                if fuse_fit:
+                    # spots are fitted where they were cut, with the backend selected by the parent
+                    # and one thread per worker. only the fitted locs are returned
+                    fit_backend = get_fit_backend(dat["fit_backend"])
+                    parameters = fit_spot_parameters(spots, fit_backend, n_threads=1)
+                    result = locs_from_fits(locs, parameters, box_size, gpu_fit=True), None
+                else:
+                    result = locs, spots
 
-            result = {"dataset": dataset, "channel": channel,
-                      "frame_index": frame_index,"locs": locs}
+            if fuse_fit:
+                progress_counter.add(job_index, end_index - start_index)
 
     except:
         print(traceback.format_exc())
-        pass
+        result = None
 
-    progress_list.append(dat["frame_index"])
 
     return result
 
-
 class _picasso_detect_utils:
 
     def populate_localisation_dict(self, loc_dict, render_loc_dict, detect_mode,
@@ -370,10 +316,9 @@ class _picasso_detect_utils:
             elif len(loc_dict["localisations"]) == 0:
                 return None
             else:
-                locs = loc_dict["localisations"]
-                locs = locs[locs.frame == frame_index]
+                loc_table = self.get_loc_table(dataset_name, image_channel.lower())
 
-                return locs.copy()
+                return loc_table.get_frame(frame_index).to_records()
 
         except:
             print(traceback.format_exc())
@@ -392,10 +337,9 @@ class _picasso_detect_utils:
             elif len(loc_dict["localisations"]) == 0:
                 return None
             else:
-                locs = loc_dict["localisations"]
-                locs = locs[(locs.frame >= start_index) & (locs.frame <= end_index)]
+                loc_table = self.get_loc_table(dataset_name, image_channel.lower())
 
-                return locs.copy()
+                return loc_table.get_frames(start_index, end_index).to_records()
 
         except:
             print(traceback.format_exc())
@@ -427,17 +371,16 @@ class _picasso_detect_utils:
 
                         image_dict = self.dataset_dict[dataset][channel.lower()]
 
-                        if "dataset" not in locs.dtype.names:
-                            locs = pd.DataFrame(locs)
-                            locs.insert(0, "dataset", dataset)
-                            locs.insert(1, "channel", channel)
-                            locs = locs.to_records(index=False)
-
                         image = image_dict.pop("data")
 
                         camera_info = {"baseline": 100.0, "gain": 1, "sensitivity": 1.0, "qe": 0.9, }
                         spot_data = get_spots(image, locs, box_size, camera_info)
 
+                        if "dataset" not in locs.dtype.names:
+                            locs = LocalisationTable.from_records(locs, dataset=dataset, channel=channel)
+                        else:
+                            locs = LocalisationTable.from_records(locs)
+
                         loc_list.append(locs)
                         spot_list.append(spot_data)
 
@@ -448,7 +391,7 @@ class _picasso_detect_utils:
             pass
 
         if len(loc_list) > 0:
-            loc_list = np.hstack(loc_list).view(np.recarray).copy()
+            loc_list = LocalisationTable.concatenate(loc_list)
             spot_list = np.concatenate(spot_list, axis=0)
 
         return loc_list, spot_list
@@ -456,7 +399,7 @@ class _picasso_detect_utils:
 
 
     def populate_picasso_detect_jobs(self, detect, fit,
-            min_net_gradient, roi):
+            min_net_gradient, roi, fuse_fit=False, fit_backend=None):
 
         try:
 
@@ -471,18 +414,20 @@ class _picasso_detect_utils:
             if self.verbose:
                 print("Creating Picasso compute jobs...")
 
-            for image_chunk in self.shared_chunks:
+            for chunk_index, image_chunk in enumerate(self.shared_chunks):
 
                 chunk_locs = self.get_chunk_locs(image_chunk["dataset"], image_chunk["channel"],
                     image_chunk["start_index"], image_chunk["end_index"])
 
                 compute_job = {"dataset": image_chunk["dataset"],
                                "channel": image_chunk["channel"],
+                               "chunk_index": chunk_index,
                                "start_index": image_chunk["start_index"],
                                "end_index": image_chunk["end_index"],
                                "shared_memory_name": image_chunk["shared_memory_name"],
                                "shape": image_chunk["shape"],
                                "dtype": image_chunk["dtype"],
+                               "offset": image_chunk.get("offset", 0),
                                "detect": detect,
                                "fit": fit,
                                "chunk_locs": chunk_locs,
@@ -490,6 +435,8 @@ class _picasso_detect_utils:
                                "box_size": int(box_size),
                                "roi": roi,
                                "remove_overlapping": remove_overlapping,
+                               "fuse_fit": fuse_fit,
+                               "fit_backend": fit_backend.name if fit_backend is not None else None,
                                "stop_event": self.stop_event, }
 
                 compute_jobs.append(compute_job)
@@ -504,79 +451,130 @@ class _picasso_detect_utils:
         return compute_jobs, n_frames
 
 
-    def detect_spots_parallel(self, detect_jobs, executor, manager,
-            n_workers, n_frames, fit, progress_callback=None,
-            timeout_duration = 10):
+    def get_detect_job_bytes(self, job):
 
-        progress_list = manager.list()
-        fit_jobs = manager.list()
+        n_frames = job["end_index"] - job["start_index"]
+        frame_bytes = int(np.prod(job["shape"][1:])) * np.dtype(job["dtype"]).itemsize
 
-        futures = {executor.submit(detect_picaso_locs,
-            job, progress_list, fit_jobs,): job for job in detect_jobs}
+        return n_frames * frame_bytes * DETECT_WORKING_SET
 
-        while any(not future.done() for future in futures):
-            progress = (sum(progress_list) / n_frames)
+    def prepare_detect_job(self, job_index, job):
 
-            if fit == True:
-                progress = progress*50
-            else:
-                progress = progress*100
+        detect_job = job[1]
 
-            if progress_callback is not None:
-                progress_callback.emit(progress)
+        # lazy chunks are read into shared memory just before their job is submitted
+        chunk = self.load_shared_image_chunk(self.shared_chunks[detect_job["chunk_index"]])
+        detect_job["shared_memory_name"] = chunk["shared_memory_name"]
 
-        locs = []
-        spots = []
+        return job
 
-        for future in concurrent.futures.as_completed(futures):
+    def release_detect_job(self, detect_jobs, job_index):
 
-            job = futures[future]
-            try:
-                result = future.result(timeout=timeout_duration)  # Process result here
+        chunk_index = detect_jobs[job_index]["chunk_index"]
+        self.release_shared_image_chunk(self.shared_chunks[chunk_index])
+
+    def detect_spots_parallel(self, detect_jobs, executor,
+            n_workers, n_frames, fit, progress_callback=None,
+            timeout_duration = 10, fuse_fit=False):
+
+        progress_counter = SharedProgressCounter(len(detect_jobs))
+
+        jobs = [(detect_picaso_locs, job, progress_counter, job_index)
+                for job_index, job in enumerate(detect_jobs)]
 
-                if result is not None:
-                    result_locs, result_spots = result
-                    locs.extend(result_locs)
-                    spots.extend(result_spots)
+        job_bytes = [self.get_detect_job_bytes(job) for job in detect_jobs]
+
+        if fit == True and fuse_fit == False:
+            progress_range = (0, 50)
+        else:
+            progress_range = (0, 100)
 
+        results = {}
+
+        for job_index, future in self.schedule_jobs(executor, jobs, job_bytes, "detect",
+                prepare_job=self.prepare_detect_job, release_job=partial(self.release_detect_job, detect_jobs),
+                callback=partial(self.emit_counter_progress, progress_counter,
+                    n_frames, progress_callback, progress_range)):
+
+            job = detect_jobs[job_index]
+            try:
+                results[job_index] = future.result(timeout=timeout_duration)  # Process result here
             except concurrent.futures.TimeoutError:
                 print(f"Task {job} timed out after {timeout_duration} seconds.")
             except Exception as e:
                 print(f"Error occurred in task {job}: {e}")
 
+        progress_counter.close()
+
+        locs = []
+        spots = []
+
+        for job_index in sorted(results.keys()):
+
+            result = results[job_index]
+
+            if result is not None:
+                result_locs, result_spots = result
+                locs.append(result_locs)
+
+                # fused jobs return fitted locs without their spots
+                if result_spots is not None:
+                    spots.append(result_spots)
+
         if len(locs) > 0:
-            locs = np.hstack(locs).view(np.recarray).copy()
-            spots = np.stack(spots, axis=0)
+            locs = LocalisationTable.concatenate(locs)
+        if len(spots) > 0:
+            spots = np.concatenate(spots, axis=0)
 
         return locs, spots
 
 
 
-    def fit_spots_gpu(self, locs, spots, box_size,
-            tolerance=1e-2, max_number_iterations=20):
+    def get_fit_backend(self, gpu_fit=True):
+
+        fit_backend = get_fit_backend(use_gpu=gpu_fit)
+
+        if fit_backend is None:
+            fit_backend = get_fit_backend("numba")
+
+        return fit_backend
+
+    def fit_spots_backend(self, locs, spots, box_size, fit_backend,
+            tolerance=FIT_TOLERANCE, max_number_iterations=FIT_MAX_ITERATIONS,
+            progress_callback=None, progress_range=(0, 100)):
 
         try:
-            from pygpufit import gpufit as gf
 
-            size = spots.shape[1]
-            initial_parameters = gausslq.initial_parameters_gpufit(spots, size)
-            spots.shape = (len(spots), (size * size))
-            model_id = gf.ModelID.GAUSS_2D_ELLIPTIC
+            n_spots = len(spots)
+
+            n_threads = self.get_compute_budget("fit")["workers"]
+            start, end = progress_range
+
+            parameter_list = []
 
-            result = gf.fit(
-                spots,
-                None,
-                model_id,
-                initial_parameters, tolerance=tolerance,
-                max_number_iterations=max_number_iterations,
-            )
+            # spots are fitted in batches so progress can be reported between batches
+            for batch_start in range(0, n_spots, FIT_BATCH_SPOTS):
 
-            parameters, states, chi_squares, number_iterations, exec_time = result
+                if self.stop_event.is_set():
+                    break
 
-            parameters[:, 0] *= 2.0 * np.pi * parameters[:, 3] * parameters[:, 4]
+                batch_spots = spots[batch_start:batch_start + FIT_BATCH_SPOTS]
 
-            locs = locs_from_fits(locs, parameters, box_size, gpu_fit=True)
+                parameters = fit_spot_parameters(batch_spots, fit_backend,
+                    tolerance=tolerance, max_number_iterations=max_number_iterations,
+                    n_threads=n_threads)
 
+                parameter_list.append(parameters)
+
+                if progress_callback is not None:
+                    progress = (batch_start + len(batch_spots)) / n_spots
+                    progress_callback.emit(int(start + (progress * (end - start))))
+
+            if len(parameter_list) > 0 and self.stop_event.is_set() == False:
+
+                parameters = np.concatenate(parameter_list, axis=0)
+
+                locs = locs_from_fits(locs, parameters, box_size, gpu_fit=True)
 
         except:
             print(traceback.format_exc())
@@ -585,51 +583,50 @@ class _picasso_detect_utils:
         return locs
 
 
-    def fit_spots_parallel(self, locs, spots, box_size, executor, manager, n_workers,
-             detect=False, progress_callback=None):
-
-        try:
+    def get_picasso_stage_params(self, detect, fit, min_net_gradient,
+            dataset_list, channel_list):
 
-            num_spots = len(spots)
-            num_tasks = 100 * n_workers
+        stage_params = {"detect": detect, "fit": fit,
+                        "min_net_gradient": min_net_gradient,
+                        "box_size": self.gui.picasso_box_size.currentText(),
+                        "detect_mode": self.gui.picasso_detect_mode.currentText(),
+                        "remove_overlapping": self.gui.picasso_remove_overlapping.isChecked(),
+                        "roi": str(self.generate_roi()),
+                        "dataset_list": dataset_list,
+                        "channel_list": channel_list}
 
-            progress_list = manager.list()
+        return stage_params
 
-            # Calculate spots per task using divmod for quotient and remainder
-            quotient, remainder = divmod(num_spots, num_tasks)
-            spots_per_task = [quotient + 1 if i < remainder else quotient for i in range(num_tasks)]
+    def get_picasso_result_dicts(self, detect_mode, dataset_list, channel_list):
 
-            # Calculate start indices using numpy
-            start_indices = np.cumsum([0] + spots_per_task[:-1])
+        result_dicts = []
 
-            futures = [executor.submit(fit_spots_lq,
-                spots[start:start + count],
-                locs[start:start + count], box_size,
-                progress_list) for start, count in zip(start_indices, spots_per_task)]
-
-            while any(not future.done() for future in futures):
-                progress = (sum(progress_list) / num_spots)
-
-                if detect:
-                    progress = 50 + (progress*50)
+        for dataset in dataset_list:
+            for channel in channel_list:
+                if detect_mode.lower() == "localisations":
+                    result_dict = self.localisation_dict["localisations"].get(dataset, {}).get(channel, {})
                 else:
-                    progress = progress*100
+                    result_dict = self.localisation_dict["bounding_boxes"]
+                result_dicts.append([dataset, channel, result_dict])
 
-                if progress_callback is not None:
-                    progress_callback.emit(progress)
+        return result_dicts
 
-            locs = [f.result() for f in futures]
-            locs = np.hstack(locs).view(np.recarray).copy()
+    def picasso_stage_is_current(self, stage_params, dataset_list, channel_list):
 
-        except:
-            print(traceback.format_exc())
+        detect_mode = stage_params["detect_mode"]
+        result_dicts = self.get_picasso_result_dicts(detect_mode, dataset_list, channel_list)
 
-        return locs
+        stage_current = len(result_dicts) > 0
 
+        for dataset, channel, result_dict in result_dicts:
+            if self.stage_is_current(result_dict, "picasso", stage_params, dataset, channel) == False:
+                stage_current = False
+
+        return stage_current
 
     def _picasso_wrapper(self, progress_callback, detect, fit,
             min_net_gradient, dataset_list = [], channel_list = [],
-            frame_index = None, gpu_fit=True):
+            frame_index = None, gpu_fit=True, stage_params=None):
 
         try:
             locs, fitted = [], False
@@ -640,61 +637,72 @@ class _picasso_detect_utils:
             roi = self.generate_roi()
 
             if frame_mode.lower() == "active":
-                executor_class = concurrent.futures.ThreadPoolExecutor
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
                 n_workers = 1
             else:
-                executor_class = concurrent.futures.ProcessPoolExecutor
-                n_workers = int(multiprocessing.cpu_count() * 0.9)
+                executor = self.get_process_pool()
+                n_workers = self.get_compute_budget("detect")["workers"]
 
-            with Manager() as manager:
+            fit_backend = self.get_fit_backend(gpu_fit)
 
-                with executor_class(max_workers=n_workers) as executor:
+            # cpu fits run in the detection workers, gpu fits need every spot in one batch
+            fuse_fit = detect is True and fit is True and fit_backend.device == "CPU"
 
-                    if detect is True:
+            if detect is True:
 
-                        self.create_shared_image_chunks(dataset_list=dataset_list,
-                            channel_list=channel_list, frame_index=frame_index, )
+                self.create_shared_image_chunks(dataset_list=dataset_list,
+                    channel_list=channel_list, frame_index=frame_index,
+                    operation="detect", working_set=DETECT_WORKING_SET)
 
-                        detect_jobs, n_frames = self.populate_picasso_detect_jobs(detect,
-                            fit, min_net_gradient, roi)
+                detect_jobs, n_frames = self.populate_picasso_detect_jobs(detect,
+                    fit, min_net_gradient, roi, fuse_fit=fuse_fit, fit_backend=fit_backend)
 
-                        if len(detect_jobs) > 0:
-                            if self.verbose:
-                                print(f"Starting Picasso {len(detect_jobs)} compute jobs...")
+                if len(detect_jobs) > 0:
+                    if self.verbose:
+                        print(f"Starting Picasso {len(detect_jobs)} compute jobs...")
 
-                            print(f"Detecting spots in {n_frames} frames...")
+                    if fuse_fit:
+                        print(f"Detecting and fitting spots in {n_frames} frames...")
+                    else:
+                        print(f"Detecting spots in {n_frames} frames...")
 
-                            locs, spots = self.detect_spots_parallel(detect_jobs, executor, manager,
-                                n_workers, n_frames, fit, progress_callback)
+                    locs, spots = self.detect_spots_parallel(detect_jobs, executor,
+                        n_workers, n_frames, fit, progress_callback, fuse_fit=fuse_fit)
 
-                            print(f"Detected {len(locs)} spots")
+                    print(f"Detected {len(locs)} spots")
 
-                    if detect is False and fit is True:
+            if detect is False and fit is True:
 
-                        locs, spots = self.get_fit_data(detect_mode, dataset_list,
-                            channel_list, box_size, frame_index)
+                locs, spots = self.get_fit_data(detect_mode, dataset_list,
+                    channel_list, box_size, frame_index)
 
-                    if len(locs) > 0 and fit == True:
+            if len(locs) > 0 and fuse_fit == True:
 
-                        if gpu_fit:
+                fitted = True
 
-                            print(f"Fitting {len(locs)} spots on GPU...")
+                print(f"Fitted {len(locs)} spots")
 
-                            locs = self.fit_spots_gpu(locs, spots, box_size)
+            elif len(locs) > 0 and fit == True:
 
-                        else:
+                print(f"Fitting {len(locs)} spots on {fit_backend.device} ({fit_backend.name})...")
 
-                            print(f"Fitting {len(locs)} spots on CPU...")
+                if detect:
+                    progress_range = (50, 100)
+                else:
+                    progress_range = (0, 100)
 
-                            locs = self.fit_spots_parallel(locs, spots, box_size, executor, manager,
-                                n_workers, detect, progress_callback)
+                locs = self.fit_spots_backend(locs, spots, box_size, fit_backend,
+                    progress_callback=progress_callback, progress_range=progress_range)
 
-                        fitted = True
+                fitted = True
 
-                        print(f"Fitted {len(locs)} spots")
+                print(f"Fitted {len(locs)} spots")
 
-                    else:
-                        fitted = False
+            else:
+                fitted = False
+
+            if frame_mode.lower() == "active":
+                executor.shutdown()
 
             #time to process locs
 
@@ -704,6 +712,15 @@ class _picasso_detect_utils:
             self.process_locs(locs, detect_mode, box_size, fitted=fitted)
             end = time.time()
 
+            if stage_params is not None and frame_index is None and detect is True:
+                result_dicts = self.get_picasso_result_dicts(detect_mode, dataset_list, channel_list)
+                for dataset, channel, result_dict in result_dicts:
+                    # locs of a stopped run are partial, so they are never marked as current
+                    if self.stop_event.is_set() == False:
+                        self.record_stage_result(result_dict, "picasso", stage_params, dataset, channel)
+                    else:
+                        result_dict.pop("provenance", None)
+
             print(f"Processed {len(locs)} locs in {end-start} seconds")
 
             if progress_callback is not None:
@@ -727,54 +744,45 @@ class _picasso_detect_utils:
 
             if len(locs) > 0:
 
-                dataset_list = list(set(locs["dataset"]))
-                channel_list = list(set(locs["channel"]))
+                if isinstance(locs, LocalisationTable) == False:
+                    locs = LocalisationTable.from_records(locs)
+
+                dataset_list = locs.get_values("dataset")
+                channel_list = locs.get_values("channel")
 
                 for dataset in dataset_list:
                     for channel in channel_list:
 
-                        if channel in locs["channel"]:
-
-                            if detect_mode.lower() == "localisations":
-
-                                if dataset not in self.localisation_dict["localisations"].keys():
-                                    self.localisation_dict["localisations"][dataset] = {}
-                                if channel not in self.localisation_dict["localisations"][dataset].keys():
-                                    self.localisation_dict["localisations"][dataset][channel] = {}
-
-                                result_dict = self.localisation_dict["localisations"][dataset][channel.lower()]
-
-                            else:
+                        if detect_mode.lower() == "localisations":
 
-                                result_dict = self.localisation_dict["bounding_boxes"]
+                            if dataset not in self.localisation_dict["localisations"].keys():
+                                self.localisation_dict["localisations"][dataset] = {}
+                            if channel not in self.localisation_dict["localisations"][dataset].keys():
+                                self.localisation_dict["localisations"][dataset][channel] = {}
 
-                            channel_locs = locs[(locs["dataset"] == dataset) & (locs["channel"] == channel)]
+                            result_dict = self.localisation_dict["localisations"][dataset][channel.lower()]
 
-                            if len(channel_locs) == 0:
-
-                                result_dict["localisations"] = []
-                                result_dict["fitted"] = False
-                                result_dict["box_size"] = box_size
-
-                            else:
+                        else:
 
-                                loc_cols = list(channel_locs.dtype.names)
+                            result_dict = self.localisation_dict["bounding_boxes"]
 
-                                if "dataset" in loc_cols or "channel" in loc_cols:
-                                    channel_locs = pd.DataFrame(channel_locs)
+                        channel_locs = locs.select(dataset=dataset, channel=channel)
 
-                                    if "dataset" in loc_cols:
-                                        channel_locs = channel_locs.drop(columns=["dataset"])
-                                    if "channel" in loc_cols:
-                                        channel_locs = channel_locs.drop(columns=["channel"])
+                        if len(channel_locs) == 0:
 
-                                    channel_locs = channel_locs.to_records(index=False)
+                            result_dict["localisations"] = []
+                            result_dict["fitted"] = False
+                            result_dict["box_size"] = box_size
 
-                                result_dict["localisations"] = channel_locs.copy()
-                                result_dict["fitted"] = fitted
-                                result_dict["box_size"] = box_size
+                        else:
 
+                            # stored locs are frame sorted records, without the dataset/channel columns
+                            channel_locs = channel_locs.sort_by_frame()
 
+                            result_dict["localisations"] = channel_locs.to_records(exclude=CATEGORICAL_FIELDS)
+                            result_dict["fitted"] = fitted
+                            result_dict["box_size"] = box_size
+                            result_dict.pop("provenance", None)
 
         except:
             print(traceback.format_exc())
@@ -785,6 +793,8 @@ class _picasso_detect_utils:
 
     def molseeq_picasso(self, detect = False, fit = False):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
             if self.dataset_dict != {}:
 
@@ -800,7 +810,27 @@ class _picasso_detect_utils:
                 else:
                     gpu_fit = False
 
-                if min_net_gradient.isdigit() and image_channel != "":
+                if frame_mode.lower() == "active":
+                    frame_index = self.viewer.dims.current_step[0]
+                else:
+                    frame_index = None
+
+                if dataset_name == "All Datasets":
+                    dataset_list = list(self.dataset_dict.keys())
+                else:
+                    dataset_list = [dataset_name]
+
+                channel_list = [image_channel.lower()]
+
+                stage_params = self.get_picasso_stage_params(detect, fit,
+                    min_net_gradient, dataset_list, channel_list)
+
+                if detect and frame_index is None and self.picasso_stage_is_current(stage_params,
+                        dataset_list, channel_list):
+
+                    self.molseeq_notification("Localisations are up to date, skipping detection.")
+
+                elif min_net_gradient.isdigit() and image_channel != "":
 
                     self.gui.picasso_progressbar.setValue(0)
                     self.gui.picasso_detect.setEnabled(False)
@@ -812,25 +842,14 @@ class _picasso_detect_utils:
                     if minimise_ram == True and frame_mode.lower() != "active":
                         self.clear_live_images()
 
-                    if frame_mode.lower() == "active":
-                        frame_index = self.viewer.dims.current_step[0]
-                    else:
-                        frame_index = None
-
-                    if dataset_name == "All Datasets":
-                        dataset_list = list(self.dataset_dict.keys())
-                    else:
-                        dataset_list = [dataset_name]
-
-                    channel_list = [image_channel.lower()]
-
                     self.worker = Worker(self._picasso_wrapper,
                         detect=detect, fit=fit,
                         min_net_gradient=min_net_gradient,
                         dataset_list=dataset_list,
                         channel_list=channel_list,
                         gpu_fit=gpu_fit,
-                        frame_index=frame_index)
+                        frame_index=frame_index,
+                        stage_params=stage_params)
 
                     self.worker.signals.progress.connect(partial(self.molseeq_progress,
                         progress_bar=self.gui.picasso_progressbar))
@@ -992,6 +1011,8 @@ class _picasso_detect_utils:
 
     def initialise_picasso_render(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             dataset_name = self.gui.picasso_render_dataset.currentText()
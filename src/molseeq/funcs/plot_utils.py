@@ -1,14 +1,8 @@
-from PyQt5.QtGui import QCursor
-from PyQt5.QtCore import Qt
-from qtpy.QtWidgets import QSlider
-from PyQt5.QtWidgets import QCheckBox
 import numpy as np
-import pyqtgraph as pg
 import traceback
-import copy
-from qtpy.QtWidgets import QCheckBox
 import re
 from scipy.ndimage import gaussian_filter1d
+from molseeq.funcs.trace_store import TraceStore
 
 
 class _plot_utils:
@@ -122,14 +116,13 @@ class _plot_utils:
 
                     if dataset != "" and channel != "":
 
-                        channel_dict = self.traces_dict[dataset][channel]
-                        trace_indeces = list(channel_dict.keys())
+                        trace_store = self.traces_dict[dataset][channel]
 
-                        n_traces = len(channel_dict)
+                        n_traces = len(trace_store)
 
                         if n_traces > 0:
 
-                            metric_names = channel_dict[trace_indeces[0]].keys()
+                            metric_names = trace_store.metrics
 
                             plot_metric_items = []
                             background_metric_items = []
@@ -199,49 +192,38 @@ class _plot_utils:
 
         try:
 
-            dataset_dict = self.traces_dict[dataset_name].copy()
-            trace_indices = list(dataset_dict["donor"].keys())
-            n_traces = len(trace_indices)
+            dataset_dict = self.traces_dict[dataset_name]
 
-            dataset_dict["fret_efficiency"] = {}
-            for trace_index in trace_indices:
-                if trace_index not in dataset_dict["fret_efficiency"]:
-                    dataset_dict["fret_efficiency"][trace_index] = {metric_key: []}
+            donor_store = dataset_dict["donor"]
+            acceptor_store = dataset_dict["acceptor"]
 
-            for trace_index in trace_indices:
+            donor = donor_store.get_values(metric_key)
+            acceptor = acceptor_store.get_values(metric_key)
 
-                donor = copy.deepcopy(dataset_dict["donor"][trace_index][metric_key])
-                acceptor = copy.deepcopy(dataset_dict["acceptor"][trace_index][metric_key])
+            if background_metric_key != None:
 
-                if background_metric_key != None:
+                donor_bg = gaussian_filter1d(donor_store.get_metric(background_metric_key), 1, axis=1)
+                acceptor_bg = gaussian_filter1d(acceptor_store.get_metric(background_metric_key), 1, axis=1)
 
-                    donor_bg = copy.deepcopy(dataset_dict["donor"][trace_index][background_metric_key])
-                    acceptor_bg = copy.deepcopy(dataset_dict["acceptor"][trace_index][background_metric_key])
+                donor = donor - donor_bg
+                acceptor = acceptor - acceptor_bg
 
-                    donor_bg = gaussian_filter1d(donor_bg, 1)
-                    acceptor_bg = gaussian_filter1d(acceptor_bg, 1)
+            if efficiency_offset:
+                global_min = np.minimum(np.min(donor, axis=1), np.min(acceptor, axis=1))
+                global_min = np.abs(global_min)[:, np.newaxis]
+                donor = donor + global_min
+                acceptor = acceptor + global_min
 
-                    donor = donor - donor_bg
-                    acceptor = acceptor - acceptor_bg
+            efficiency = acceptor / ((gamma_correction * donor) + acceptor)
 
-                if efficiency_offset:
-                    global_min = np.min([np.min(donor), np.min(acceptor)])
-                    global_min = abs(global_min)
-                    donor = donor + global_min
-                    acceptor = acceptor + global_min
+            if clip_data:
+                efficiency = np.clip(efficiency, 0, 1)
 
-                efficiency = acceptor / ((gamma_correction * donor) + acceptor)
+            dataset_dict["fret_efficiency"] = TraceStore(efficiency[:, :, np.newaxis].astype(np.float32),
+                [metric_key], donor_store.spot_indices)
 
-                if clip_data:
-                    efficiency = np.clip(efficiency, 0, 1)
-
-                dataset_dict["fret_efficiency"][trace_index][metric_key] = efficiency
-
-                if progress_callback is not None:
-                    progress = int(100 * trace_index / n_traces)
-                    progress_callback.emit(progress)
-
-            self.traces_dict[dataset_name] = dataset_dict
+            if progress_callback is not None:
+                progress_callback.emit(100)
 
         except:
             print(traceback.format_exc())
@@ -252,47 +234,29 @@ class _plot_utils:
 
         try:
 
-            dataset_dict = self.traces_dict[dataset_name].copy()
-            n_traces = len(dataset_dict["dd"])
-
-            dataset_dict["alex_efficiency"] = {}
-            for trace_index in range(n_traces):
-                if trace_index not in dataset_dict["alex_efficiency"]:
-                    dataset_dict["alex_efficiency"][trace_index] = {metric_key: []}
-
-            for trace_index in range(n_traces):
-
-                dd = copy.deepcopy(dataset_dict["dd"][trace_index][metric_key])
-                da = copy.deepcopy(dataset_dict["da"][trace_index][metric_key])
-
-                if background_metric_key != None:
+            dataset_dict = self.traces_dict[dataset_name]
 
-                    dd_bg = dataset_dict["dd"][trace_index][background_metric_key].copy()
-                    da_bg = dataset_dict["da"][trace_index][background_metric_key].copy()
+            dd_store = dataset_dict["dd"]
+            da_store = dataset_dict["da"]
 
-                    dd = dd - dd_bg
-                    da = da - da_bg
+            dd = dd_store.get_values(metric_key, background_metric_key)
+            da = da_store.get_values(metric_key, background_metric_key)
 
-                if efficiency_offset:
-                    max_value = np.max([np.max(dd), np.max(da)])
-                    da = da + max_value
-                    dd = dd + max_value
+            if efficiency_offset:
+                max_value = np.maximum(np.max(dd, axis=1), np.max(da, axis=1))[:, np.newaxis]
+                da = da + max_value
+                dd = dd + max_value
 
-                efficiency = da / ((gamma_correction * dd) + da)
-                efficiency = np.array(efficiency)
+            efficiency = da / ((gamma_correction * dd) + da)
 
-                if clip_data:
-                    efficiency = np.clip(efficiency, 0, 1)
-
-                dataset_dict["alex_efficiency"][trace_index][metric_key] = efficiency
-
-                if progress_callback is not None:
-                    progress = int(100 * trace_index / n_traces)
-                    progress_callback.emit(progress)
-
-            self.traces_dict[dataset_name] = dataset_dict
+            if clip_data:
+                efficiency = np.clip(efficiency, 0, 1)
 
+            dataset_dict["alex_efficiency"] = TraceStore(efficiency[:, :, np.newaxis].astype(np.float32),
+                [metric_key], dd_store.spot_indices)
 
+            if progress_callback is not None:
+                progress_callback.emit(100)
 
         except:
             print(traceback.format_exc())
@@ -378,7 +342,7 @@ class _plot_utils:
                 if dataset in self.traces_dict:
                     for channel in plot_channels:
                         if channel in self.traces_dict[dataset]:
-                            n_iterations += len(self.traces_dict[dataset][channel].copy())
+                            n_iterations += len(self.traces_dict[dataset][channel])
 
 
             iter = 0
@@ -404,19 +368,21 @@ class _plot_utils:
 
                     if channel in self.traces_dict[dataset_name].keys():
 
-                        channel_dict = self.traces_dict[dataset_name][channel].copy()
-                        for trace_index, trace_dict in channel_dict.items():
+                        trace_store = self.traces_dict[dataset_name][channel]
 
-                            data = np.array(trace_dict[metric_key].copy())
+                        if "efficiency" not in channel.lower() and background_mode != "None":
+                            channel_data = trace_store.get_values(metric_key, background_metric_key)
+                        else:
+                            channel_data = trace_store.get_values(metric_key)
+
+                        for position, trace_index in enumerate(trace_store.keys()):
+
+                            data = channel_data[position]
 
                             if "efficiency" not in channel.lower():
-                                if background_mode != "None":
-                                    background = np.array(trace_dict[background_metric_key].copy())
-                                    # background = gaussian_filter1d(background, 10)
-                                    data = data - background
-                                bleach_index = trace_dict["bleach_index"]
-                                donor_bleach_index = trace_dict["donor_bleach_index"]
-                                acceptor_bleach_index = trace_dict["acceptor_bleach_index"]
+                                bleach_index = trace_store.get_attribute("bleach_index")[position]
+                                donor_bleach_index = trace_store.get_attribute("donor_bleach_index")[position]
+                                acceptor_bleach_index = trace_store.get_attribute("acceptor_bleach_index")[position]
 
                             if channel in ["dd", "da", "ad", "aa"]:
                                 label = f"{channel.upper()} [{metric_name}]"
@@ -505,6 +471,8 @@ class _plot_utils:
 
     def create_plot_checkboxes(self):
 
+        from qtpy.QtWidgets import QCheckBox
+
         try:
 
             grid_layout = self.gui.traces_channel_selection_layout
@@ -563,6 +531,8 @@ class _plot_utils:
 
     def plot_checkbox_event(self, event):
 
+        from qtpy.QtWidgets import QCheckBox
+
         try:
 
             grid_layout = self.gui.traces_channel_selection_layout
@@ -593,6 +563,9 @@ class _plot_utils:
 
     def update_plot_layout(self):
 
+        import pyqtgraph as pg
+        from molseeq.funcs.plot_widgets import CustomPlot
+
         try:
 
             self.plot_grid = {}
@@ -881,106 +854,3 @@ def auto_scale_y(sub_plots):
 
     except:
         pass
-
-
-class CustomPlot(pg.PlotItem):
-
-    def __init__(self, title="", colour="", *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        self.metadata = {}
-
-        self.setMenuEnabled(False)
-        self.symbolSize = 100
-
-        legend = self.addLegend(offset=(10, 10))
-        legend.setBrush('w')
-        legend.setLabelTextSize("8pt")
-        self.hideAxis('top')
-        self.hideAxis('right')
-        self.getAxis('left').setWidth(30)
-
-        self.title = title
-        self.colour = colour
-
-        if self.title != "":
-            self.setLabel('top', text=title, size="3pt", color=colour)
-
-    def setMetadata(self, metadata_dict):
-        self.metadata = metadata_dict
-
-    def getMetadata(self):
-        return self.metadata
-
-    def enableAutoRange(self, axis='both'):
-        """
-        Enables automatic ranging for the specified axis.
-        :param axis: 'x', 'y', or 'both' to specify which axis to auto-range.
-        """
-        if axis == 'x':
-            super().enableAutoRange(axis=pg.ViewBox.XAxis)
-        elif axis == 'y':
-            super().enableAutoRange(axis=pg.ViewBox.YAxis)
-        else:
-            super().enableAutoRange(axis=pg.ViewBox.XYAxes)
-
-
-class CustomPyQTGraphWidget(pg.GraphicsLayoutWidget):
-
-    def __init__(self, parent):
-        super().__init__()
-
-        self.parent = parent
-        self.frame_position_memory = {}
-        self.frame_position = None
-
-def mousePressEvent(self, event):
-
-    if hasattr(self.parent, "plot_grid"):
-
-        if event.modifiers() & Qt.ControlModifier:
-
-            xpos = self.get_event_x_postion(event, mode="click")
-
-        elif event.modifiers() & Qt.AltModifier:
-
-            xpos = self.get_event_x_postion(event, mode="click")
-
-        super().mousePressEvent(event)  # Process the event further
-
-def keyPressEvent(self, event):
-
-    if hasattr(self.parent, "plot_grid"):
-
-        pass
-
-        super().keyPressEvent(event)  # Process the event further
-
-def get_event_x_postion(self, event,  mode="click"):
-
-    self.xpos = None
-
-    if hasattr(self.parent, "plot_grid"):
-
-        if mode == "click":
-            pos = event.pos()
-            self.scene_pos = self.mapToScene(pos)
-        else:
-            pos = QCursor.pos()
-            self.scene_pos = self.mapFromGlobal(pos)
-
-        # Iterate over all plots
-        plot_grid = self.parent.plot_grid
-
-        for plot_index, grid in enumerate(plot_grid.values()):
-            sub_axes = grid["sub_axes"]
-
-            for axes_index in range(len(sub_axes)):
-                plot = sub_axes[axes_index]
-
-                viewbox = plot.vb
-                plot_coords = viewbox.mapSceneToView(self.scene_pos)
-
-        self.xpos = plot_coords.x()
-
-    return self.xpos
@@ -0,0 +1,106 @@
+from PyQt5.QtGui import QCursor
+from PyQt5.QtCore import Qt
+import pyqtgraph as pg
+
+
+class CustomPlot(pg.PlotItem):
+
+    def __init__(self, title="", colour="", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.metadata = {}
+
+        self.setMenuEnabled(False)
+        self.symbolSize = 100
+
+        legend = self.addLegend(offset=(10, 10))
+        legend.setBrush('w')
+        legend.setLabelTextSize("8pt")
+        self.hideAxis('top')
+        self.hideAxis('right')
+        self.getAxis('left').setWidth(30)
+
+        self.title = title
+        self.colour = colour
+
+        if self.title != "":
+            self.setLabel('top', text=title, size="3pt", color=colour)
+
+    def setMetadata(self, metadata_dict):
+        self.metadata = metadata_dict
+
+    def getMetadata(self):
+        return self.metadata
+
+    def enableAutoRange(self, axis='both'):
+        """
+        Enables automatic ranging for the specified axis.
+        :param axis: 'x', 'y', or 'both' to specify which axis to auto-range.
+        """
+        if axis == 'x':
+            super().enableAutoRange(axis=pg.ViewBox.XAxis)
+        elif axis == 'y':
+            super().enableAutoRange(axis=pg.ViewBox.YAxis)
+        else:
+            super().enableAutoRange(axis=pg.ViewBox.XYAxes)
+
+
+class CustomPyQTGraphWidget(pg.GraphicsLayoutWidget):
+
+    def __init__(self, parent):
+        super().__init__()
+
+        self.parent = parent
+        self.frame_position_memory = {}
+        self.frame_position = None
+
+def mousePressEvent(self, event):
+
+    if hasattr(self.parent, "plot_grid"):
+
+        if event.modifiers() & Qt.ControlModifier:
+
+            xpos = self.get_event_x_postion(event, mode="click")
+
+        elif event.modifiers() & Qt.AltModifier:
+
+            xpos = self.get_event_x_postion(event, mode="click")
+
+        super().mousePressEvent(event)  # Process the event further
+
+def keyPressEvent(self, event):
+
+    if hasattr(self.parent, "plot_grid"):
+
+        pass
+
+        super().keyPressEvent(event)  # Process the event further
+
+def get_event_x_postion(self, event,  mode="click"):
+
+    self.xpos = None
+
+    if hasattr(self.parent, "plot_grid"):
+
+        if mode == "click":
+            pos = event.pos()
+            self.scene_pos = self.mapToScene(pos)
+        else:
+            pos = QCursor.pos()
+            self.scene_pos = self.mapFromGlobal(pos)
+
+        # Iterate over all plots
+        plot_grid = self.parent.plot_grid
+
+        for plot_index, grid in enumerate(plot_grid.values()):
+            sub_axes = grid["sub_axes"]
+
+            for axes_index in range(len(sub_axes)):
+                plot = sub_axes[axes_index]
+
+                viewbox = plot.vb
+                plot_coords = viewbox.mapSceneToView(self.scene_pos)
+
+        self.xpos = plot_coords.x()
+
+    return self.xpos
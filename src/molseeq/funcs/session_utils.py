@@ -0,0 +1,557 @@
+import traceback
+import numpy as np
+import os
+import json
+import hashlib
+import uuid
+import h5py
+from molseeq.funcs.trace_store import TraceStore
+from molseeq.funcs.lazy_array_utils import (H5LazyArray, is_lazy_array, read_lazy_block,
+    get_lazy_block_size)
+from functools import partial
+
+SESSION_VERSION = 1
+
+
+def encode_session_locs(locs):
+
+    # h5py cannot store unicode/object fields, store them as fixed length bytes
+    locs = np.asarray(locs)
+
+    dtype = []
+    for name in locs.dtype.names:
+        field_dtype = locs.dtype[name]
+        if field_dtype.kind in ["U", "O"]:
+            max_length = max([len(str(value)) for value in locs[name]] + [1])
+            dtype.append((name, f"S{max_length}"))
+        else:
+            dtype.append((name, field_dtype))
+
+    encoded_locs = np.zeros(locs.shape, dtype=dtype)
+
+    for name in locs.dtype.names:
+        if locs.dtype[name].kind in ["U", "O"]:
+            encoded_locs[name] = [str(value).encode("utf-8") for value in locs[name]]
+        else:
+            encoded_locs[name] = locs[name]
+
+    return encoded_locs
+
+
+def decode_session_locs(locs):
+
+    dtype = []
+    for name in locs.dtype.names:
+        field_dtype = locs.dtype[name]
+        if field_dtype.kind == "S":
+            dtype.append((name, f"U{max(field_dtype.itemsize, 1)}"))
+        else:
+            dtype.append((name, field_dtype))
+
+    decoded_locs = np.zeros(locs.shape, dtype=dtype)
+
+    for name in locs.dtype.names:
+        if locs.dtype[name].kind == "S":
+            decoded_locs[name] = np.char.decode(locs[name], "utf-8")
+        else:
+            decoded_locs[name] = locs[name]
+
+    return decoded_locs.view(np.recarray)
+
+
+def get_array_hash(array):
+
+    array = np.asarray(array)
+
+    # hash localisations as they are stored, so hashes survive a session round trip
+    if array.dtype.names is not None:
+        array = encode_session_locs(array)
+    elif array.dtype.kind in ["U", "O"]:
+        array = array.astype(str).astype(bytes)
+
+    array = np.ascontiguousarray(array)
+
+    array_hash = hashlib.sha1(array.view(np.uint8).ravel() if array.size > 0 else b"")
+    array_hash.update(str(array.dtype).encode("utf-8"))
+    array_hash.update(str(array.shape).encode("utf-8"))
+
+    return array_hash.hexdigest()
+
+
+def write_session_json(group, name, value):
+
+    # stored as a string dataset, attributes are limited to 64kb
+    group.create_dataset(name, data=json.dumps(value, default=str))
+
+
+def read_session_json(group, name):
+
+    value = group[name][()]
+
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+
+    return json.loads(value)
+
+
+def remove_temp_session(temp_path):
+
+    try:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    except:
+        print(traceback.format_exc())
+        pass
+
+
+class _session_utils:
+
+    def get_stage_provenance(self, stage, params, dataset, channel):
+
+        image_provenance = []
+
+        if dataset in self.dataset_dict.keys():
+            if channel in self.dataset_dict[dataset].keys():
+                image_provenance = self.dataset_dict[dataset][channel].get("provenance", [])
+
+        # a stage is identified by its parameters and everything that was done to its input image
+        provenance = {"stage": stage,
+                      "params": params,
+                      "image_provenance": image_provenance}
+
+        provenance = json.dumps(provenance, sort_keys=True, default=str)
+
+        return hashlib.sha1(provenance.encode("utf-8")).hexdigest()
+
+    def record_image_stage(self, dataset, channel, stage, params={}):
+
+        try:
+
+            channel_dict = self.dataset_dict[dataset][channel]
+
+            if "provenance" not in channel_dict.keys():
+                channel_dict["provenance"] = []
+
+            channel_dict["provenance"].append({"stage": stage, "params": params})
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def record_stopped_image_stage(self, dataset, channel, stage):
+
+        # a partially processed image never matches the provenance of an earlier result
+        self.record_image_stage(dataset, channel, stage, {"stopped": uuid.uuid4().hex})
+
+    def record_stage_result(self, result_dict, stage, params, dataset, channel):
+
+        try:
+
+            if "localisations" in result_dict.keys() and len(result_dict["localisations"]) > 0:
+
+                if "provenance" not in result_dict.keys():
+                    result_dict["provenance"] = {}
+
+                result_dict["provenance"][f"{dataset}:{channel}"] = {
+                    "stage": self.get_stage_provenance(stage, params, dataset, channel),
+                    "result": get_array_hash(result_dict["localisations"])}
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def stage_is_current(self, result_dict, stage, params, dataset, channel):
+
+        stage_current = False
+
+        try:
+
+            if "provenance" in result_dict.keys() and "localisations" in result_dict.keys():
+
+                provenance = result_dict["provenance"].get(f"{dataset}:{channel}", {})
+
+                if len(result_dict["localisations"]) > 0 and provenance != {}:
+
+                    # results edited after the stage ran (filtering, undrift etc.) are not current
+                    if provenance["stage"] == self.get_stage_provenance(stage, params, dataset, channel):
+                        if provenance["result"] == get_array_hash(result_dict["localisations"]):
+                            stage_current = True
+
+        except:
+            print(traceback.format_exc())
+            stage_current = False
+
+        return stage_current
+
+    def get_session_metadata(self, metadata_dict):
+
+        metadata = {}
+        arrays = {}
+
+        for key, value in metadata_dict.items():
+            if key in ["data", "localisations"]:
+                continue
+            elif isinstance(value, np.ndarray):
+                arrays[key] = value
+            else:
+                metadata[key] = value
+
+        return metadata, arrays
+
+    def write_session_channel(self, channel_group, channel_dict, compress=False):
+
+        image = channel_dict["data"]
+
+        if compress:
+            chunk_shape = (min(16, image.shape[0]), *image.shape[1:])
+            dataset_options = {"chunks": chunk_shape, "compression": "gzip",
+                               "compression_opts": 1, "shuffle": True}
+        else:
+            # contiguous, uncompressed stacks can be memory mapped when the session is loaded
+            dataset_options = {}
+
+        if is_lazy_array(image):
+            # lazy images are written block by block, rather than read into RAM at once
+            dataset = channel_group.create_dataset("data", shape=image.shape,
+                dtype=image.dtype, **dataset_options)
+
+            frame_bytes = int(np.prod(image.shape[1:])) * np.dtype(image.dtype).itemsize
+            block_size = get_lazy_block_size(frame_bytes)
+
+            for start_index in range(0, image.shape[0], block_size):
+                end_index = min(start_index + block_size, image.shape[0])
+                dataset[start_index:end_index] = read_lazy_block(image, [start_index, end_index])
+        else:
+            channel_group.create_dataset("data", data=image, **dataset_options)
+
+        metadata, arrays = self.get_session_metadata(channel_dict)
+
+        write_session_json(channel_group, "_metadata", metadata)
+
+        for key, value in arrays.items():
+            channel_group.create_dataset(key, data=value)
+
+    def write_session_locs(self, locs_group, loc_dict):
+
+        metadata, arrays = self.get_session_metadata(loc_dict)
+
+        write_session_json(locs_group, "_metadata", metadata)
+
+        if "localisations" in loc_dict.keys():
+
+            locs = loc_dict["localisations"]
+
+            if isinstance(locs, np.ndarray) and locs.dtype.names is not None:
+                locs_group.create_dataset("localisations", data=encode_session_locs(locs))
+
+    def write_session_traces(self, traces_group, trace_store):
+
+        traces_group.create_dataset("spot_index", data=trace_store.spot_indices)
+
+        # one (n_spots, n_frames) dataset per metric, numeric attributes as (n_spots) datasets
+        for metric in trace_store.metrics:
+            traces_group.create_dataset(metric, data=trace_store.get_metric(metric))
+
+        metric_attrs = {}
+
+        for name, values in trace_store.attributes.items():
+            if values.dtype.kind in ["b", "i", "u", "f"]:
+                traces_group.create_dataset(name, data=values)
+            else:
+                metric_attrs[name] = [value.tolist() if isinstance(value, np.ndarray) else value for value in values]
+
+        write_session_json(traces_group, "_metadata", metric_attrs)
+
+    def _save_session(self, progress_callback=None, path="", compress=False):
+
+        temp_path = path + ".tmp"
+
+        try:
+
+            if self.verbose:
+                print(f"Saving session to {path}")
+
+            n_channels = sum([len(dataset_dict) for dataset_dict in self.dataset_dict.values()])
+            n_channels = max(n_channels, 1)
+
+            with h5py.File(temp_path, "w") as session_file:
+
+                session_file.attrs["session_version"] = SESSION_VERSION
+
+                iter = 0
+
+                datasets_group = session_file.create_group("datasets")
+
+                for dataset_name, dataset_dict in self.dataset_dict.items():
+                    for channel_name, channel_dict in dataset_dict.items():
+
+                        if self.stop_event.is_set():
+                            break
+
+                        channel_group = datasets_group.create_group(f"{dataset_name}/{channel_name}")
+
+                        self.write_session_channel(channel_group, channel_dict, compress=compress)
+
+                        iter += 1
+                        if progress_callback is not None:
+                            progress_callback.emit(int((iter / n_channels) * 90))
+
+                if self.stop_event.is_set() == False:
+
+                    locs_group = session_file.create_group("localisations")
+
+                    for dataset_name, dataset_locs in self.localisation_dict["localisations"].items():
+                        for channel_name, loc_dict in dataset_locs.items():
+                            if loc_dict != {}:
+                                channel_group = locs_group.create_group(f"{dataset_name}/{channel_name}")
+                                self.write_session_locs(channel_group, loc_dict)
+
+                    bbox_group = session_file.create_group("bounding_boxes")
+                    self.write_session_locs(bbox_group, self.localisation_dict["bounding_boxes"])
+
+                    traces_group = session_file.create_group("traces")
+                    write_session_json(traces_group, "_provenance", self.traces_provenance)
+
+                    for dataset_name, dataset_traces in self.traces_dict.items():
+                        for channel_name, channel_traces in dataset_traces.items():
+                            channel_group = traces_group.create_group(f"{dataset_name}/{channel_name}")
+                            self.write_session_traces(channel_group, channel_traces)
+
+                    if self.transform_matrix is not None:
+                        session_file.create_dataset("transform_matrix", data=np.asarray(self.transform_matrix))
+
+            if self.stop_event.is_set():
+                # a stopped save keeps the existing session
+                remove_temp_session(temp_path)
+                return
+
+            # replace the session in one step, a failed save never leaves a partial session
+            try:
+                os.replace(temp_path, path)
+            except:
+                print(f"Could not replace {path} (is it open?), session saved to {temp_path}")
+
+            if progress_callback is not None:
+                progress_callback.emit(100)
+
+        except:
+            print(traceback.format_exc())
+            remove_temp_session(temp_path)
+            pass
+
+    def read_session_channel(self, path, channel_group):
+
+        channel_dict = read_session_json(channel_group, "_metadata")
+
+        dataset = channel_group["data"]
+        data_offset = dataset.id.get_offset()
+
+        if dataset.chunks is None and dataset.compression is None and data_offset is not None:
+            # copy-on-write memory map, edits stay in memory and never touch the session file
+            channel_dict["data"] = np.memmap(path, dtype=dataset.dtype, mode="c",
+                offset=data_offset, shape=dataset.shape)
+        else:
+            # chunked/compressed stacks stay on disk, chunks are decompressed as frames are read
+            channel_dict["data"] = H5LazyArray.from_dataset(path, dataset)
+
+        for key in channel_group.keys():
+            if key not in ["data", "_metadata"]:
+                channel_dict[key] = channel_group[key][()]
+
+        return channel_dict
+
+    def read_session_locs(self, locs_group):
+
+        loc_dict = read_session_json(locs_group, "_metadata")
+
+        if "localisations" in locs_group.keys():
+            loc_dict["localisations"] = decode_session_locs(locs_group["localisations"][()])
+
+        return loc_dict
+
+    def read_session_traces(self, traces_group):
+
+        spot_indices = traces_group["spot_index"][()].astype(np.int64)
+
+        metric_attrs = read_session_json(traces_group, "_metadata")
+
+        metrics = []
+        metric_arrays = []
+        attributes = {}
+
+        for name in traces_group.keys():
+            if name not in ["spot_index", "_metadata"]:
+                values = traces_group[name][()]
+                if values.ndim == 2:
+                    metrics.append(name)
+                    metric_arrays.append(values.astype(np.float32))
+                else:
+                    attributes[name] = values
+
+        if len(metric_arrays) > 0:
+            data = np.stack(metric_arrays, axis=-1)
+        else:
+            data = np.zeros((len(spot_indices), 0, 0), dtype=np.float32)
+
+        trace_store = TraceStore(data, metrics, spot_indices, attributes)
+
+        for name, values in metric_attrs.items():
+            trace_store.set_attribute(name, [np.array(value) if isinstance(value, list) else value
+                                             for value in values])
+
+        return trace_store
+
+    def _load_session(self, progress_callback=None, path=""):
+
+        try:
+
+            if self.verbose:
+                print(f"Loading session from {path}")
+
+            dataset_dict = {}
+            localisation_dict = {"bounding_boxes": {}, "localisations": {}}
+            traces_dict = {}
+            traces_provenance = None
+            transform_matrix = None
+
+            with h5py.File(path, "r") as session_file:
+
+                for dataset_name, dataset_group in session_file["datasets"].items():
+                    dataset_dict[dataset_name] = {}
+                    for channel_name, channel_group in dataset_group.items():
+                        dataset_dict[dataset_name][channel_name] = self.read_session_channel(path, channel_group)
+
+                if progress_callback is not None:
+                    progress_callback.emit(50)
+
+                for dataset_name, dataset_group in session_file["localisations"].items():
+                    localisation_dict["localisations"][dataset_name] = {}
+                    for channel_name, channel_group in dataset_group.items():
+                        localisation_dict["localisations"][dataset_name][channel_name] = self.read_session_locs(channel_group)
+
+                localisation_dict["bounding_boxes"] = self.read_session_locs(session_file["bounding_boxes"])
+
+                traces_provenance = read_session_json(session_file["traces"], "_provenance")
+
+                for dataset_name, dataset_group in session_file["traces"].items():
+                    if dataset_name == "_provenance":
+                        continue
+                    traces_dict[dataset_name] = {}
+                    for channel_name, channel_group in dataset_group.items():
+                        traces_dict[dataset_name][channel_name] = self.read_session_traces(channel_group)
+
+                if "transform_matrix" in session_file.keys():
+                    transform_matrix = session_file["transform_matrix"][()]
+
+            for dataset_name in dataset_dict.keys():
+                if dataset_name not in localisation_dict["localisations"].keys():
+                    localisation_dict["localisations"][dataset_name] = {}
+                for channel_name in dataset_dict[dataset_name].keys():
+                    if channel_name not in localisation_dict["localisations"][dataset_name].keys():
+                        localisation_dict["localisations"][dataset_name][channel_name] = {}
+
+            self.dataset_dict = dataset_dict
+            self.localisation_dict = localisation_dict
+            self.traces_dict = traces_dict
+            self.traces_provenance = traces_provenance
+
+            if transform_matrix is not None:
+                self.transform_matrix = transform_matrix
+
+            if progress_callback is not None:
+                progress_callback.emit(100)
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def _load_session_finished(self):
+
+        try:
+
+            self.populate_dataset_combos()
+
+            self.update_channel_select_buttons()
+            self.populate_channel_selectors()
+            self.update_active_image()
+            self.update_export_options()
+            self.populate_export_combos()
+            self.update_filtering_channels()
+            self.update_loc_export_options()
+
+            self.update_align_reference_channel()
+
+            self.draw_localisations(update_vis=True)
+            self.draw_bounding_boxes(update_vis=True)
+
+            if self.traces_dict != {}:
+                self.populate_plot_combos()
+                self.initialize_plot()
+
+            self.update_ui()
+
+        except:
+            print(traceback.format_exc())
+            self.update_ui()
+
+    def save_session(self):
+
+        from molseeq.funcs.qt_worker import Worker
+        from qtpy.QtWidgets import QFileDialog
+
+        try:
+
+            if self.dataset_dict != {}:
+
+                desktop = os.path.expanduser("~/Desktop")
+                path = QFileDialog.getSaveFileName(self, 'Save session', desktop, "Session files (*.h5)")[0]
+
+                if path != "":
+
+                    if path.endswith(".h5") == False:
+                        path = path + ".h5"
+
+                    compress = self.gui.molseeq_session_compress.isChecked()
+
+                    self.update_ui(init=True)
+
+                    self.worker = Worker(self._save_session, path=path, compress=compress)
+                    self.worker.signals.progress.connect(partial(self.molseeq_progress,
+                        progress_bar=self.gui.molseeq_import_progressbar))
+                    self.worker.signals.finished.connect(self.update_ui)
+                    self.worker.signals.error.connect(self.update_ui)
+                    self.threadpool.start(self.worker)
+
+            else:
+                self.molseeq_notification("No data to save.")
+
+        except:
+            self.update_ui()
+            print(traceback.format_exc())
+            pass
+
+    def load_session(self):
+
+        from molseeq.funcs.qt_worker import Worker
+        from qtpy.QtWidgets import QFileDialog
+
+        try:
+
+            desktop = os.path.expanduser("~/Desktop")
+            path = QFileDialog.getOpenFileName(self, 'Load session', desktop, "Session files (*.h5)")[0]
+
+            if path != "":
+
+                self.update_ui(init=True)
+
+                self.worker = Worker(self._load_session, path=path)
+                self.worker.signals.progress.connect(partial(self.molseeq_progress,
+                    progress_bar=self.gui.molseeq_import_progressbar))
+                self.worker.signals.finished.connect(self._load_session_finished)
+                self.worker.signals.error.connect(self.update_ui)
+                self.threadpool.start(self.worker)
+
+        except:
+            self.update_ui()
+            print(traceback.format_exc())
+            pass
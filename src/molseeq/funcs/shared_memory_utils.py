@@ -0,0 +1,300 @@
+import traceback
+import numpy as np
+from multiprocessing import shared_memory
+
+# stop flags attached by worker processes, kept open so each flag is attached once per worker
+_attached_stop_flags = {}
+
+
+class SharedImageBlock:
+
+    def __init__(self, shared_mem, shape, dtype):
+
+        self.shared_mem = shared_mem
+        self.name = shared_mem.name
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = np.dtype(dtype)
+
+        n_values = int(np.prod(self.shape))
+
+        # frombuffer holds the shared memory buffer, it cannot be closed while the array is in use
+        self.array = np.frombuffer(shared_mem.buf, dtype=self.dtype, count=n_values).reshape(self.shape)
+        self.address = self.array.__array_interface__["data"][0]
+
+    def close(self):
+
+        closed = True
+
+        self.array = None
+
+        try:
+            self.shared_mem.close()
+        except BufferError:
+            # views of the block are still referenced (e.g. by a napari layer)
+            closed = False
+
+        return closed
+
+
+class SharedImageStore:
+
+    def __init__(self):
+
+        self.blocks = {}
+        self.released_blocks = []
+
+    def allocate(self, shape, dtype):
+
+        shape = tuple(int(dim) for dim in shape)
+        dtype = np.dtype(dtype)
+
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+
+        shared_mem = shared_memory.SharedMemory(create=True, size=size)
+
+        block = SharedImageBlock(shared_mem, shape, dtype)
+        self.blocks[block.name] = block
+
+        return block
+
+    def put(self, image):
+
+        block = self.allocate(image.shape, image.dtype)
+        block.array[:] = image
+
+        return block
+
+    def find(self, image):
+
+        if isinstance(image, np.ndarray) and not isinstance(image, np.memmap):
+
+            address = image.__array_interface__["data"][0]
+
+            for block in self.blocks.values():
+                if block.address == address and block.shape == image.shape and block.dtype == image.dtype:
+                    return block
+
+        return None
+
+    def release(self, name):
+
+        block = self.blocks.pop(name, None)
+
+        if block is not None:
+
+            try:
+                block.shared_mem.unlink()
+            except FileNotFoundError:
+                pass
+
+            if block.close() == False:
+                # memory is freed once the remaining views are garbage collected
+                self.released_blocks.append(block)
+
+    def release_unused(self, images):
+
+        try:
+
+            addresses = [image.__array_interface__["data"][0] for image in images
+                         if isinstance(image, np.ndarray)]
+
+            for name, block in list(self.blocks.items()):
+                if block.address not in addresses:
+                    self.release(name)
+
+            self.released_blocks = [block for block in self.released_blocks if block.close() == False]
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def close(self):
+
+        for name in list(self.blocks.keys()):
+            self.release(name)
+
+    def __len__(self):
+
+        return len(self.blocks)
+
+
+class SharedProgressCounter:
+
+    def __init__(self, n_slots):
+
+        self.n_slots = max(1, int(n_slots))
+        self.shared_mem = shared_memory.SharedMemory(create=True, size=self.n_slots * 8)
+        self.owner = True
+
+        self.get_counts()[:] = 0
+
+    def __getstate__(self):
+
+        # workers attach to the counter by name, each job writes to its own slot so no lock is needed
+        return {"name": self.shared_mem.name, "n_slots": self.n_slots}
+
+    def __setstate__(self, state):
+
+        self.n_slots = state["n_slots"]
+        self.shared_mem = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+
+    def get_counts(self):
+
+        # views are not kept, so the shared memory can always be closed
+        return np.ndarray((self.n_slots,), dtype=np.int64, buffer=self.shared_mem.buf)
+
+    def add(self, slot, value=1):
+
+        self.get_counts()[slot % self.n_slots] += value
+
+    def set(self, slot, value):
+
+        self.get_counts()[slot % self.n_slots] = value
+
+    def total(self):
+
+        return int(np.sum(self.get_counts()))
+
+    def close(self):
+
+        try:
+            self.shared_mem.close()
+
+            if self.owner:
+                self.shared_mem.unlink()
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+
+class SharedStopFlag:
+
+    def __init__(self):
+
+        self.shared_mem = shared_memory.SharedMemory(create=True, size=1)
+        self.shared_mem.buf[0] = 0
+        self.owner = True
+
+    def __getstate__(self):
+
+        return {"name": self.shared_mem.name}
+
+    def __setstate__(self, state):
+
+        name = state["name"]
+
+        if name not in _attached_stop_flags.keys():
+            _attached_stop_flags[name] = shared_memory.SharedMemory(name=name)
+
+        self.shared_mem = _attached_stop_flags[name]
+        self.owner = False
+
+    def set(self):
+
+        self.shared_mem.buf[0] = 1
+
+    def clear(self):
+
+        self.shared_mem.buf[0] = 0
+
+    def is_set(self):
+
+        return self.shared_mem.buf[0] != 0
+
+    def get_flag_array(self):
+
+        # uint8 view of the flag, for checks inside numba kernels
+        return np.ndarray((1,), dtype=np.uint8, buffer=self.shared_mem.buf)
+
+    def close(self):
+
+        try:
+            self.shared_mem.close()
+
+            if self.owner:
+                self.shared_mem.unlink()
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+
+class SharedTaskData:
+
+    # read only arrays published once for all jobs of an operation, jobs pickle only the name, layout
+    # and (small) metadata, so the size of each job does not grow with the arrays
+
+    def __init__(self, arrays, **metadata):
+
+        self.layout = {}
+        self.metadata = metadata
+
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+        n_bytes = 0
+
+        for name, array in arrays.items():
+            # arrays are 64 byte aligned
+            offset = int(np.ceil(n_bytes / 64) * 64)
+            self.layout[name] = (offset, array.shape, array.dtype)
+            n_bytes = offset + array.nbytes
+
+        self.shared_mem = shared_memory.SharedMemory(create=True, size=max(1, n_bytes))
+        self.owner = True
+
+        for name, array in arrays.items():
+            self.get_array(name, writeable=True)[...] = array
+
+    def __getstate__(self):
+
+        return {"name": self.shared_mem.name, "layout": self.layout, "metadata": self.metadata}
+
+    def __setstate__(self, state):
+
+        self.layout = state["layout"]
+        self.metadata = state["metadata"]
+        self.shared_mem = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+
+    def get_array(self, name, writeable=False):
+
+        offset, shape, dtype = self.layout[name]
+
+        array = np.ndarray(shape, dtype=dtype, buffer=self.shared_mem.buf, offset=offset)
+        array.flags.writeable = writeable
+
+        if dtype.names is not None:
+            array = array.view(np.recarray)
+
+        return array
+
+    def __getitem__(self, name):
+
+        if name in self.layout.keys():
+            return self.get_array(name)
+
+        return self.metadata[name]
+
+    def get(self, name, default=None):
+
+        if name in self.layout.keys() or name in self.metadata.keys():
+            return self[name]
+
+        return default
+
+    def close(self):
+
+        try:
+            if self.owner:
+                self.shared_mem.unlink()
+
+            self.shared_mem.close()
+
+        except BufferError:
+            # views of the arrays are still referenced, memory is freed once they are garbage collected
+            pass
+        except:
+            print(traceback.format_exc())
+            pass
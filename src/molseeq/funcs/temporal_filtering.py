@@ -1,10 +1,7 @@
 import numpy as np
 from numba import jit
 import traceback
-from molseeq.funcs.utils_compute import Worker
 import concurrent.futures
-import multiprocessing
-import time
 from functools import partial
 
 def temporal_filtering(dat):
@@ -14,12 +11,13 @@ def temporal_filtering(dat):
         filter_size = dat["filter_size"]
         filter_mode = dat["filter_mode"]
         h1,h2 = dat["height_range"]
+        stop_flag = dat["stop_event"].get_flag_array()
 
         shared_mem = dat["shared_mem"]
         np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
         filter_chunk = np_array[:,h1:h2,:]
 
-        filter_chunk = image_temporal_filtering_jit(filter_chunk, filter_size, filter_mode)
+        filter_chunk = image_temporal_filtering_jit(filter_chunk, filter_size, filter_mode, stop_flag)
         np_array[:,h1:h2,:] = filter_chunk
 
     except:
@@ -51,11 +49,16 @@ def pixel_temporal_filtering_jit(pixel_values, filter_size, filter_mode):
     return filtered_values
 
 @jit(nopython=True)
-def image_temporal_filtering_jit(image, filter_size, filter_mode):
+def image_temporal_filtering_jit(image, filter_size, filter_mode, stop_flag):
 
     n_frames, height, width = image.shape
 
     for h_index in range(height):
+
+        # stop requests are checked every pixel row
+        if stop_flag[0] != 0:
+            break
+
         for w_index in range(width):
 
             pixel_values = image[:, h_index, w_index].copy()
@@ -167,32 +170,52 @@ class _utils_temporal_filtering:
             else:
                 channel_names = [filtering_channels.lower()]
 
-            self.shared_images = self.create_shared_images(dataset_names, channel_names)
+            if len(self.get_lazy_images(dataset_names, channel_names)) > 0:
+                # lazy images are filtered in row blocks, each block holds every frame of its pixels
+                row_blocks = self.get_lazy_row_blocks(dataset_names, channel_names)
+            else:
+                row_blocks = [None]
 
-            compute_jobs = self._populate_temport_compute_jobs()
+            filtered_images = []
 
-            self.molseeq_notification("Starting temporal filtering on {} images".format(len(self.shared_images)))
+            for block_index, row_range in enumerate(row_blocks):
 
-            start_time = time.time()
+                if self.stop_event.is_set():
+                    break
 
-            if len(compute_jobs) == 0:
-                pass
-            elif len(compute_jobs) == 1:
-                temporal_filtering(compute_jobs[0])
-            else:
-                cpu_count = int(multiprocessing.cpu_count() * 0.9)
-                timeout_duration = 10  # Timeout in seconds
+                self.shared_images = self.create_shared_images(dataset_names, channel_names,
+                    row_range=row_range)
+
+                compute_jobs = self._populate_temport_compute_jobs()
+
+                if block_index == 0:
+                    self.molseeq_notification("Starting temporal filtering on {} images".format(len(self.shared_images)))
+
+                for image_dict in self.shared_images:
+                    if [image_dict["dataset"], image_dict["channel"]] not in filtered_images:
+                        filtered_images.append([image_dict["dataset"], image_dict["channel"]])
 
-                with concurrent.futures.ProcessPoolExecutor(max_workers=cpu_count) as executor:
-                    # Submit all jobs and store the future objects
-                    futures = {executor.submit(temporal_filtering, job): job for job in compute_jobs}
+                if len(compute_jobs) == 0:
+                    pass
+                elif len(compute_jobs) == 1:
+                    temporal_filtering(compute_jobs[0])
+                else:
+                    timeout_duration = 10  # Timeout in seconds
+
+                    executor = self.get_process_pool()
+
+                    jobs = [(temporal_filtering, job) for job in compute_jobs]
+
+                    # each job filters a copy of its rows (every frame) in the numba kernel
+                    job_bytes = [2 * job["shape"][0] * (job["height_range"][1] - job["height_range"][0])
+                                 * job["shape"][2] * np.dtype(job["dtype"]).itemsize for job in compute_jobs]
 
                     iter = 0
-                    for future in concurrent.futures.as_completed(futures):
+                    for job_index, future in self.schedule_jobs(executor, jobs, job_bytes, "filtering"):
                         if self.stop_event.is_set():
                             future.cancel()
                         else:
-                            job = futures[future]
+                            job = compute_jobs[job_index]
                             try:
                                 result = future.result(timeout=timeout_duration)  # Process result here
                             except concurrent.futures.TimeoutError:
@@ -204,12 +227,19 @@ class _utils_temporal_filtering:
 
                             # Update progress
                             iter += 1
-                            progress = int((iter / len(compute_jobs)) * 100)
+                            progress = int(((block_index + (iter / len(compute_jobs))) / len(row_blocks)) * 100)
                             progress_callback.emit(progress)  # Emit the signal
 
+                self.restore_shared_images()
+                self.shared_images = []
 
-
-            self.restore_shared_images()
+            for dataset, channel in filtered_images:
+                if self.stop_event.is_set() == False:
+                    self.record_image_stage(dataset, channel, "temporal_filtering",
+                        {"filter_size": self.gui.filtering_filter_size.currentText(),
+                         "filter_mode": self.gui.filtering_mode.currentText()})
+                else:
+                    self.record_stopped_image_stage(dataset, channel, "temporal_filtering")
 
         except:
             self.update_ui()
@@ -218,6 +248,8 @@ class _utils_temporal_filtering:
 
     def molseeq_temporal_filtering(self, viewer=None):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
             self.molseeq_notification("Starting temporal filtering...")
 
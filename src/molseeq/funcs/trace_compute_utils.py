@@ -1,22 +1,33 @@
 import copy
 import numpy as np
 import traceback
-from molseeq.funcs.utils_compute import Worker
+from molseeq.funcs.session_utils import get_array_hash
 from functools import partial
 import matplotlib.pyplot as plt
-from qtpy.QtWidgets import QComboBox
-import multiprocessing
-from picasso.gaussmle import gaussmle
+from molseeq.funcs.gauss_fit import fit_spots_mle_batch
+from molseeq.funcs.shared_memory_utils import SharedTaskData
+from molseeq.funcs.trace_store import build_trace_stores
 import warnings
 from numba.core.errors import NumbaPendingDeprecationWarning
-import time
 import concurrent.futures
 import pandas as pd
+import math
+from numba import jit
 
 warnings.filterwarnings('ignore', category=RuntimeWarning)
 warnings.filterwarnings('ignore', category=NumbaPendingDeprecationWarning)
 np.seterr(divide='ignore', invalid='ignore')
 
+# approximate memory used by a spot metric job, per spot per frame of metrics
+SPOT_FRAME_BYTES = 512
+
+# spot metric jobs cover batches of spots, limited to this many spot frames per job
+SPOT_BATCH_FRAMES = 250000
+MAX_SPOT_BATCH_SIZE = 512
+
+# metrics computed for the spot, local background and masked local background regions
+SPOT_METRICS = ["mean", "median", "sum", "max", "std"]
+
 LOCS_DTYPE = [
     ("frame", "u4"),
     ("x", "f4"),
@@ -108,6 +119,14 @@ def cut_spots(movie, ids_frame, ids_x, ids_y, box):
     return spots
 
 
+def get_job_image(image):
+
+    # image data of a job, read in place from shared memory
+    np_array = np.ndarray(image["shape"], dtype=image["dtype"], buffer=image["shared_mem"].buf)
+
+    return np_array[:image["frames_available"]]
+
+
 def extract_picasso_spot_metrics(dat):
 
     spot_metrics = None
@@ -116,23 +135,24 @@ def extract_picasso_spot_metrics(dat):
     try:
 
         frame_index = dat["frame_index"]
-        box_size = dat["box_size"]
-        locs = dat["locs"]
-        loc_centers = dat["loc_centers"]
+        image = dat["image"]
+        task_data = dat["task_data"]
         stop_event = dat["stop_event"]
 
         if not stop_event.is_set():
 
-            spot_metrics = {}
+            box_size = task_data["box_size"]
+
+            # locs are edited below, so the shared (read only) locs are copied
+            locs = task_data["locs"].copy()
+            loc_centers = task_data["spot_centers"].tolist()
 
-            spot_cx = [center[0] for center in loc_centers]
-            spot_cy = [center[1] for center in loc_centers]
+            spot_metrics = {}
 
-            # Load data from shared memory
-            shared_mem = dat["shared_mem"]
-            image = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
+            spot_cx = task_data["spot_cx"].copy()
+            spot_cy = task_data["spot_cy"].copy()
 
-            frame = image[frame_index].copy()
+            frame = get_job_image(image)[frame_index].copy()
 
             camera_info = {"baseline": 100.0, "gain": 1, "sensitivity": 1.0, "qe": 0.9, }
 
@@ -142,16 +162,16 @@ def extract_picasso_spot_metrics(dat):
             spot_data = cut_spots(frame, locs.frame, locs.x, locs.y, box_size)
 
             # metadata
-            spot_metrics["dataset"] = dat["dataset"]
-            spot_metrics["channel"] = dat["channel"]
-            spot_metrics["frame_index"] = dat["frame_index"]
+            spot_metrics["dataset"] = image["dataset"]
+            spot_metrics["channel"] = image["channel"]
+            spot_metrics["frame_index"] = frame_index + image["frame_offset"]
             spot_metrics["spot_index"] = np.arange(len(locs))
             spot_metrics["spot_cx"] = spot_cx
             spot_metrics["spot_cy"] = spot_cy
             spot_metrics["spot_center"] = loc_centers
             spot_metrics["spot_x"] = locs.x
             spot_metrics["spot_y"] = locs.y
-            spot_metrics["box_size"] = dat["box_size"]
+            spot_metrics["box_size"] = box_size
 
             spot_photons = np.zeros(len(locs))
             spot_photons_bg = np.zeros(len(locs))
@@ -162,33 +182,21 @@ def extract_picasso_spot_metrics(dat):
             spot_net_gradient = np.zeros(len(locs))
             spot_likelihood = np.zeros(len(locs))
 
-            for spot_index, (spot, loc) in enumerate(zip(spot_data, locs)):
-
-                start = time.time()
-
-                while time.time() - start < 5:
-
-                    try:
+            # every spot of the frame is fitted in one batch, failed fits are left at zero
+            thetas, CRLBs, likelihoods, iterations = fit_spots_mle_batch(spot_data, eps=0.0001, max_it=500, method="sigma")
 
-                        thetas, CRLBs, likelihoods, iterations = gaussmle([spot], eps=0.0001,
-                            max_it=500, method="sigma")
+            fitted = np.isfinite(thetas).all(axis=1)
 
-                        spot_photons[spot_index] = thetas[:, 2][0]
-                        spot_photons_bg[spot_index] = thetas[:, 3][0]
-                        spot_sx[spot_index] = thetas[:, 5][0]
-                        spot_sy[spot_index] = thetas[:, 4][0]
-                        spot_lpx[spot_index] = np.sqrt(CRLBs[:, 1])[0]
-                        spot_lpy[spot_index] = np.sqrt(CRLBs[:, 0])[0]
-                        spot_net_gradient[spot_index] = loc.net_gradient
-                        spot_likelihood[spot_index] = likelihoods[0]
+            spot_photons[fitted] = thetas[fitted, 2]
+            spot_photons_bg[fitted] = thetas[fitted, 3]
+            spot_sx[fitted] = thetas[fitted, 5]
+            spot_sy[fitted] = thetas[fitted, 4]
+            spot_lpx[fitted] = np.sqrt(CRLBs[fitted, 1])
+            spot_lpy[fitted] = np.sqrt(CRLBs[fitted, 0])
+            spot_net_gradient[fitted] = locs.net_gradient[fitted]
+            spot_likelihood[fitted] = likelihoods[fitted]
 
-                    except:
-                        break
-
-                    break
-
-                if spot_photons[spot_index] <= 0:
-                    spot_photons_bg[spot_index] = 0
+            spot_photons_bg[spot_photons <= 0] = 0
 
             spot_metrics["spot_photons"] = spot_photons
             spot_metrics["spot_photons_local_bg"] = spot_photons_bg
@@ -203,6 +211,8 @@ def extract_picasso_spot_metrics(dat):
 
             spot_metrics = pd.DataFrame(spot_metrics)
 
+        task_data.close()
+
     except:
         spot_metrics = None
         error = traceback.format_exc()
@@ -246,19 +256,16 @@ def extract_background_metrics(dat):
     try:
 
         frame = dat["frame"]
-        channel = dat["channel"]
-        dataset = dat["dataset"]
-        shared_mem = dat["shared_mem"]
+        image = dat["image"]
+        task_data = dat["task_data"]
         stop_event = dat["stop_event"]
 
         if not stop_event.is_set():
 
-            np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
+            background_values = get_job_image(image)[frame].copy()
+            masked_background_values = np.ma.array(background_values, mask=task_data["global_spot_mask"].copy())
 
-            background_values = np_array[frame].copy()
-            masked_background_values = np.ma.array(background_values, mask=dat["global_spot_mask"])
-
-            n_pixels = dat["n_pixels"]
+            n_pixels = task_data["n_pixels"]
 
             spot_mean_global_bg = np.mean(background_values)
             spot_median_global_bg = np.median(background_values)
@@ -272,9 +279,9 @@ def extract_background_metrics(dat):
             spot_max_masked_global_bg = np.ma.max(masked_background_values)
             spot_std_masked_global_bg = np.ma.std(masked_background_values)
 
-            background_data = {"dataset": dataset,
-                               "channel": channel,
-                                "frame_index": frame,
+            background_data = {"dataset": image["dataset"],
+                               "channel": image["channel"],
+                                "frame_index": frame + image["frame_offset"],
                                 "spot_mean_global_bg": spot_mean_global_bg,
                                 "spot_median_global_bg": spot_median_global_bg,
                                 "spot_sum_global_bg": spot_sum_global_bg,
@@ -287,127 +294,178 @@ def extract_background_metrics(dat):
                                 "spot_std_masked_global_bg": spot_std_masked_global_bg,
                                }
 
+        task_data.close()
+
     except:
         print(traceback.format_exc())
         pass
 
     return background_data
 
+@jit(nopython=True, nogil=True, cache=True)
+def compute_region_metrics(frames, pixel_indices, region_offsets, metrics):
+
+    # mean, median, sum, max and std of each region (a list of flat pixel indices) in every frame,
+    # metrics are (n_frames, n_regions, n_metrics). frames are the outer loop, so each frame is read
+    # once for all regions
+    n_frames = frames.shape[0]
+    n_regions = region_offsets.shape[0] - 1
+
+    max_pixels = 1
+    for region in range(n_regions):
+        max_pixels = max(max_pixels, region_offsets[region + 1] - region_offsets[region])
+
+    values = np.empty(max_pixels)
+
+    for frame_index in range(n_frames):
+
+        frame = frames[frame_index]
+
+        for region in range(n_regions):
+
+            start = region_offsets[region]
+            n_pixels = region_offsets[region + 1] - start
+
+            if n_pixels == 0:
+                metrics[frame_index, region, :] = 0
+                continue
+
+            total = 0.0
+
+            # regions are small, values are insertion sorted as they are read
+            for k in range(n_pixels):
+
+                value = float(frame[pixel_indices[start + k]])
+
+                j = k
+                while j > 0 and values[j - 1] > value:
+                    values[j] = values[j - 1]
+                    j -= 1
+                values[j] = value
+
+                total += value
+
+            mean = total / n_pixels
+
+            variance = 0.0
+            for k in range(n_pixels):
+                variance += (values[k] - mean) ** 2
+
+            if n_pixels % 2 == 1:
+                median = values[n_pixels // 2]
+            else:
+                median = 0.5 * (values[n_pixels // 2 - 1] + values[n_pixels // 2])
+
+            metrics[frame_index, region, 0] = mean
+            metrics[frame_index, region, 1] = median
+            metrics[frame_index, region, 2] = total
+            metrics[frame_index, region, 3] = values[n_pixels - 1]
+            metrics[frame_index, region, 4] = math.sqrt(variance / n_pixels)
+
+
+def get_spot_region_indices(frame_shape, spot_bounds, spot_mask, spot_background_mask,
+        background_overlap_mask):
+
+    # flat pixel indices of the spot, local background (whole window) and masked local background
+    # regions of every spot, as CSR style index lists with three regions per spot
+    region_indices = []
+
+    spot_mask = spot_mask.astype(bool)
+    spot_background_mask = spot_background_mask.astype(bool)
+
+    for bounds in spot_bounds:
+
+        [x1, x2, y1, y2], loc_mask, loc_bg_mask = crop_spot_data(frame_shape,
+            bounds, spot_mask, spot_background_mask)
+
+        spot_overlap = background_overlap_mask[y1:y2, x1:x2]
+
+        if spot_overlap.shape == loc_bg_mask.shape:
+            loc_bg_mask = loc_bg_mask & spot_overlap.astype(bool)
+
+        window_indices = (np.arange(y1, y2)[:, np.newaxis] * frame_shape[1] + np.arange(x1, x2)[np.newaxis, :])
+
+        region_indices.append(window_indices[loc_mask] if loc_mask.shape == window_indices.shape else np.empty(0, dtype=int))
+        region_indices.append(window_indices.ravel())
+        region_indices.append(window_indices[loc_bg_mask] if loc_bg_mask.shape == window_indices.shape else np.empty(0, dtype=int))
+
+    region_offsets = np.zeros(len(region_indices) + 1, dtype=np.int64)
+    region_offsets[1:] = np.cumsum([len(indices) for indices in region_indices])
+
+    if len(region_indices) > 0:
+        pixel_indices = np.concatenate(region_indices).astype(np.int64)
+    else:
+        pixel_indices = np.empty(0, dtype=np.int64)
+
+    return pixel_indices, region_offsets
+
+
 def extract_spot_metrics(dat):
 
     spot_metrics = None
-    frame = None
 
     try:
 
-        # Load data from shared memory
-        shared_mem = dat["shared_mem"]
-        np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
-        spot_size = dat["spot_size"]
-        spot_center = dat["spot_center"]
+        image = dat["image"]
+        task_data = dat["task_data"]
         stop_event = dat["stop_event"]
-        spot_index = dat["spot_index"]
-        channel = dat["channel"]
-        frame_shape = np_array.shape[1:]
 
         if not stop_event.is_set():
 
-            spot_metrics = {}
+            np_array = get_job_image(image)
 
-            spot_cx, spot_cy = spot_center
+            batch_start, batch_end = dat["batch_start"], dat["batch_end"]
 
-            n_pixels = spot_size**2
+            spot_indices = np.arange(batch_start, batch_end)
+            spot_size = task_data["spot_size"]
+            n_spots = len(spot_indices)
+            n_frames = len(np_array)
+            n_pixels = spot_size ** 2
 
-            bounds = dat["spot_bound"]
+            # regions of the batch, three per spot
+            region_offsets = task_data["region_offsets"][batch_start * 3:batch_end * 3 + 1]
+            pixel_indices = task_data["pixel_indices"][region_offsets[0]:region_offsets[-1]]
+            region_offsets = region_offsets - region_offsets[0]
 
-            spot_mask = dat["spot_mask"]
-            spot_mask = spot_mask.astype(np.uint8)
-            spot_background_mask = dat["spot_background_mask"]
+            # frames are read in place from shared memory, as rows of flat pixels
+            frames = np_array.reshape(n_frames, -1)
 
-            [x1, x2, y1, y2], spot_mask, spot_background_mask = crop_spot_data(frame_shape,
-                bounds, spot_mask,spot_background_mask)
+            metrics = np.zeros((n_frames, n_spots * 3, len(SPOT_METRICS)), dtype=np.float32)
 
-            spot_overlap = dat["background_overlap_mask"][y1:y2, x1:x2]
+            compute_region_metrics(frames, pixel_indices, region_offsets, metrics)
 
-            if spot_overlap.shape == spot_background_mask.shape:
-                spot_background_mask = spot_background_mask & spot_overlap
+            # (n_spots, n_frames, n_metrics) for each region
+            spot_values = metrics[:, 0::3].transpose(1, 0, 2)
+            local_values = metrics[:, 1::3].transpose(1, 0, 2)
+            masked_local_values = metrics[:, 2::3].transpose(1, 0, 2)
 
-            spot_mask = np.logical_not(spot_mask).astype(int)
-            spot_background_mask = np.logical_not(spot_background_mask).astype(int)
+            # one row per spot per frame, spot major
+            spot_metrics = {"dataset": np.full(n_spots * n_frames, image["dataset"], dtype=object),
+                            "channel": np.full(n_spots * n_frames, image["channel"], dtype=object),
+                            "frame_index": np.tile(np.arange(n_frames) + image["frame_offset"], n_spots),
+                            "spot_index": np.repeat(spot_indices, n_frames),
+                            "spot_size": np.full(n_spots * n_frames, spot_size),
+                            }
 
-            spot_loc = dat["spot_loc"]
-            spot_x = spot_loc.x
-            spot_y = spot_loc.y
+            for column in ["spot_cx", "spot_cy", "spot_x", "spot_y"]:
+                spot_metrics[column] = np.repeat(task_data[column][batch_start:batch_end], n_frames)
 
-            # Perform preprocessing steps and overwrite original image
-            spot_values = np_array[:, y1:y2, x1:x2].copy()
-            spot_background = np_array[:, y1:y2, x1:x2].copy()
-            spot_masked_background = np_array[:, y1:y2, x1:x2].copy()
+            for metric_index, metric in enumerate(SPOT_METRICS):
+                spot_metrics[f"spot_{metric}"] = spot_values[:, :, metric_index].ravel()
 
-            spot_mask = np.repeat(spot_mask[np.newaxis, :, :], len(spot_values), axis=0)
-            spot_background_mask = np.repeat(spot_background_mask[np.newaxis, :, :], len(spot_masked_background), axis=0)
+            for suffix, values in [["local_bg", local_values], ["masked_local_bg", masked_local_values]]:
+                for metric_index, metric in enumerate(SPOT_METRICS):
+                    if metric == "sum":
+                        # background sums are scaled to the spot size
+                        spot_metrics[f"spot_sum_{suffix}"] = values[:, :, 0].ravel() * n_pixels
+                    else:
+                        spot_metrics[f"spot_{metric}_{suffix}"] = values[:, :, metric_index].ravel()
 
-            spot_values = np.ma.array(spot_values, mask=spot_mask)
-            spot_masked_background = np.ma.array(spot_masked_background, mask=spot_background_mask)
+            spot_metrics = pd.DataFrame(spot_metrics)
 
-            # metadata
-            spot_metrics["dataset"] = [dat["dataset"]]*len(spot_values)
-            spot_metrics["channel"] = [dat["channel"]]*len(spot_values)
-            spot_metrics["frame_index"] = np.arange(len(spot_values)).tolist()
-            spot_metrics["spot_index"] = [dat["spot_index"]]*len(spot_values)
-            spot_metrics["spot_cx"] = [spot_cx]*len(spot_values)
-            spot_metrics["spot_cy"] = [spot_cy]*len(spot_values)
-            spot_metrics["spot_x"] = [spot_x]*len(spot_values)
-            spot_metrics["spot_y"] = [spot_y]*len(spot_values)
-            spot_metrics["spot_size"] = [dat["spot_size"]]*len(spot_values)
-
-            # metrics
-            spot_mean = np.ma.mean(spot_values,axis=(1,2)).data
-            spot_median = np.ma.median(spot_values,axis=(1,2)).data
-            spot_sum = np.ma.sum(spot_values,axis=(1,2)).data
-            spot_max = np.ma.max(spot_values,axis=(1,2)).data
-            spot_std = np.ma.std(spot_values,axis=(1,2)).data
-
-            spot_mean_local_bg = np.mean(spot_background,axis=(1,2))
-            spot_median_local_bg = np.median(spot_background,axis=(1,2))
-            spot_sum_local_bg = spot_mean_local_bg*n_pixels
-            spot_max_local_bg = np.max(spot_background,axis=(1,2))
-            spot_std_local_bg = np.std(spot_background,axis=(1,2))
-
-            spot_mean_masked_local_bg = np.ma.mean(spot_masked_background,axis=(1,2)).data
-            spot_median_masked_local_bg = np.ma.median(spot_masked_background,axis=(1,2)).data
-            spot_sum_masked_local_bg = spot_mean_masked_local_bg*n_pixels
-            spot_max_masked_local_bg = np.ma.max(spot_masked_background,axis=(1,2)).data
-            spot_std_masked_local_bg = np.ma.std(spot_masked_background,axis=(1,2)).data
-
-            # populate spot metrics dict
-            spot_metrics["spot_mean"] = spot_mean
-            spot_metrics["spot_median"] = spot_median
-            spot_metrics["spot_sum"] = spot_sum
-            spot_metrics["spot_max"] = spot_max
-            spot_metrics["spot_std"] = spot_std
-
-            spot_metrics["spot_mean_local_bg"] = spot_mean_local_bg
-            spot_metrics["spot_median_local_bg"] = spot_median_local_bg
-            spot_metrics["spot_sum_local_bg"] = spot_sum_local_bg
-            spot_metrics["spot_max_local_bg"] = spot_max_local_bg
-            spot_metrics["spot_std_local_bg"] = spot_std_local_bg
-
-            spot_metrics["spot_mean_masked_local_bg"] = spot_mean_masked_local_bg
-            spot_metrics["spot_median_masked_local_bg"] = spot_median_masked_local_bg
-            spot_metrics["spot_sum_masked_local_bg"] = spot_sum_masked_local_bg
-            spot_metrics["spot_max_masked_local_bg"] = spot_max_masked_local_bg
-            spot_metrics["spot_std_masked_local_bg"] = spot_std_masked_local_bg
-
-            n_frames = len(spot_values)
-
-            # populate spot metrics dataframe
-            reshaped_spot_metrics = []
-            for i in range(n_frames):
-                new_dict = {key: spot_metrics[key][i] for key in spot_metrics}
-                reshaped_spot_metrics.append(new_dict)
-
-            spot_metrics = pd.DataFrame.from_dict(reshaped_spot_metrics)
+            frames, np_array, pixel_indices, region_offsets = None, None, None, None
+
+        task_data.close()
 
     except:
         print(traceback.format_exc())
@@ -417,6 +475,21 @@ def extract_spot_metrics(dat):
     return spot_metrics
 
 
+def get_trace_job_bytes(job):
+
+    image = job["image"]
+
+    if job["compute_task"] == "spot_metrics":
+        # metric arrays and dataframe rows of a batch of spots
+        n_spots = job["batch_end"] - job["batch_start"]
+        job_bytes = image["frames_available"] * n_spots * SPOT_FRAME_BYTES
+    else:
+        # background/picasso jobs work on single frames
+        job_bytes = int(np.prod(image["shape"][1:])) * 8 * 4
+
+    return job_bytes
+
+
 def crop_spot_data(image_shape, spot_bounds, spot_mask, background_mask=None):
 
     try:
@@ -685,50 +758,83 @@ class _trace_compute_utils:
             spot_bounds = self.generate_spot_bounds(locs, len(spot_mask[0]))
             spot_centers = self.get_localisation_centres(locs, mode="bounding_boxes")
 
+            n_locs = len(locs)
+            n_pixels = spot_size ** 2
+
+            spot_centers = np.array(spot_centers).reshape(-1, 2)
+
+            spot_arrays = {"locs": np.asarray(locs),
+                           "spot_centers": spot_centers,
+                           "spot_cx": spot_centers[:, 0],
+                           "spot_cy": spot_centers[:, 1],
+                           "spot_x": np.asarray(locs.x),
+                           "spot_y": np.asarray(locs.y),
+                           }
+
+            n_workers = self.get_compute_budget("traces")["workers"]
+
             spot_metrics_jobs = []
             picasso_metrics_jobs = []
             background_metrics_jobs = []
 
+            # masks, region indices and locs are published once per frame shape, jobs only carry
+            # indices into them and a small description of their image
+            task_data_dict = {}
+
             for image_dict in self.shared_images:
 
-                mask_shape = image_dict["shape"][1:]
-                n_frames = image_dict["shape"][0]
-                n_locs = len(locs)
-                channel = image_dict["channel"]
-                dataset = image_dict["dataset"]
-                n_pixels = int(self.gui.traces_spot_size.currentText()) ** 2
+                mask_shape = tuple(image_dict["shape"][1:])
+                n_frames = image_dict["frames_available"]
+
+                if mask_shape not in task_data_dict.keys():
+
+                    background_overlap_mask, global_spot_mask = self.generate_background_overlap_mask(locs,
+                        buffer_mask, spot_background_mask, mask_shape)
 
-                background_overlap_mask, global_spot_mask = self.generate_background_overlap_mask(locs,
-                    buffer_mask, spot_background_mask, mask_shape)
+                    pixel_indices, region_offsets = get_spot_region_indices(mask_shape, spot_bounds,
+                        spot_mask, spot_background_mask, background_overlap_mask)
+
+                    task_data = SharedTaskData({**spot_arrays,
+                                                "global_spot_mask": global_spot_mask,
+                                                "pixel_indices": pixel_indices,
+                                                "region_offsets": region_offsets},
+                        spot_size=spot_size, n_pixels=n_pixels, box_size=box_size)
+
+                    task_data_dict[mask_shape] = task_data
+                    self.trace_task_data.append(task_data)
+
+                task_data = task_data_dict[mask_shape]
+
+                image = {"dataset": image_dict["dataset"],
+                         "channel": image_dict["channel"],
+                         "shared_mem": image_dict["shared_mem"],
+                         "shape": image_dict["shape"],
+                         "dtype": image_dict["dtype"],
+                         "frames_available": n_frames,
+                         "frame_offset": image_dict["frame_offset"],
+                         }
+
+                # spots are batched so each job reads a frame once for many spots
+                batch_size = max(1, min(MAX_SPOT_BATCH_SIZE, SPOT_BATCH_FRAMES // max(1, n_frames),
+                    int(np.ceil(n_locs / n_workers))))
+
+                for batch_start in range(0, n_locs, batch_size):
 
-                for spot_index, (spot_loc, spot_bound, spot_center) in enumerate(zip(locs, spot_bounds, spot_centers)):
                     spot_compute_task = {"compute_task":"spot_metrics",
-                                         "spot_index": spot_index,
-                                         "spot_size": spot_size,
-                                         "spot_mask": spot_mask,
-                                         "spot_background_mask": spot_background_mask,
-                                         "global_spot_mask": global_spot_mask,
-                                         "background_overlap_mask": background_overlap_mask,
-                                         "spot_loc": spot_loc,
-                                         "spot_bound": spot_bound,
-                                         "spot_center": spot_center,
+                                         "batch_start": batch_start,
+                                         "batch_end": min(batch_start + batch_size, n_locs),
+                                         "image": image,
+                                         "task_data": task_data,
                                          "stop_event": self.stop_event,
                                          }
-                    spot_compute_task = {**spot_compute_task, **image_dict}
                     spot_metrics_jobs.append(spot_compute_task)
 
                 if compute_global_background:
                     for frame in range(n_frames):
                         background_task = {"compute_task":"background_metrics",
                                            "frame": frame,
-                                           "channel": channel,
-                                           "dataset": dataset,
-                                           "n_pixels": n_pixels,
-                                           "global_spot_mask": global_spot_mask,
-                                           "shared_mem": image_dict["shared_mem"],
-                                           "shape": image_dict["shape"],
-                                           "dtype": image_dict["dtype"],
-                                           "global_spot_mask": global_spot_mask,
+                                           "image": image,
+                                           "task_data": task_data,
                                            "stop_event": self.stop_event,
                                            }
                         background_metrics_jobs.append(background_task)
@@ -737,18 +843,10 @@ class _trace_compute_utils:
                     for frame_index in range(n_frames):
                         picasso_task = {"compute_task":"picasso_metrics",
                                         "frame_index": frame_index,
-                                        "channel": channel,
-                                        "dataset": dataset,
-                                        "n_pixels": n_pixels,
-                                        "shared_mem": image_dict["shared_mem"],
-                                        "shape": image_dict["shape"],
-                                        "dtype": image_dict["dtype"],
+                                        "image": image,
+                                        "task_data": task_data,
                                         "stop_event": self.stop_event,
-                                        "locs": copy.deepcopy(locs),
-                                        "loc_centers": spot_centers,
-                                        "box_size": box_size,
                                         }
-
                         picasso_metrics_jobs.append(picasso_task)
 
             compute_jobs["spot_metrics"] = spot_metrics_jobs
@@ -765,13 +863,15 @@ class _trace_compute_utils:
 
 
 
-    def extract_spot_metrics_wrapper(self, progress_callback):
+    def extract_spot_metrics_wrapper(self, progress_callback, block_index=0, n_blocks=1):
 
         try:
 
             compute_global_background = self.gui.compute_global_background.isChecked()
             compute_picasso = self.gui.compute_with_picasso.isChecked()
 
+            self.trace_task_data = []
+
             compute_jobs = self.populate_spot_metric_compute_jobs()
 
             spot_metrics_jobs = compute_jobs["spot_metrics"]
@@ -782,62 +882,71 @@ class _trace_compute_utils:
             background_metrics = []
             picasso_metrics = []
 
-            cpu_count = int(multiprocessing.cpu_count() * 0.9)
-
             total_jobs = len(spot_metrics_jobs) + len(background_metrics_jobs) + len(picasso_metrics_jobs)
 
-            with concurrent.futures.ProcessPoolExecutor(max_workers=cpu_count) as executor:
-                # Combine both job types into a single dictionary
+            executor = self.get_process_pool()
 
-                futures = {executor.submit(extract_spot_metrics, job): job for job in spot_metrics_jobs}
-                if compute_global_background:
-                    futures.update({executor.submit(extract_background_metrics, job): job for job in background_metrics_jobs})
-                if compute_picasso:
-                    futures.update({executor.submit(extract_picasso_spot_metrics, job): job for job in picasso_metrics_jobs})
+            # Combine all job types into a single list
+            jobs = [(extract_spot_metrics, job) for job in spot_metrics_jobs]
+            if compute_global_background:
+                jobs.extend([(extract_background_metrics, job) for job in background_metrics_jobs])
+            if compute_picasso:
+                jobs.extend([(extract_picasso_spot_metrics, job) for job in picasso_metrics_jobs])
 
-                iter = 0
-                for future in concurrent.futures.as_completed(futures):
-                    if self.stop_event.is_set():
-                        future.cancel()
-                    else:
-                        job = futures[future]
-                        job_type = job["compute_task"]
-                        try:
-                            result = future.result()  # Process result here
-                            # Append result to the appropriate list based on job type
-                            if job_type == "spot_metrics":
-                                if result is not None:
-                                    spot_metrics.append(result)
-                            elif job_type == "picasso_metrics":
-                                if result is not None:
-                                    picasso_metrics.append(result)
-                            else:
-                                if result is not None:
-                                    background_metrics.append(result)
-                        except concurrent.futures.TimeoutError:
-                            # Handle timeout
-                            pass
-                        except Exception as e:
-                            print(e)
-                            # Handle other exceptions
-                            pass
-
-                        # Update progress
-                        iter += 1
-                        progress = int((iter / total_jobs) * 100)
-                        progress_callback.emit(progress)  # Emit the signal
+            job_bytes = [get_trace_job_bytes(job) for _, job in jobs]
+
+            iter = 0
+            for job_index, future in self.schedule_jobs(executor, jobs, job_bytes, "traces"):
+                if self.stop_event.is_set():
+                    future.cancel()
+                else:
+                    job = jobs[job_index][1]
+                    job_type = job["compute_task"]
+                    try:
+                        result = future.result()  # Process result here
+                        # Append result to the appropriate list based on job type
+                        if job_type == "spot_metrics":
+                            if result is not None:
+                                spot_metrics.append(result)
+                        elif job_type == "picasso_metrics":
+                            if result is not None:
+                                picasso_metrics.append(result)
+                        else:
+                            if result is not None:
+                                background_metrics.append(result)
+                    except concurrent.futures.TimeoutError:
+                        # Handle timeout
+                        pass
+                    except Exception as e:
+                        print(e)
+                        # Handle other exceptions
+                        pass
+
+                    # Update progress
+                    iter += 1
+                    progress = int(((block_index + (iter / total_jobs)) / n_blocks) * 100)
+                    progress_callback.emit(progress)  # Emit the signal
 
         except:
             self.restore_shared_images()
             self.update_ui()
             print(traceback.format_exc())
 
+        self.release_trace_task_data()
+
         self.spot_metrics = spot_metrics
         self.background_metrics = background_metrics
         self.picasso_spot_metrics = picasso_metrics
 
         return spot_metrics, background_metrics, picasso_metrics
 
+    def release_trace_task_data(self):
+
+        for task_data in getattr(self, "trace_task_data", []):
+            task_data.close()
+
+        self.trace_task_data = []
+
     def populatate_traces_dict(self):
 
         spot_metrics = self.spot_metrics
@@ -846,62 +955,16 @@ class _trace_compute_utils:
 
         try:
 
-            self.traces_dict = {}
-
-            # format spot metrics into dataframe
-            if spot_metrics is not None:
-
-                spot_metrics = pd.concat(spot_metrics)
-                spot_metrics.sort_values(by=["dataset", "channel", "spot_index", "frame_index"], inplace=True)
-
-
-            if background_metrics is not None and len(background_metrics) > 0:
-
-                background_metrics = pd.DataFrame(background_metrics)
-
-                merge_keys = ["dataset", "channel", "frame_index"]
-                spot_metrics = pd.merge(spot_metrics, background_metrics, on=merge_keys, how='left')
-
+            self.traces_dict = build_trace_stores(spot_metrics, background_metrics, picasso_spot_metrics)
 
-            # format picasso spot metrics into dataframe and merge with spot metrics
-            if picasso_spot_metrics is not None and len(picasso_spot_metrics) > 0:
-
-                picasso_spot_metrics = pd.concat(picasso_spot_metrics)
-                picasso_spot_metrics.sort_values(by=["dataset", "channel", "spot_index", "frame_index"], inplace=True)
-
-                merge_keys = ["dataset", "channel", "spot_index","frame_index", "spot_cx","spot_cy"]
-                spot_metrics = pd.merge(spot_metrics, picasso_spot_metrics, on=merge_keys, how='left')
-
-            # populate traces dict
-            if spot_metrics is not None:
-
-                for names, data in spot_metrics.groupby(["dataset", "channel", "spot_index"]):
-
-                    dataset, channel, spot_index = names
+            # add gap label and sequence label
+            for dataset, dataset_traces in self.traces_dict.items():
+                for channel, trace_store in dataset_traces.items():
 
                     channel_dict = self.dataset_dict[dataset][channel]
 
-                    if "gap_label" in channel_dict.keys():
-                        gap_label = self.dataset_dict[dataset][channel]["gap_label"]
-                        sequence_label = self.dataset_dict[dataset][channel]["sequence_label"]
-                    else:
-                        gap_label = None
-                        sequence_label = None
-
-                    if dataset not in self.traces_dict.keys():
-                        self.traces_dict[dataset] = {}
-                    if channel not in self.traces_dict[dataset].keys():
-                        self.traces_dict[dataset][channel] = {}
-                    if spot_index not in self.traces_dict[dataset][channel].keys():
-                        self.traces_dict[dataset][channel][spot_index] = {}
-
-                    for column in data.columns:
-                        if column not in ["dataset", "channel", "spot_index", "frame_index"]:
-                            self.traces_dict[dataset][channel][spot_index][column] = data[column].values
-
-                        # add gap label and sequence label
-                        self.traces_dict[dataset][channel][spot_index]["gap_label"] = gap_label
-                        self.traces_dict[dataset][channel][spot_index]["sequence_label"] = sequence_label
+                    trace_store.fill_attribute("gap_label", channel_dict.get("gap_label", None))
+                    trace_store.fill_attribute("sequence_label", channel_dict.get("sequence_label", None))
 
         except:
             print(traceback.format_exc())
@@ -979,46 +1042,89 @@ class _trace_compute_utils:
 
                 if donor_channel is not None and acceptor_channel is not None:
 
-                    for spot_index in dataset_dict[donor_channel].keys():
+                    donor_store = dataset_dict[donor_channel]
+                    acceptor_store = dataset_dict[acceptor_channel]
 
-                        donor_data = dataset_dict[donor_channel][spot_index][spot_metric].copy()
-                        donor_background_data = dataset_dict[donor_channel][spot_index][background_metric].copy()
-                        acceptor_data = dataset_dict[acceptor_channel][spot_index][spot_metric].copy()
-                        acceptor_background_data = dataset_dict[acceptor_channel][spot_index][background_metric].copy()
+                    donor_data = donor_store.get_metric(spot_metric)
+                    donor_background_data = donor_store.get_metric(background_metric)
 
-                        donor_bleach_index = self.find_bleach_indices(donor_data, donor_background_data, mode=mode)
-                        acceptor_bleach_index = self.find_bleach_indices(acceptor_data, acceptor_background_data, mode=mode)
+                    bleach_indices = {}
+
+                    for position, spot_index in enumerate(donor_store.keys()):
+
+                        acceptor_data = acceptor_store.get_trace(spot_index, spot_metric)
+                        acceptor_background_data = acceptor_store.get_trace(spot_index, background_metric)
+
+                        donor_bleach_index = self.find_bleach_indices(donor_data[position],
+                            donor_background_data[position], mode=mode)
+                        acceptor_bleach_index = self.find_bleach_indices(acceptor_data,
+                            acceptor_background_data, mode=mode)
 
                         if donor_bleach_index != -1 and acceptor_bleach_index != -1:
                             bleach_index = max(donor_bleach_index, acceptor_bleach_index)
                         else:
                             bleach_index= -1
 
+                        bleach_indices[spot_index] = [bleach_index, donor_bleach_index, acceptor_bleach_index]
 
-                        for channel in dataset_dict.keys():
-                            self.traces_dict[dataset_name][channel][spot_index]["bleach_index"] = bleach_index
-                            self.traces_dict[dataset_name][channel][spot_index]["donor_bleach_index"] = donor_bleach_index
-                            self.traces_dict[dataset_name][channel][spot_index]["acceptor_bleach_index"] = acceptor_bleach_index
                 else:
 
-                    for spot_index in dataset_dict[channel_list[0]].keys():
+                    trace_store = dataset_dict[channel_list[0]]
+
+                    data = trace_store.get_metric(spot_metric)
+                    background_data = trace_store.get_metric(background_metric)
+
+                    bleach_indices = {}
 
-                        data = dataset_dict[channel_list[0]][spot_index][spot_metric].copy()
-                        background_data = dataset_dict[channel_list[0]][spot_index][background_metric].copy()
+                    for position, spot_index in enumerate(trace_store.keys()):
 
-                        bleach_index = self.find_bleach_indices(data, background_data, mode=mode)
+                        bleach_index = self.find_bleach_indices(data[position], background_data[position], mode=mode)
 
-                        for channel in dataset_dict.keys():
-                            self.traces_dict[dataset_name][channel][spot_index]["bleach_index"] = bleach_index
-                            self.traces_dict[dataset_name][channel][spot_index]["donor_bleach_index"] = bleach_index
-                            self.traces_dict[dataset_name][channel][spot_index]["acceptor_bleach_index"] = bleach_index
+                        bleach_indices[spot_index] = [bleach_index, bleach_index, bleach_index]
 
+                for channel, trace_store in dataset_dict.items():
+
+                    channel_indices = np.array([bleach_indices.get(spot_index, [-1, -1, -1])
+                                                for spot_index in trace_store.keys()], dtype=int).reshape(-1, 3)
+
+                    trace_store.set_attribute("bleach_index", channel_indices[:, 0])
+                    trace_store.set_attribute("donor_bleach_index", channel_indices[:, 1])
+                    trace_store.set_attribute("acceptor_bleach_index", channel_indices[:, 2])
 
         except:
             print(traceback.format_exc())
             pass
 
 
+    def get_traces_provenance(self):
+
+        traces_provenance = None
+
+        try:
+
+            bbox_locs = self.localisation_dict["bounding_boxes"]["localisations"]
+
+            stage_params = {"spot_size": self.gui.traces_spot_size.currentText(),
+                            "spot_shape": self.gui.traces_spot_shape.currentText(),
+                            "buffer_size": self.gui.traces_background_buffer.currentText(),
+                            "bg_width": self.gui.traces_background_width.currentText(),
+                            "compute_global_background": self.gui.compute_global_background.isChecked(),
+                            "compute_picasso": self.gui.compute_with_picasso.isChecked(),
+                            "bounding_boxes": get_array_hash(np.asarray(bbox_locs))}
+
+            traces_provenance = {}
+
+            for dataset_name, dataset_dict in self.dataset_dict.items():
+                for channel_name in dataset_dict.keys():
+                    traces_provenance[f"{dataset_name}:{channel_name}"] = self.get_stage_provenance("traces",
+                        stage_params, dataset_name, channel_name)
+
+        except:
+            print(traceback.format_exc())
+            traces_provenance = None
+
+        return traces_provenance
+
     def _molseeq_compute_traces(self, progress_callback=None, picasso=False):
 
         try:
@@ -1027,17 +1133,46 @@ class _trace_compute_utils:
             self.background_metrics = None
             self.picasso_spot_metrics = None
 
-            self.shared_images = self.create_shared_images()
+            if len(self.get_lazy_images()) > 0:
+                # lazy images are read in frame blocks, metrics keep their absolute frame index
+                frame_blocks = self.get_lazy_frame_blocks()
+            else:
+                frame_blocks = [None]
 
-            self.extract_spot_metrics_wrapper(progress_callback)
+            spot_metrics, background_metrics, picasso_spot_metrics = [], [], []
 
-            self.restore_shared_images()
+            for block_index, frame_range in enumerate(frame_blocks):
+
+                if self.stop_event.is_set():
+                    break
+
+                self.shared_images = self.create_shared_images(frame_range=frame_range)
+
+                self.extract_spot_metrics_wrapper(progress_callback, block_index, len(frame_blocks))
+
+                spot_metrics.extend(self.spot_metrics)
+                background_metrics.extend(self.background_metrics)
+                picasso_spot_metrics.extend(self.picasso_spot_metrics)
+
+                # trace extraction is read only, blocks are not written back
+                self.restore_shared_images(write_blocks=False)
+                self.shared_images = []
+
+            self.spot_metrics = spot_metrics
+            self.background_metrics = background_metrics
+            self.picasso_spot_metrics = picasso_spot_metrics
 
             self.populatate_traces_dict()
 
             self.compute_photo_bleaching()
             self.gui.compute_traces.setEnabled(True)
 
+            # traces of a stopped run are partial, so they are never marked as current
+            if self.stop_event.is_set() == False:
+                self.traces_provenance = self.get_traces_provenance()
+            else:
+                self.traces_provenance = None
+
         except:
             self.update_ui()
             self.restore_shared_images()
@@ -1046,6 +1181,8 @@ class _trace_compute_utils:
 
     def molseeq_compute_traces(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             compute_traces = False
@@ -1058,6 +1195,14 @@ class _trace_compute_utils:
                         if n_bboxes > 0:
                             compute_traces = True
 
+            if compute_traces == True and self.traces_dict != {}:
+
+                traces_provenance = self.get_traces_provenance()
+
+                if traces_provenance is not None and traces_provenance == self.traces_provenance:
+                    self.molseeq_notification("Traces are up to date, skipping trace computation.")
+                    compute_traces = None
+
             if compute_traces == True:
 
                 self.molseeq_notification(f"Computing traces for {n_bboxes} bounding boxes.")
@@ -1070,7 +1215,7 @@ class _trace_compute_utils:
                 self.worker.signals.error.connect(self._molseeq_compute_traces_finished)
                 self.threadpool.start(self.worker)
 
-            else:
+            elif compute_traces == False:
                 self.molseeq_notification("Bounding Boxes required for trace computation.")
 
 
@@ -0,0 +1,327 @@
+import numpy as np
+import pandas as pd
+
+# columns of the spot metric results that identify a row
+KEY_COLUMNS = ["dataset", "channel", "spot_index", "frame_index"]
+
+# columns that are constant for a spot, stored once per spot rather than once per frame
+SPOT_ATTRIBUTES = ["spot_cx", "spot_cy", "spot_x", "spot_y", "spot_size", "box_size", "spot_center"]
+
+
+class SpotTrace:
+
+    # view of one spot of a TraceStore, indexed like the nested per spot trace dicts it replaces
+
+    def __init__(self, store, position):
+
+        self.store = store
+        self.position = position
+
+    def keys(self):
+
+        return self.store.metrics + list(self.store.attributes.keys())
+
+    def __iter__(self):
+
+        return iter(self.keys())
+
+    def __len__(self):
+
+        return len(self.keys())
+
+    def __contains__(self, name):
+
+        return name in self.store.metric_index or name in self.store.attributes
+
+    def __getitem__(self, name):
+
+        if name in self.store.metric_index:
+            return self.store.data[self.position, :, self.store.metric_index[name]]
+
+        if name in self.store.attributes:
+            return self.store.attributes[name][self.position]
+
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+
+        if name in self.store.metric_index:
+            self.store.data[self.position, :, self.store.metric_index[name]] = value
+        else:
+            self.store.fill_attribute(name, value, self.position)
+
+    def get(self, name, default=None):
+
+        if name in self:
+            return self[name]
+
+        return default
+
+    def items(self):
+
+        return [(name, self[name]) for name in self.keys()]
+
+    def values(self):
+
+        return [self[name] for name in self.keys()]
+
+    def copy(self):
+
+        return dict(self.items())
+
+
+class TraceStore:
+
+    # traces of one dataset channel. metrics are one dense (n_spots, n_frames, n_metrics) float32 array
+    # with a metric name index, per spot values (bleach indices, labels, loc coordinates) are attribute
+    # columns. store[spot_index][metric] still returns a spot's trace, as a view of the dense array
+
+    def __init__(self, data, metrics, spot_indices, attributes=None):
+
+        self.data = data
+        self.metrics = list(metrics)
+        self.metric_index = {metric: index for index, metric in enumerate(self.metrics)}
+
+        self.spot_indices = np.asarray(spot_indices, dtype=np.int64)
+        self.spot_positions = {int(spot_index): position for position, spot_index in enumerate(self.spot_indices)}
+
+        self.attributes = dict(attributes or {})
+
+    @classmethod
+    def empty(cls, spot_indices, n_frames, metrics):
+
+        data = np.full((len(spot_indices), n_frames, len(metrics)), np.nan, dtype=np.float32)
+
+        return cls(data, metrics, spot_indices)
+
+    @property
+    def n_spots(self):
+
+        return self.data.shape[0]
+
+    @property
+    def n_frames(self):
+
+        return self.data.shape[1]
+
+    def has_metric(self, metric):
+
+        return metric in self.metric_index
+
+    def get_metric(self, metric):
+
+        # (n_spots, n_frames) view
+        return self.data[:, :, self.metric_index[metric]]
+
+    def set_metric(self, metric, values):
+
+        self.data[:, :, self.metric_index[metric]] = values
+
+    def get_trace(self, spot_index, metric):
+
+        return self.data[self.spot_positions[int(spot_index)], :, self.metric_index[metric]]
+
+    def get_values(self, metric, background_metric=None):
+
+        # (n_spots, n_frames) copy of a metric, with the background metric subtracted
+        values = self.get_metric(metric).copy()
+
+        if background_metric is not None:
+            values = values - self.get_metric(background_metric)
+
+        return values
+
+    def get_attribute(self, name):
+
+        return self.attributes[name]
+
+    def set_attribute(self, name, values):
+
+        # values are one value per spot, non numeric values are kept in object columns
+        try:
+            column = np.asarray(values)
+        except:
+            column = np.empty(0, dtype=object)
+
+        if column.dtype.kind not in "biuf" or column.shape != (self.n_spots,):
+            column = np.empty(self.n_spots, dtype=object)
+            for position, value in enumerate(values):
+                column[position] = value
+
+        self.attributes[name] = column
+
+    def fill_attribute(self, name, value, position=None):
+
+        # a single value for every spot, or for the spot at position
+        numeric = isinstance(value, (bool, int, float, np.number))
+
+        if name not in self.attributes:
+            if numeric:
+                self.attributes[name] = np.zeros(self.n_spots, dtype=np.asarray(value).dtype)
+            else:
+                self.attributes[name] = np.full(self.n_spots, None, dtype=object)
+
+        column = self.attributes[name]
+
+        if numeric == False and column.dtype != object:
+            column = column.astype(object)
+            self.attributes[name] = column
+
+        if position is not None:
+            column[position] = value
+        elif column.dtype == object:
+            for position in range(self.n_spots):
+                column[position] = value
+        else:
+            column[:] = value
+
+    def keys(self):
+
+        return [int(spot_index) for spot_index in self.spot_indices]
+
+    def __iter__(self):
+
+        return iter(self.keys())
+
+    def __len__(self):
+
+        return self.n_spots
+
+    def __contains__(self, spot_index):
+
+        try:
+            return int(spot_index) in self.spot_positions
+        except:
+            return False
+
+    def __getitem__(self, spot_index):
+
+        return SpotTrace(self, self.spot_positions[int(spot_index)])
+
+    def items(self):
+
+        return [(spot_index, self[spot_index]) for spot_index in self.keys()]
+
+    def values(self):
+
+        return [self[spot_index] for spot_index in self.keys()]
+
+    def copy(self):
+
+        # shallow, as with the dicts it replaces
+        return TraceStore(self.data, self.metrics, self.spot_indices, self.attributes)
+
+
+def get_metric_columns(metrics, exclude):
+
+    return [column for column in metrics.columns if column not in exclude
+            and pd.api.types.is_numeric_dtype(metrics[column])]
+
+
+def build_trace_stores(spot_metrics, background_metrics=None, picasso_spot_metrics=None):
+
+    # spot metrics are dataframes of a batch of spots of one dataset channel, background metrics are dicts
+    # of one frame, picasso metrics are dataframes of one frame. rows are scattered into a TraceStore per
+    # dataset channel, so the results are never merged or grouped as one large dataframe
+    trace_stores = {}
+
+    spot_metrics = [metrics for metrics in (spot_metrics or []) if metrics is not None and len(metrics) > 0]
+
+    spot_groups = {}
+    for metrics in spot_metrics:
+        key = (metrics["dataset"].iat[0], metrics["channel"].iat[0])
+        spot_groups.setdefault(key, []).append(metrics)
+
+    if len(spot_groups) == 0:
+        return trace_stores
+
+    if background_metrics is not None and len(background_metrics) > 0:
+        background_metrics = pd.DataFrame(background_metrics)
+        background_groups = dict(list(background_metrics.groupby(["dataset", "channel"])))
+        background_names = get_metric_columns(background_metrics, KEY_COLUMNS)
+    else:
+        background_groups = {}
+        background_names = []
+
+    picasso_groups = {}
+    for metrics in (picasso_spot_metrics or []):
+        if metrics is not None and len(metrics) > 0:
+            key = (metrics["dataset"].iat[0], metrics["channel"].iat[0])
+            picasso_groups.setdefault(key, []).append(metrics)
+
+    # datasets and channels in sorted order, as grouped by the dataframes this replaces
+    for dataset, channel in sorted(spot_groups.keys()):
+
+        metrics_list = spot_groups[(dataset, channel)]
+
+        spot_names = get_metric_columns(metrics_list[0], KEY_COLUMNS + SPOT_ATTRIBUTES)
+
+        if (dataset, channel) in picasso_groups.keys():
+            picasso_metrics = pd.concat(picasso_groups[(dataset, channel)])
+            picasso_names = [name for name in get_metric_columns(picasso_metrics, KEY_COLUMNS + SPOT_ATTRIBUTES)
+                             if name not in spot_names]
+        else:
+            picasso_metrics = None
+            picasso_names = []
+
+        channel_background_names = background_names if (dataset, channel) in background_groups.keys() else []
+
+        spot_indices = np.unique(np.concatenate([metrics["spot_index"].values for metrics in metrics_list]))
+        n_frames = int(max([metrics["frame_index"].max() for metrics in metrics_list])) + 1
+
+        store = TraceStore.empty(spot_indices, n_frames, spot_names + channel_background_names + picasso_names)
+
+        for metrics in metrics_list:
+
+            rows = np.searchsorted(spot_indices, metrics["spot_index"].values)
+            frames = metrics["frame_index"].values.astype(np.int64)
+
+            store.data[rows, frames, :len(spot_names)] = metrics[spot_names].to_numpy(dtype=np.float32)
+
+            update_spot_attributes(store, metrics, rows)
+
+        if len(channel_background_names) > 0:
+
+            background = background_groups[(dataset, channel)]
+
+            start = len(spot_names)
+            frames = background["frame_index"].values.astype(np.int64)
+            values = background[channel_background_names].to_numpy(dtype=np.float32)
+
+            # global background is the same for every spot
+            store.data[:, frames, start:start + len(channel_background_names)] = values[np.newaxis]
+
+        if picasso_metrics is not None:
+
+            start = len(spot_names) + len(channel_background_names)
+
+            picasso_metrics = picasso_metrics[np.isin(picasso_metrics["spot_index"].values, spot_indices)]
+
+            rows = np.searchsorted(spot_indices, picasso_metrics["spot_index"].values)
+            frames = picasso_metrics["frame_index"].values.astype(np.int64)
+
+            store.data[rows, frames, start:start + len(picasso_names)] = picasso_metrics[picasso_names].to_numpy(dtype=np.float32)
+
+            update_spot_attributes(store, picasso_metrics, rows)
+
+        trace_stores.setdefault(dataset, {})[channel] = store
+
+    return trace_stores
+
+
+def update_spot_attributes(store, metrics, rows):
+
+    for name in SPOT_ATTRIBUTES:
+
+        if name not in metrics.columns:
+            continue
+
+        values = metrics[name].values
+
+        if name not in store.attributes:
+            if values.dtype.kind in "biuf":
+                store.attributes[name] = np.zeros(store.n_spots, dtype=values.dtype)
+            else:
+                store.attributes[name] = np.full(store.n_spots, None, dtype=object)
+
+        store.attributes[name][rows] = values
@@ -2,7 +2,6 @@ import traceback
 import pandas as pd
 import trackpy as tp
 import numpy as np
-from molseeq.funcs.utils_compute import Worker
 
 class _tracking_utils:
 
@@ -103,6 +102,8 @@ class _tracking_utils:
 
     def initialise_tracking(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             dataset = self.gui.tracking_dataset.currentText()
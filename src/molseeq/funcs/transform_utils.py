@@ -3,8 +3,7 @@ import numpy as np
 import cv2
 import os
 from functools import partial
-from molseeq.funcs.utils_compute import Worker
-from qtpy.QtWidgets import QFileDialog
+from molseeq.funcs.lazy_array_utils import read_lazy_block
 import math
 import json
 from datetime import datetime
@@ -47,6 +46,22 @@ def transform_image(img, transform_matrix,
     return transformed_image
 
 
+def read_transform_matrix(path):
+
+    transform_matrix = None
+
+    with open(path, 'r') as f:
+        transform_matrix = json.load(f)
+
+    transform_matrix = np.array(transform_matrix, dtype=np.float64)
+
+    if transform_matrix.shape != (3, 3):
+        print("Transformation matrix is wrong shape, should be (3,3)")
+        transform_matrix = None
+
+    return transform_matrix
+
+
 class _tranform_utils:
 
     def normalize_image(self, img, norm_method="minmax"):
@@ -113,6 +128,8 @@ class _tranform_utils:
 
     def save_transform_matrix(self):
 
+        from qtpy.QtWidgets import QFileDialog
+
         try:
 
             if self.transform_matrix is not None:
@@ -187,16 +204,31 @@ class _tranform_utils:
                     dataset_name = target_images[i]["dataset_name"]
                     channel_name = target_images[i]["channel_name"]
 
-                    img = self.dataset_dict[dataset_name][channel_name.lower()]["data"].copy()
-
                     def transform_progress(progress):
                         nonlocal iter
                         iter += progress
                         progress = int((iter / total_frames) * 100)
                         progress_callback.emit(progress)
 
-                    img = transform_image(img, self.transform_matrix,progress_callback=transform_progress)
-                    self.dataset_dict[dataset_name][channel_name.lower()]["data"] = img.copy()
+                    if self.is_lazy_image(dataset_name, channel_name.lower()):
+
+                        # lazy images are transformed block by block and written back in place
+                        img = self.get_writable_image(dataset_name, channel_name.lower())
+
+                        for start_index, end_index in self.get_lazy_frame_blocks([dataset_name], [channel_name.lower()]):
+                            img_block = read_lazy_block(img, [start_index, end_index])
+                            img[start_index:end_index] = transform_image(img_block, self.transform_matrix,
+                                progress_callback=transform_progress)
+
+                    else:
+
+                        img = self.dataset_dict[dataset_name][channel_name.lower()]["data"].copy()
+
+                        img = transform_image(img, self.transform_matrix,progress_callback=transform_progress)
+                        self.dataset_dict[dataset_name][channel_name.lower()]["data"] = img.copy()
+
+                    self.record_image_stage(dataset_name, channel_name.lower(), "transform",
+                        {"transform_matrix": np.asarray(self.transform_matrix).tolist()})
 
         except:
             print(traceback.format_exc())
@@ -205,6 +237,8 @@ class _tranform_utils:
 
     def apply_transform_matrix(self):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             if self.dataset_dict != {}:
@@ -238,6 +272,8 @@ class _tranform_utils:
 
     def import_transform_matrix(self):
 
+        from qtpy.QtWidgets import QFileDialog
+
         try:
 
             desktop = os.path.expanduser("~/Desktop")
@@ -246,21 +282,15 @@ class _tranform_utils:
             self.transform_matrix = None
 
             if path != "":
-                if os.path.isfile(path) == True:
-                    if path.endswith(".txt"):
-                        with open(path, 'r') as f:
-                            transform_matrix = json.load(f)
+                if os.path.isfile(path) == True and path.endswith(".txt"):
 
-                    transform_matrix = np.array(transform_matrix, dtype=np.float64)
+                    transform_matrix = read_transform_matrix(path)
 
-                    if transform_matrix.shape == (3, 3):
+                    if transform_matrix is not None:
                         self.transform_matrix = transform_matrix
 
                         print(f"Loaded transformation matrix:\n{transform_matrix}")
 
-                    else:
-                        print("Transformation matrix is wrong shape, should be (3,3)")
-
         except:
             print(traceback.format_exc())
             pass
@@ -2,15 +2,13 @@ import traceback
 import numpy as np
 import pandas as pd
 
-from molseeq.funcs.utils_compute import Worker
+from molseeq.funcs.session_utils import get_array_hash
+from molseeq.funcs.shared_memory_utils import SharedProgressCounter
 import scipy.ndimage
-import multiprocessing
 from multiprocessing import shared_memory
 from functools import partial
 import concurrent.futures
 from picasso.postprocess import undrift as picasso_undrift
-from multiprocessing import Manager
-import time
 
 
 def undrift_image(dat):
@@ -45,7 +43,7 @@ def undrift_image(dat):
 
 
 
-def detect_dataset_drift(dat, progress_dict, index):
+def detect_dataset_drift(dat, progress_counter, index):
 
     dataset_dict = dat["dataset_dict"]
     segmentation = dat["segmentation"]
@@ -75,7 +73,7 @@ def detect_dataset_drift(dat, progress_dict, index):
             segmentation_progress = compute_progress["segmentation"]
             undrift_progress = compute_progress["undrift"]
             total_progress = int((segmentation_progress + undrift_progress)/2)
-            progress_dict[index] = total_progress
+            progress_counter.set(index, total_progress)
         def segmentation_callback(progress):
             compute_progress["segmentation"] = (progress/len_segments)*100
             total_progress()
@@ -99,9 +97,9 @@ def detect_dataset_drift(dat, progress_dict, index):
                 dataset_dict["undrifted_locs"] = undrifted_locs
 
             else:
-                progress_dict[index] = 100
+                progress_counter.set(index, 100)
         else:
-            progress_dict[index] = 100
+            progress_counter.set(index, 100)
 
     except:
         print(traceback.format_exc())
@@ -159,38 +157,58 @@ class _undrift_utils:
 
             if undrift_dict != None:
 
-                self.shared_images = self.create_shared_images()
+                if len(self.get_lazy_images()) > 0:
+                    # lazy images are undrifted in frame blocks
+                    frame_blocks = self.get_lazy_frame_blocks()
+                else:
+                    frame_blocks = [None]
 
-                compute_jobs = []
+                undrifted_images = []
+
+                for block_index, frame_range in enumerate(frame_blocks):
+
+                    if self.stop_event.is_set():
+                        break
+
+                    self.shared_images = self.create_shared_images(frame_range=frame_range)
+
+                    compute_jobs = []
+
+                    for image_dict in self.shared_images:
 
-                for image_dict in self.shared_images:
+                        dataset = image_dict["dataset"]
+                        channel = image_dict["channel"]
+                        n_frames = image_dict['shape'][0]
+                        frame_offset = image_dict["frame_offset"]
 
-                    dataset = image_dict["dataset"]
-                    channel = image_dict["channel"]
-                    n_frames = image_dict['shape'][0]
+                        frame_index_list = list(range(n_frames))
 
-                    frame_index_list = list(range(n_frames))
+                        if dataset in undrift_dict.keys() and "drift" in undrift_dict[dataset].keys():
 
-                    if "drift" in undrift_dict[dataset].keys():
+                            image_drift = undrift_dict[dataset]["drift"]
 
-                        image_drift = undrift_dict[dataset]["drift"]
+                            if [dataset, channel.lower()] not in undrifted_images:
 
-                        self.dataset_dict[dataset][channel.lower()]["drift"] = image_drift
+                                self.dataset_dict[dataset][channel.lower()]["drift"] = image_drift
 
-                        for frame_index, frame_drift in zip(frame_index_list, image_drift):
+                                undrifted_images.append([dataset, channel.lower()])
 
-                            compute_jobs.append({"shared_memory_name": image_dict["shared_memory_name"],
-                                                 "shape": image_dict["shape"],
-                                                 "dtype": image_dict["dtype"],
-                                                 "frame_index": frame_index,
-                                                 "drift": frame_drift,
-                                                 "stop_event": self.stop_event,
-                                                 })
+                            block_drift = image_drift[frame_offset:frame_offset + n_frames]
 
-                cpu_count = int(multiprocessing.cpu_count() * 0.9)
-                timeout_duration = 10  # Timeout in seconds
+                            for frame_index, frame_drift in zip(frame_index_list, block_drift):
+
+                                compute_jobs.append({"shared_memory_name": image_dict["shared_memory_name"],
+                                                     "shape": image_dict["shape"],
+                                                     "dtype": image_dict["dtype"],
+                                                     "frame_index": frame_index,
+                                                     "drift": frame_drift,
+                                                     "stop_event": self.stop_event,
+                                                     })
+
+                    timeout_duration = 10  # Timeout in seconds
+
+                    executor = self.get_process_pool()
 
-                with concurrent.futures.ProcessPoolExecutor(max_workers=cpu_count) as executor:
                     # Submit all jobs and store the future objects
                     futures = {executor.submit(undrift_image, job): job for job in compute_jobs}
 
@@ -212,10 +230,19 @@ class _undrift_utils:
 
                             # Update progress
                             iter += 1
-                            progress = 50 + int((iter / len(compute_jobs)) * 50)
+                            progress = 50 + int(((block_index + (iter / len(compute_jobs))) / len(frame_blocks)) * 50)
                             progress_callback.emit(progress)  # Emit the signal
 
-                self.restore_shared_images()
+                    self.restore_shared_images()
+                    self.shared_images = []
+
+                # images are only recorded as undrifted once every frame job has finished
+                for dataset, channel in undrifted_images:
+                    if self.stop_event.is_set() == False:
+                        self.record_image_stage(dataset, channel, "undrift",
+                            {"drift": get_array_hash(np.asarray(undrift_dict[dataset]["drift"]))})
+                    else:
+                        self.record_stopped_image_stage(dataset, channel, "undrift")
 
         except:
             self.restore_shared_images()
@@ -231,41 +258,35 @@ class _undrift_utils:
 
             if undrift_dict != {}:
                 compute_jobs = []
-                progress_dict = {}
 
                 for dataset, dataset_dict in undrift_dict.items():
 
                     compute_jobs.append({"dataset": dataset, "dataset_dict": dataset_dict, "segmentation": segmentation})
-                    progress_dict[dataset] = 0
 
-                cpu_count = int(multiprocessing.cpu_count() * 0.9)
+                progress_counter = SharedProgressCounter(len(compute_jobs))
+
+                executor = self.get_process_pool()
 
-                with Manager() as manager:
-                    progress_dict = manager.dict()
+                # Submit all jobs
+                futures = [executor.submit(detect_dataset_drift, job, progress_counter, i) for i, job in enumerate(compute_jobs)]
 
-                    with concurrent.futures.ProcessPoolExecutor(max_workers=cpu_count) as executor:
-                        # Submit all jobs
-                        futures = [executor.submit(detect_dataset_drift, job, progress_dict, i) for i, job in enumerate(compute_jobs)]
+                # per job progress is stored as a percentage, detection is the first half of undrifting
+                self.monitor_progress(futures, progress_counter, len(compute_jobs) * 100,
+                    progress_callback, progress_range=(0, 50))
 
-                        while any(not future.done() for future in futures):
-                            # Calculate and emit progress
-                            total_progress = sum(progress_dict.values())
-                            overall_progress = int((total_progress / len(compute_jobs))/2)
-                            if progress_callback is not None:
-                                progress_callback.emit(overall_progress)
-                            time.sleep(1)  # Update frequency
+                # Wait for all futures to complete
+                concurrent.futures.wait(futures)
 
-                        # Wait for all futures to complete
-                        concurrent.futures.wait(futures)
+                # Retrieve and process results
+                results = [future.result() for future in futures]
+                for result in results:
+                    if result is not None:
+                        if "drift" in result.keys():
+                            drift = result["drift"]
+                            dataset = result["dataset"]
+                            undrift_dict[dataset]["drift"] = drift
 
-                        # Retrieve and process results
-                        results = [future.result() for future in futures]
-                        for result in results:
-                            if result is not None:
-                                if "drift" in result.keys():
-                                    drift = result["drift"]
-                                    dataset = result["dataset"]
-                                    undrift_dict[dataset]["drift"] = drift
+                progress_counter.close()
 
         except:
             print(traceback.format_exc())
@@ -286,8 +307,29 @@ class _undrift_utils:
             pass
 
 
+    def get_undrift_dict(self, dataset_list, channel):
+
+        undrift_dict = {}
+
+        for dataset in dataset_list:
+            loc_dict, n_locs, _ = self.get_loc_dict(dataset, channel.lower())
+            if n_locs > 0 and loc_dict["fitted"] == True:
+
+                n_frames,height,width = self.dataset_dict[dataset][channel.lower()]["data"].shape
+                picasso_info = [{'Frames': n_frames, 'Height': height, 'Width': width}, {}]
+
+                undrift_dict[dataset] = {"loc_dict": loc_dict, "n_locs": n_locs,
+                                         "picasso_info": picasso_info,
+                                         "channel": channel.lower(), "dataset": dataset}
+            else:
+                self.molseeq_notification("No fitted localizations found for dataset: " + dataset)
+
+        return undrift_dict
+
     def undrift_images(self, segmentation=20):
 
+        from molseeq.funcs.qt_worker import Worker
+
         try:
 
             dataset = self.gui.undrift_dataset_selector.currentText()
@@ -298,20 +340,7 @@ class _undrift_utils:
             else:
                 dataset_list = [dataset]
 
-            undrift_dict = {}
-
-            for dataset in dataset_list:
-                loc_dict, n_locs, _ = self.get_loc_dict(dataset, channel.lower())
-                if n_locs > 0 and loc_dict["fitted"] == True:
-
-                    n_frames,height,width = self.dataset_dict[dataset][channel.lower()]["data"].shape
-                    picasso_info = [{'Frames': n_frames, 'Height': height, 'Width': width}, {}]
-
-                    undrift_dict[dataset] = {"loc_dict": loc_dict, "n_locs": n_locs,
-                                             "picasso_info": picasso_info,
-                                             "channel": channel.lower(), "dataset": dataset}
-                else:
-                    self.molseeq_notification("No fitted localizations found for dataset: " + dataset)
+            undrift_dict = self.get_undrift_dict(dataset_list, channel)
 
             if undrift_dict != {}:
 
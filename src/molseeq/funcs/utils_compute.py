@@ -1,16 +1,84 @@
-from qtpy.QtCore import QObject
-from qtpy.QtCore import QRunnable
-from PyQt5.QtCore import pyqtSignal, pyqtSlot
 import traceback
-import sys
 from multiprocessing import Process, shared_memory, Pool
 import numpy as np
-import napari
+from molseeq.funcs.lazy_array_utils import read_lazy_block, is_lazy_array
+from molseeq.funcs.shared_memory_utils import SharedImageStore
 
 class _utils_compute:
 
+    def get_shared_image_store(self):
+
+        if getattr(self, "shared_image_store", None) is None:
+            self.shared_image_store = SharedImageStore()
+
+        return self.shared_image_store
+
+    def get_shared_channel_block(self, dataset, channel):
+
+        block = None
+
+        try:
+
+            channel_dict = self.dataset_dict[dataset][channel]
+            image = channel_dict["data"]
+
+            # lazy images stay on disk, in memory images move into the shared memory arena once
+            if is_lazy_array(image) == False and image.flags.c_contiguous:
+
+                store = self.get_shared_image_store()
+
+                block = store.find(image)
+
+                if block is None:
+
+                    if self.verbose:
+                        print(f"Moving {dataset} {channel} into shared memory")
+
+                    block = store.put(image)
+                    channel_dict["data"] = block.array
+
+        except:
+            print(traceback.format_exc())
+            block = None
+
+        return block
+
+    def release_unused_shared_images(self):
+
+        try:
+
+            if getattr(self, "shared_image_store", None) is not None:
+
+                images = [channel_dict["data"] for dataset_dict in self.dataset_dict.values()
+                          for channel_dict in dataset_dict.values() if "data" in channel_dict.keys()]
+
+                self.shared_image_store.release_unused(images)
+
+        except:
+            print(traceback.format_exc())
+            pass
+
+    def close_shared_image_store(self):
+
+        if getattr(self, "shared_image_store", None) is not None:
+            self.shared_image_store.close()
+            self.shared_image_store = None
+
+    def get_frames_available(self, dataset, channel):
+
+        channel_dict = self.dataset_dict[dataset][channel]
+
+        n_frames = channel_dict["data"].shape[0]
+
+        # streaming imports only expose frames that have been fully imported
+        if "frames_available" in channel_dict.keys():
+            n_frames = min(n_frames, channel_dict["frames_available"])
+
+        return n_frames
+
     def create_shared_image_chunks(self, dataset_list = None,
-            channel_list = None, chunk_size = 100, frame_index = None):
+            channel_list = None, chunk_size = None, frame_index = None,
+            operation = None, working_set = 1):
 
         if self.verbose:
             print("Creating shared images")
@@ -37,13 +105,26 @@ class _utils_compute:
                     if "data" in channel_dict.keys():
 
                         if type(frame_index) == int:
+                            block = None
                             n_chunks = 1
-                            image = channel_dict["data"]
                             n_frames = 1
                         else:
-                            image = channel_dict.pop("data")
-                            n_frames = image.shape[0]
-                            n_chunks = int(np.ceil(n_frames / chunk_size))
+                            block = self.get_shared_channel_block(dataset_name, channel_name)
+                            n_frames = self.get_frames_available(dataset_name, channel_name)
+
+                        # chunks are read only, channel data stays in place (may be a memmap)
+                        image = channel_dict["data"]
+
+                        if type(frame_index) != int:
+
+                            image_chunk_size = chunk_size
+
+                            if image_chunk_size is None:
+                                # chunk size is set by the memory budget of the operation
+                                frame_bytes = int(np.prod(image.shape[1:])) * np.dtype(image.dtype).itemsize
+                                image_chunk_size = self.get_chunk_size(frame_bytes, operation, working_set)
+
+                            n_chunks = int(np.ceil(n_frames / image_chunk_size))
 
                         for chunk_index in range(n_chunks):
 
@@ -52,17 +133,51 @@ class _utils_compute:
                                 start_index = frame_index
                                 end_index = frame_index + 1
 
-                                chunk = image[start_index].copy()
-                                chunk = np.expand_dims(chunk, axis=0)
+                                chunk = read_lazy_block(image, [start_index, end_index])
 
                             else:
-                                start_index = chunk_index * chunk_size
-                                end_index = (chunk_index + 1) * chunk_size
+                                start_index = chunk_index * image_chunk_size
+                                end_index = (chunk_index + 1) * image_chunk_size
 
                                 if end_index > n_frames:
                                     end_index = n_frames
 
-                                chunk = image[start_index:end_index]
+                                if block is not None:
+
+                                    # chunks are views into the shared memory arena, nothing is copied
+                                    frame_bytes = int(np.prod(block.shape[1:])) * block.dtype.itemsize
+
+                                    self.shared_chunks.append({"dataset": dataset_name,
+                                                               "channel": channel_name,
+                                                               "gap_label": channel_dict["gap_label"],
+                                                               "sequence_label": channel_dict["sequence_label"],
+                                                               "n_frames": n_frames,
+                                                               "shape": (end_index - start_index, *block.shape[1:]),
+                                                               "dtype": block.dtype,
+                                                               "offset": start_index * frame_bytes,
+                                                               "start_index": start_index,
+                                                               "end_index": end_index,
+                                                               "chunk_size": image_chunk_size,
+                                                               "shared_mem": block.shared_mem,
+                                                               "shared_memory_name": block.name,
+                                                               "arena": True})
+                                    continue
+
+                                # lazy chunks are only read into shared memory when their job is submitted
+                                self.shared_chunks.append({"dataset": dataset_name,
+                                                           "channel": channel_name,
+                                                           "gap_label": channel_dict["gap_label"],
+                                                           "sequence_label": channel_dict["sequence_label"],
+                                                           "n_frames": n_frames,
+                                                           "shape": (end_index - start_index, *image.shape[1:]),
+                                                           "dtype": image.dtype,
+                                                           "start_index": start_index,
+                                                           "end_index": end_index,
+                                                           "chunk_size": image_chunk_size,
+                                                           "shared_mem": None,
+                                                           "shared_memory_name": None,
+                                                           "deferred": True})
+                                continue
 
                             shared_mem = shared_memory.SharedMemory(create=True, size=chunk.nbytes)
                             shared_memory_name = shared_mem.name
@@ -78,10 +193,40 @@ class _utils_compute:
                                                        "dtype": chunk.dtype,
                                                        "start_index": start_index,
                                                        "end_index": end_index,
-                                                       "chunk_size": chunk_size,
+                                                       "chunk_size": 1,
                                                        "shared_mem": shared_mem,
                                                        "shared_memory_name": shared_memory_name})
 
+    def load_shared_image_chunk(self, chunk):
+
+        if chunk.get("deferred", False) and chunk["shared_mem"] is None:
+
+            image = self.dataset_dict[chunk["dataset"]][chunk["channel"]]["data"]
+            data = read_lazy_block(image, [chunk["start_index"], chunk["end_index"]])
+
+            shared_mem = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+            shared_chunk = np.ndarray(data.shape, dtype=data.dtype, buffer=shared_mem.buf)
+            shared_chunk[:] = data[:]
+
+            chunk["shared_mem"] = shared_mem
+            chunk["shared_memory_name"] = shared_mem.name
+
+        return chunk
+
+    def release_shared_image_chunk(self, chunk):
+
+        if chunk.get("deferred", False) and chunk["shared_mem"] is not None:
+
+            try:
+                chunk["shared_mem"].close()
+                chunk["shared_mem"].unlink()
+            except:
+                print(traceback.format_exc())
+                pass
+
+            chunk["shared_mem"] = None
+            chunk["shared_memory_name"] = None
+
     def restore_shared_image_chunks(self):
 
         if self.verbose:
@@ -91,81 +236,22 @@ class _utils_compute:
 
             if type(self.shared_chunks) == list:
 
-                dataset_list = []
-                channel_list = []
-
                 for dat in self.shared_chunks:
                     try:
-                        dataset = dat["dataset"]
-                        channel = dat["channel"]
-                        shape = dat["shape"]
-                        dtype = dat["dtype"]
-                        start_index = dat["start_index"]
-                        shared_mem = dat["shared_mem"]
+                        if dat.get("arena", False) or dat["shared_mem"] is None:
+                            continue
 
-                        np_array = np.ndarray(shape, dtype=dtype, buffer=shared_mem.buf).copy()
+                        shared_mem = dat["shared_mem"]
                         shared_mem.close()
                         shared_mem.unlink()
-
-                        image_dict = self.dataset_dict[dataset][channel]
-
-                        if "data" not in image_dict.keys():
-                            image_dict["data"] = []
-                            image_dict["chunk_idices"] = []
-
-                        if type(image_dict["data"]) == list:
-
-                            image_dict["data"].append(np_array)
-                            image_dict["chunk_idices"].append(start_index)
-
-                            dataset_list.append(dataset)
-                            channel_list.append(channel)
-
-                        # else:
-                        #     print(f"Error: {dataset} {channel} data is not a list")
-
                     except:
                         print(traceback.format_exc())
                         pass
 
-                dataset_list = list(set(dataset_list))
-                channel_list = list(set(channel_list))
-
-                for dataset in dataset_list:
-                    for channel in channel_list:
-
-                        try:
+                self.shared_chunks = []
 
-                            image_dict = self.dataset_dict[dataset][channel]
-
-                            if "data" in image_dict.keys():
-
-                                chunk_indices = image_dict["chunk_idices"]
-                                images = image_dict["data"]
-
-                                sorted_indices = np.argsort(chunk_indices)
-
-                                # print(f"Restoring {dataset} {channel} {len(images)} chunks")
-                                # print(f"Chunk indices: {chunk_indices}")
-                                # print(f"Sorted indices: {sorted_indices}")
-
-                                sorted_images = [images[i] for i in sorted_indices]
-                                image = np.concatenate(sorted_images, axis=0)
-
-                                image_dict["data"] = image
-                                del image_dict["chunk_idices"]
-
-                        except:
-                            pass
-
-
-
-
-
-
-
-
-    def create_shared_images(self, dataset_list = None, channel_list = None):
+    def create_shared_images(self, dataset_list = None, channel_list = None,
+            frame_range = None, row_range = None):
 
         if self.verbose:
             print("Creating shared images")
@@ -190,9 +276,53 @@ class _utils_compute:
 
                     channel_dict = self.dataset_dict[dataset_name][channel_name]
 
-                    image = channel_dict.pop("data")
+                    frames_available = self.get_frames_available(dataset_name, channel_name)
+
+                    if frame_range is None and row_range is None:
+
+                        block = self.get_shared_channel_block(dataset_name, channel_name)
+
+                        if block is not None:
+
+                            # channel data lives in the shared memory arena, workers edit it in place
+                            self.shared_images.append({"dataset": dataset_name,
+                                                       "channel": channel_name,
+                                                       "gap_label": channel_dict["gap_label"],
+                                                       "sequence_label": channel_dict["sequence_label"],
+                                                       "n_frames": block.shape[0],
+                                                       "frames_available": frames_available,
+                                                       "frame_offset": 0,
+                                                       "row_offset": 0,
+                                                       "block": False,
+                                                       "arena": True,
+                                                       "shape": block.shape,
+                                                       "dtype": block.dtype,
+                                                       "shared_mem": block.shared_mem,
+                                                       "shared_memory_name": block.name})
+                            continue
+
+                        image = channel_dict.pop("data")
+                        frame_offset, row_offset = 0, 0
+
+                    else:
+
+                        # a block of a (lazy) image, written back in place by restore_shared_images
+                        image = channel_dict["data"]
+
+                        block_frames = [0, frames_available] if frame_range is None else frame_range
+                        block_rows = [0, image.shape[1]] if row_range is None else row_range
+
+                        block_frames = [min(index, frames_available) for index in block_frames]
+                        block_rows = [min(index, image.shape[1]) for index in block_rows]
+
+                        if block_frames[1] <= block_frames[0] or block_rows[1] <= block_rows[0]:
+                            continue
+
+                        image = read_lazy_block(image, block_frames, block_rows)
+                        frames_available = image.shape[0]
+                        frame_offset, row_offset = block_frames[0], block_rows[0]
 
-                    shared_mem = shared_memory.SharedMemory(create=True, size=image.nbytes)
+                    shared_mem = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
                     shared_memory_name = shared_mem.name
                     shared_image = np.ndarray(image.shape, dtype=image.dtype, buffer=shared_mem.buf)
                     shared_image[:] = image[:]
@@ -204,6 +334,10 @@ class _utils_compute:
                                                "gap_label": channel_dict["gap_label"],
                                                "sequence_label": channel_dict["sequence_label"],
                                                "n_frames": n_frames,
+                                               "frames_available": frames_available,
+                                               "frame_offset": frame_offset,
+                                               "row_offset": row_offset,
+                                               "block": frame_range is not None or row_range is not None,
                                                "shape": image.shape,
                                                "dtype": image.dtype,
                                                "shared_mem": shared_mem,
@@ -211,7 +345,7 @@ class _utils_compute:
 
         return self.shared_images
 
-    def restore_shared_images(self):
+    def restore_shared_images(self, write_blocks = True):
 
         if self.verbose:
             print("Restoring shared images")
@@ -220,11 +354,24 @@ class _utils_compute:
 
             for dat in self.shared_images:
                 try:
+                    if dat.get("arena", False):
+                        # edited in place, the arena keeps the block for the next operation
+                        continue
+
                     shared_mem = dat["shared_mem"]
 
                     np_array = np.ndarray(dat["shape"], dtype=dat["dtype"], buffer=shared_mem.buf)
 
-                    self.dataset_dict[dat["dataset"]][dat["channel"]]["data"] = np_array.copy()
+                    if dat.get("block", False) == False:
+                        self.dataset_dict[dat["dataset"]][dat["channel"]]["data"] = np_array.copy()
+
+                    elif write_blocks:
+                        image = self.get_writable_image(dat["dataset"], dat["channel"])
+
+                        f0, r0 = dat["frame_offset"], dat["row_offset"]
+                        f1, r1 = f0 + np_array.shape[0], r0 + np_array.shape[1]
+
+                        image[f0:f1, r0:r1] = np_array
 
                     shared_mem.close()
                     shared_mem.unlink()
@@ -378,6 +525,8 @@ class _utils_compute:
             if self.verbose:
                 print("Clearing live images")
 
+            import napari
+
             image_layers = [layer for layer in self.viewer.layers if isinstance(layer, napari.layers.Image)]
 
             for layer in image_layers:
@@ -389,86 +538,3 @@ class _utils_compute:
         except:
             print(traceback.format_exc())
             pass
-
-
-
-class WorkerSignals(QObject):
-    """
-    Defines the signals available from a running worker thread.
-
-    Supported signals are:
-
-    finished
-        No data
-
-    error
-        tuple (exctype, value, traceback.format_exc() )
-
-    result
-        object data returned from processing, anything
-
-    progress
-        int indicating % progress
-
-    """
-
-    finished = pyqtSignal()
-    error = pyqtSignal(tuple)
-    result = pyqtSignal(object)
-    progress = pyqtSignal(int)
-
-class Worker(QRunnable):
-    """
-    Worker thread
-
-    Inherits from QRunnable to handler worker thread setup, signals and wrap-up.
-
-    :param callback: The function callback to run on this worker thread. Supplied args and
-                     kwargs will be passed through to the runner.
-    :type callback: function
-    :param args: Arguments to pass to the callback function
-    :param kwargs: Keywords to pass to the callback function
-
-    """
-
-    def __init__(self, fn, *args, **kwargs):
-        super().__init__()
-
-        # Store constructor arguments (re-used for processing)
-        self.fn = fn
-        self.args = args
-        self.kwargs = kwargs
-        self.signals = WorkerSignals()
-
-        # Add the callback to our kwargs
-        self.kwargs["progress_callback"] = self.signals.progress
-
-        self._is_stopped = False  # Stop flag
-
-    @pyqtSlot()
-    def run(self):
-        """
-        Initialise the runner function with passed args, kwargs.
-        """
-
-        # Retrieve args/kwargs here; and fire processing using them
-        try:
-
-            while not self._is_stopped:
-                result = self.fn(*self.args, **self.kwargs)
-                self.signals.result.emit(result)  # Emit the result
-                self._is_stopped = True
-        except:
-            traceback.print_exc()
-            exctype, value = sys.exc_info()[:2]
-            self.signals.error.emit((exctype, value, traceback.format_exc()))
-        finally:
-            self.signals.finished.emit()  # Done
-
-    def result(self):
-        return self.fn(*self.args, **self.kwargs)
-
-    def stop(self):
-
-        self._is_stopped = True
-        self.signals.finished.emit()
\ No newline at end of file
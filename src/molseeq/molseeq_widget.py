@@ -3,7 +3,6 @@ from qtpy.QtWidgets import (QWidget,QVBoxLayout)
 
 import numpy as np
 import traceback
-from multiprocessing import Manager
 from functools import partial
 import matplotlib.colors as mcolors
 from napari.utils.notifications import show_info
@@ -18,7 +17,8 @@ from molseeq.funcs.events import _events_utils
 from molseeq.funcs.export_images_utils import _export_images_utils
 from molseeq.funcs.transform_utils import _tranform_utils
 from molseeq.funcs.trace_compute_utils import _trace_compute_utils
-from molseeq.funcs.plot_utils import _plot_utils, CustomPyQTGraphWidget
+from molseeq.funcs.plot_utils import _plot_utils
+from molseeq.funcs.plot_widgets import CustomPyQTGraphWidget
 from molseeq.funcs.align_utils import _align_utils
 from molseeq.funcs.export_traces_utils import _export_traces_utils
 from molseeq.funcs.colocalize_utils import _utils_colocalize
@@ -27,6 +27,11 @@ from molseeq.funcs.cluster_utils import _cluster_utils
 from molseeq.funcs.simple_analysis_utils import _simple_analysis_utils
 from molseeq.funcs.filter_utils import _filter_utils
 from molseeq.funcs.tracking_utils import _tracking_utils
+from molseeq.funcs.session_utils import _session_utils
+from molseeq.funcs.lazy_array_utils import _lazy_array_utils
+from molseeq.funcs.executor_utils import _executor_utils
+from molseeq.funcs.shared_memory_utils import SharedStopFlag
+from molseeq.funcs.fit_backends import get_fit_backend
 
 import napari
 
@@ -38,7 +43,8 @@ class QWidget(QWidget, gui,
     _align_utils, _loc_utils, _export_traces_utils,
     _utils_colocalize, _utils_temporal_filtering, _utils_compute,
     _cluster_utils, _simple_analysis_utils,
-    _filter_utils, _tracking_utils,):
+    _filter_utils, _tracking_utils, _session_utils,
+    _lazy_array_utils, _executor_utils,):
 
     # your QWidget.__init__ can optionally request the napari viewer instance
     # use a type annotation of 'napari.viewer.Viewer' for any parameter
@@ -70,6 +76,7 @@ class QWidget(QWidget, gui,
         #initialise variables
         self.dataset_dict = {}
         self.traces_dict = {}
+        self.traces_provenance = None
         self.plot_dict = {}
         self.contrast_dict = {}
         self.localisation_dict = {"bounding_boxes": {}, "localisations": {}}
@@ -91,10 +98,11 @@ class QWidget(QWidget, gui,
         self.multiprocessing_active = False
         self.transform_matrix = None
 
-        #create threadpool and stop event
+        #create threadpool, stop event and the shared process pool
         self.threadpool = QThreadPool()
-        manager = Manager()
-        self.stop_event = manager.Event()
+        self.process_pool = None
+        self.stop_event = SharedStopFlag()
+        self.warm_process_pool()
 
 
         self.update_import_options()
@@ -110,6 +118,8 @@ class QWidget(QWidget, gui,
     def register_events(self):
 
         self.gui.molseeq_import.clicked.connect(self.molseeq_import_data)
+        self.gui.molseeq_save_session.clicked.connect(self.save_session)
+        self.gui.molseeq_load_session.clicked.connect(self.load_session)
         self.gui.molseeq_import_mode.currentIndexChanged.connect(self.update_import_options)
         self.gui.molseeq_update_dataset_name.clicked.connect(self.update_dataset_name)
         self.gui.molseeq_delete_dataset.clicked.connect(self.delete_dataset)
@@ -244,39 +254,14 @@ class QWidget(QWidget, gui,
 
     def check_gpufit_availibility(self):
 
-        self.gpufit_available = False
-
-        try:
-            from pygpufit import gpufit as gf
-            package_installed = True
-        except:
-            package_installed = False
-
-        if package_installed:
-
-            if not gf.cuda_available():
-                print("Pygpufit not available due to missing CUDA")
-            else:
-                runtime_version, driver_version = gf.get_cuda_version()
-
-                runtime_version = ".".join([str(v) for v in list(runtime_version)])
-                driver_version = ".".join([str(v) for v in list(driver_version)])
-
-                if runtime_version != driver_version:
-                    print(f"Pygpufit not available due to CUDA version mismatch. "
-                          f"Runtime: {runtime_version}, Driver: {driver_version}")
-
-                else:
-                    self.gpufit_available = True
-
-        else:
-            print("Pygpufit not available due to missing package")
-            print("Install pygpufit package into napari-molseeq root directory")
+        self.gpufit_available, reason = get_fit_backend("gpufit").get_status()
 
         if self.gpufit_available:
             print("Pygpufit available")
             self.gui.picasso_use_gpufit.setEnabled(True)
         else:
+            print(f"Pygpufit not available due to {reason}")
+            print(f"Fitting on CPU with the {get_fit_backend(use_gpu=False).name} backend")
             self.gui.picasso_use_gpufit.setEnabled(False)
 
 
@@ -472,11 +457,11 @@ class QWidget(QWidget, gui,
 
                         if "localisations" in localisation_dict.keys():
 
-                            locs = localisation_dict["localisations"]
+                            loc_table = self.get_loc_table(dataset_name, image_channel.lower())
 
-                            if active_frame in locs.frame:
+                            if loc_table.has_frame(active_frame):
 
-                                frame_locs = locs[locs.frame == active_frame].copy()
+                                frame_locs = loc_table.get_frame(active_frame)
                                 render_locs = np.vstack((frame_locs.y, frame_locs.x)).T.tolist()
 
                                 vis_mode = self.gui.picasso_vis_mode.currentText()
@@ -546,23 +531,10 @@ class QWidget(QWidget, gui,
                     self.viewer.layers[layer].refresh()
 
 
-    def get_localisation_centres(self, locs, mode = "localisations"):
-
-        loc_centres = []
-
-        try:
-
-            for loc in locs:
-                frame = int(loc.frame)
-                if mode == "localisations":
-                    loc_centres.append([frame, loc.y, loc.x])
-                else:
-                    loc_centres.append([loc.y, loc.x])
-
-        except:
-            print(traceback.format_exc())
+    def closeEvent(self, event):
 
-        return loc_centres
+        self.close_shared_image_store()
+        self.shutdown_process_pool()
+        self.stop_event.close()
 
-    def closeEvent(self):
-        print("Closing molSEEQ")
+        super().closeEvent(event)
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from scipy.special import erf
+
+from molseeq.funcs.gauss_fit import fit_spots_mle_batch, fit_gauss_2d_elliptic, initial_parameters_gpufit
+from molseeq.funcs.fit_backends import get_fit_backend, GAUSS_2D_ELLIPTIC, ESTIMATOR_MLE
+
+BOX_SIZE = 7
+N_SPOTS = 200
+
+# spot centre in pixels from the box corner, photons, background, x/y widths
+X, Y, PHOTONS, BG, SX, SY = 3.3, 2.8, 2000.0, 20.0, 1.0, 1.3
+
+
+def gaussian_spot(x, y, photons, bg, sx, sy, size=BOX_SIZE):
+
+    # pixel integrated gaussian, as imaged by a camera
+    pixels = np.arange(size)
+
+    px = 0.5 * (erf((pixels - x + 0.5) / (np.sqrt(2) * sx)) - erf((pixels - x - 0.5) / (np.sqrt(2) * sx)))
+    py = 0.5 * (erf((pixels - y + 0.5) / (np.sqrt(2) * sy)) - erf((pixels - y - 0.5) / (np.sqrt(2) * sy)))
+
+    return photons * np.outer(py, px) + bg
+
+
+def get_spots(sx=SX, sy=SY, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    spot = gaussian_spot(X, Y, PHOTONS, BG, sx, sy)
+
+    return rng.poisson(spot, size=(N_SPOTS, BOX_SIZE, BOX_SIZE)).astype(np.float32)
+
+
+def test_fit_spots_mle_batch_sigmaxy():
+
+    theta, crlbs, likelihoods, iterations = fit_spots_mle_batch(get_spots(), method="sigmaxy")
+
+    assert np.isfinite(theta).all()
+    assert np.isfinite(crlbs).all()
+
+    # as picasso.gaussmle, the first coordinate and width are along the rows of the spot
+    y, x, photons, bg, sy, sx = np.median(theta, axis=0)
+
+    assert x == pytest.approx(X, abs=0.05)
+    assert y == pytest.approx(Y, abs=0.05)
+    assert photons == pytest.approx(PHOTONS, rel=0.05)
+    assert bg == pytest.approx(BG, rel=0.1)
+    assert sx == pytest.approx(SX, abs=0.1)
+    assert sy == pytest.approx(SY, abs=0.1)
+
+
+def test_fit_spots_mle_batch_sigma():
+
+    theta, crlbs, likelihoods, iterations = fit_spots_mle_batch(get_spots(sx=1.1, sy=1.1), method="sigma")
+
+    assert np.isfinite(theta).all()
+
+    # one symmetric width is fitted
+    assert np.array_equal(theta[:, 4], theta[:, 5])
+    assert np.array_equal(crlbs[:, 4], crlbs[:, 5])
+
+    y, x, photons, bg, sy, sx = np.median(theta, axis=0)
+
+    assert x == pytest.approx(X, abs=0.05)
+    assert y == pytest.approx(Y, abs=0.05)
+    assert photons == pytest.approx(PHOTONS, rel=0.05)
+    assert bg == pytest.approx(BG, rel=0.1)
+    assert sx == pytest.approx(1.1, abs=0.05)
+
+
+def test_fit_spots_mle_batch_unknown_method():
+
+    with pytest.raises(ValueError):
+        fit_spots_mle_batch(get_spots(), method="z")
+
+
+@pytest.mark.parametrize("estimator_id", [0, ESTIMATOR_MLE])
+def test_fit_gauss_2d_elliptic(estimator_id):
+
+    spots = get_spots()
+
+    initial_parameters = initial_parameters_gpufit(spots, BOX_SIZE)
+
+    parameters, states, chi_squares, number_iterations, exec_time = fit_gauss_2d_elliptic(
+        spots.reshape(N_SPOTS, -1), None, initial_parameters, estimator_id=estimator_id)
+
+    assert parameters.shape == (N_SPOTS, 6)
+    assert np.all(states == 0)
+
+    amplitude, x, y, sx, sy, bg = np.median(parameters, axis=0)
+
+    assert x == pytest.approx(X, abs=0.05)
+    assert y == pytest.approx(Y, abs=0.05)
+    assert sx == pytest.approx(SX, abs=0.1)
+    assert sy == pytest.approx(SY, abs=0.1)
+    assert bg == pytest.approx(BG, rel=0.1)
+
+    photons = np.median(parameters[:, 0] * 2.0 * np.pi * parameters[:, 3] * parameters[:, 4])
+
+    assert photons == pytest.approx(PHOTONS, rel=0.05)
+
+
+def test_numba_backend_matches_fit_gauss_2d_elliptic():
+
+    spots = get_spots().reshape(N_SPOTS, -1)
+    initial_parameters = initial_parameters_gpufit(get_spots(), BOX_SIZE)
+
+    backend = get_fit_backend("numba")
+
+    backend_parameters = backend.fit(spots, None, GAUSS_2D_ELLIPTIC, initial_parameters, n_threads=1)[0]
+    parameters = fit_gauss_2d_elliptic(spots, None, initial_parameters)[0]
+
+    assert np.allclose(backend_parameters, parameters)
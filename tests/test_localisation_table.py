@@ -0,0 +1,142 @@
+import numpy as np
+
+from molseeq.funcs.localisation_table import LocalisationTable
+
+
+def get_locs(n_locs, n_frames=20, seed=0, sort=True):
+
+    rng = np.random.default_rng(seed)
+
+    locs = np.zeros(n_locs, dtype=[("frame", "u4"), ("x", "f4"), ("y", "f4"), ("photons", "f4")])
+    locs["frame"] = rng.integers(0, n_frames, n_locs)
+    locs["x"] = rng.uniform(0, 100, n_locs)
+    locs["y"] = rng.uniform(0, 100, n_locs)
+    locs["photons"] = rng.uniform(100, 1000, n_locs)
+
+    if sort:
+        locs = locs[np.argsort(locs["frame"], kind="stable")]
+
+    return locs.view(np.recarray)
+
+
+def brute_force_frames(locs, start_index, end_index):
+
+    mask = (locs["frame"] >= start_index) & (locs["frame"] <= end_index)
+
+    return locs[mask]
+
+
+def test_from_records_round_trip():
+
+    locs = get_locs(500)
+
+    table = LocalisationTable.from_records(locs, dataset="d", channel="donor")
+
+    assert len(table) == 500
+    assert table.names[:2] == ["dataset", "channel"]
+    assert set(table.dataset) == {"d"}
+
+    records = table.to_records(exclude=["dataset", "channel"])
+
+    assert records.dtype == locs.dtype
+    assert np.array_equal(records, locs)
+
+
+def test_get_frames_sorted():
+
+    locs = get_locs(1000)
+    table = LocalisationTable.from_records(locs)
+
+    for start_index, end_index in [(0, 0), (3, 7), (15, 19), (19, 30), (-5, 2), (25, 30)]:
+        frame_locs = table.get_frames(start_index, end_index).to_records()
+        assert np.array_equal(frame_locs, brute_force_frames(locs, start_index, end_index))
+
+    assert np.array_equal(table.get_frame(4).to_records(), brute_force_frames(locs, 4, 4))
+
+
+def test_get_frames_unsorted():
+
+    # frames of unsorted tables keep their insertion order
+    locs = get_locs(1000, sort=False)
+    table = LocalisationTable.from_records(locs)
+
+    for start_index, end_index in [(0, 0), (3, 7), (0, 19)]:
+        frame_locs = table.get_frames(start_index, end_index).to_records()
+        expected_locs = brute_force_frames(locs, start_index, end_index)
+        expected_locs = expected_locs[np.argsort(expected_locs["frame"], kind="stable")]
+        assert np.array_equal(frame_locs, expected_locs)
+
+    assert np.array_equal(table.sort_by_frame().to_records(),
+                          locs[np.argsort(locs["frame"], kind="stable")])
+
+
+def test_frame_offsets_and_has_frame():
+
+    locs = get_locs(200, n_frames=10)
+    locs = locs[locs["frame"] != 4]
+
+    table = LocalisationTable.from_records(locs)
+
+    counts = np.bincount(locs["frame"], minlength=10)
+
+    assert np.array_equal(np.diff(table.frame_offsets), counts)
+    assert table.has_frame(4) == False
+    assert table.has_frame(3) == True
+    assert table.has_frame(-1) == False
+    assert table.has_frame(10) == False
+
+
+def test_set_column_frame_resets_index():
+
+    table = LocalisationTable.from_records(get_locs(100, n_frames=5))
+    assert len(table.get_frame(0)) > 0
+
+    table.set_column("frame", np.full(len(table), 7, dtype=np.uint32))
+
+    assert len(table.get_frame(0)) == 0
+    assert len(table.get_frame(7)) == 100
+
+
+def test_concatenate_round_trip():
+
+    donor_locs = get_locs(300, seed=1)
+    acceptor_locs = get_locs(200, seed=2)
+    other_locs = get_locs(100, seed=3)
+
+    tables = [LocalisationTable.from_records(donor_locs, dataset="a", channel="donor"),
+              LocalisationTable.from_records(acceptor_locs, dataset="a", channel="acceptor"),
+              None,
+              LocalisationTable.from_records(other_locs, dataset="b", channel="donor")]
+
+    table = LocalisationTable.concatenate(tables)
+
+    assert len(table) == 600
+    assert table.get_values("dataset") == ["a", "b"]
+    assert table.get_values("channel") == ["donor", "acceptor"]
+
+    # categorical codes are remapped onto the combined categories
+    for dataset, channel, locs in [("a", "donor", donor_locs), ("a", "acceptor", acceptor_locs),
+                                   ("b", "donor", other_locs)]:
+        selected = table.select(dataset=dataset, channel=channel)
+        assert np.array_equal(selected.to_records(exclude=["dataset", "channel"]), locs)
+
+    assert len(table.select(dataset="c")) == 0
+
+    records = table.to_records()
+
+    assert list(records.dataset[:300]) == ["a"] * 300
+    assert list(records.channel[300:500]) == ["acceptor"] * 200
+
+    # records with categorical fields convert back to the same table
+    round_trip = LocalisationTable.from_records(records)
+
+    assert np.array_equal(round_trip.to_records(exclude=["dataset", "channel"]),
+                          records[["frame", "x", "y", "photons"]].astype(donor_locs.dtype))
+    assert list(round_trip.dataset) == list(records.dataset)
+    assert list(round_trip.channel) == list(records.channel)
+
+
+def test_concatenate_empty():
+
+    assert len(LocalisationTable.concatenate([])) == 0
+    assert len(LocalisationTable.concatenate([None])) == 0
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from molseeq.funcs.neighbour_utils import get_overlapping_pairs, get_overlap_mask
+
+
+def brute_force_overlap_mask(coordinates, min_distance):
+
+    # the pairwise distance matrix get_overlap_mask replaces
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+
+    diff = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+    dist_squared = np.sum(diff ** 2, axis=-1)
+    np.fill_diagonal(dist_squared, np.inf)
+
+    return np.any(dist_squared < min_distance ** 2, axis=1)
+
+
+def get_locs(n_locs, seed=0, dtype=np.float32, size=256):
+
+    rng = np.random.default_rng(seed)
+
+    locs = np.zeros(n_locs, dtype=[("frame", "u4"), ("x", dtype), ("y", dtype), ("net_gradient", "f4")])
+    locs["x"] = rng.uniform(0, size, n_locs)
+    locs["y"] = rng.uniform(0, size, n_locs)
+    locs["net_gradient"] = rng.uniform(0, 1000, n_locs)
+
+    return locs.view(np.recarray)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int32])
+@pytest.mark.parametrize("box_size", [3, 5, 9])
+def test_get_overlap_mask_matches_brute_force(dtype, box_size):
+
+    locs = get_locs(2000, dtype=dtype)
+    coordinates = np.vstack((locs.y, locs.x)).T
+
+    overlapping = get_overlap_mask(coordinates, box_size)
+
+    assert overlapping.any()
+    assert np.array_equal(overlapping, brute_force_overlap_mask(coordinates, box_size))
+
+
+def test_get_overlap_mask_excludes_exact_distance():
+
+    # locs exactly box_size apart do not overlap, as with the strict distance matrix comparison
+    coordinates = np.array([[0, 0], [0, 5], [20, 20], [20, 24]])
+
+    overlapping = get_overlap_mask(coordinates, 5)
+
+    assert overlapping.tolist() == [False, False, True, True]
+
+
+def test_get_overlapping_pairs():
+
+    coordinates = np.array([[0, 0], [0, 1], [50, 50], [np.nan, 0], [0, 2]])
+
+    pairs = get_overlapping_pairs(coordinates, 3)
+
+    assert sorted(map(tuple, pairs.tolist())) == [(0, 1), (0, 4), (1, 4)]
+
+    assert len(get_overlapping_pairs(coordinates[:1], 3)) == 0
+    assert len(get_overlapping_pairs(coordinates, 0)) == 0
+
+
+def test_remove_overlapping_locs_matches_brute_force():
+
+    pytest.importorskip("picasso")
+    pytest.importorskip("shapely")
+
+    from molseeq.funcs.picasso_detect import remove_overlapping_locs
+
+    locs = get_locs(2000)
+    coordinates = np.vstack((locs.y, locs.x)).T
+
+    non_overlapping_locs = remove_overlapping_locs(locs, 5)
+
+    expected_locs = locs[~brute_force_overlap_mask(coordinates, 5)]
+
+    assert isinstance(non_overlapping_locs, np.recarray)
+    assert np.array_equal(non_overlapping_locs, expected_locs)
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+from molseeq.funcs.trace_store import build_trace_stores, TraceStore
+
+
+def get_toy_metrics(n_spots=6, n_frames=12, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    spot_metrics = []
+    background_metrics = []
+    picasso_spot_metrics = []
+
+    for dataset in ["b", "a"]:
+        for channel in ["donor", "acceptor"]:
+
+            spot_cx = rng.uniform(0, 100, n_spots)
+            spot_cy = rng.uniform(0, 100, n_spots)
+
+            # spots are computed in batches, frames in any order
+            for batch in np.array_split(rng.permutation(n_spots), 3):
+
+                spot_index, frame_index = np.meshgrid(batch, rng.permutation(n_frames), indexing="ij")
+                spot_index = spot_index.ravel()
+                frame_index = frame_index.ravel()
+
+                spot_metrics.append(pd.DataFrame({"dataset": dataset, "channel": channel,
+                                                  "spot_index": spot_index, "frame_index": frame_index,
+                                                  "spot_cx": spot_cx[spot_index], "spot_cy": spot_cy[spot_index],
+                                                  "spot_size": 3,
+                                                  "spot_mean": rng.normal(100, 10, len(spot_index)),
+                                                  "spot_sum": rng.normal(1000, 100, len(spot_index))}))
+
+            for frame_index in range(n_frames):
+
+                background_metrics.append({"dataset": dataset, "channel": channel, "frame_index": frame_index,
+                                           "spot_mean_global_bg": rng.normal(10, 1),
+                                           "spot_median_global_bg": rng.normal(10, 1)})
+
+                picasso_spot_metrics.append(pd.DataFrame({"dataset": dataset, "channel": channel,
+                                                          "spot_index": np.arange(n_spots), "frame_index": frame_index,
+                                                          "spot_cx": spot_cx, "spot_cy": spot_cy,
+                                                          "spot_photons": rng.normal(500, 50, n_spots),
+                                                          "spot_bg": rng.normal(5, 1, n_spots)}))
+
+    return spot_metrics, background_metrics, picasso_spot_metrics
+
+
+def build_traces_dict(spot_metrics, background_metrics, picasso_spot_metrics):
+
+    # the merged and grouped dataframe construction TraceStore replaces
+    traces_dict = {}
+
+    spot_metrics = pd.concat(spot_metrics)
+    spot_metrics.sort_values(by=["dataset", "channel", "spot_index", "frame_index"], inplace=True)
+
+    if background_metrics is not None and len(background_metrics) > 0:
+        background_metrics = pd.DataFrame(background_metrics)
+        merge_keys = ["dataset", "channel", "frame_index"]
+        spot_metrics = pd.merge(spot_metrics, background_metrics, on=merge_keys, how='left')
+
+    if picasso_spot_metrics is not None and len(picasso_spot_metrics) > 0:
+        picasso_spot_metrics = pd.concat(picasso_spot_metrics)
+        picasso_spot_metrics.sort_values(by=["dataset", "channel", "spot_index", "frame_index"], inplace=True)
+        merge_keys = ["dataset", "channel", "spot_index", "frame_index", "spot_cx", "spot_cy"]
+        spot_metrics = pd.merge(spot_metrics, picasso_spot_metrics, on=merge_keys, how='left')
+
+    for names, data in spot_metrics.groupby(["dataset", "channel", "spot_index"]):
+
+        dataset, channel, spot_index = names
+
+        spot_dict = traces_dict.setdefault(dataset, {}).setdefault(channel, {}).setdefault(spot_index, {})
+
+        for column in data.columns:
+            if column not in ["dataset", "channel", "spot_index", "frame_index"]:
+                spot_dict[column] = data[column].values
+
+    return traces_dict
+
+
+def assert_matches_traces_dict(trace_stores, traces_dict):
+
+    assert list(trace_stores.keys()) == list(traces_dict.keys())
+
+    for dataset in traces_dict:
+
+        assert list(trace_stores[dataset].keys()) == list(traces_dict[dataset].keys())
+
+        for channel, channel_dict in traces_dict[dataset].items():
+
+            store = trace_stores[dataset][channel]
+
+            assert isinstance(store, TraceStore)
+            assert store.keys() == list(channel_dict.keys())
+
+            for spot_index, spot_dict in channel_dict.items():
+
+                assert set(store[spot_index].keys()) == set(spot_dict.keys())
+
+                for name, values in spot_dict.items():
+                    if name in store.attributes:
+                        # spot attributes are stored once per spot
+                        assert np.all(values == store[spot_index][name])
+                    else:
+                        assert np.allclose(store[spot_index][name], values.astype(np.float32), equal_nan=True)
+
+
+def test_build_trace_stores_matches_groupby():
+
+    spot_metrics, background_metrics, picasso_spot_metrics = get_toy_metrics()
+
+    trace_stores = build_trace_stores(spot_metrics, background_metrics, picasso_spot_metrics)
+    traces_dict = build_traces_dict(spot_metrics, background_metrics, picasso_spot_metrics)
+
+    assert_matches_traces_dict(trace_stores, traces_dict)
+
+    store = trace_stores["a"]["donor"]
+
+    assert store.data.shape == (6, 12, 6)
+    assert store.data.dtype == np.float32
+    assert np.allclose(store.get_values("spot_mean", "spot_mean_global_bg"),
+                       store.get_metric("spot_mean") - store.get_metric("spot_mean_global_bg"))
+
+
+def test_build_trace_stores_spot_metrics_only():
+
+    spot_metrics, _, _ = get_toy_metrics(n_spots=4, n_frames=5, seed=1)
+
+    trace_stores = build_trace_stores(spot_metrics)
+    traces_dict = build_traces_dict(spot_metrics, None, None)
+
+    assert_matches_traces_dict(trace_stores, traces_dict)
+
+
+def test_build_trace_stores_picasso_subset():
+
+    # picasso spots that were not measured are dropped, missing picasso frames stay nan
+    spot_metrics, background_metrics, picasso_spot_metrics = get_toy_metrics(n_spots=4, n_frames=5, seed=2)
+
+    picasso_spot_metrics = [metrics[metrics["spot_index"] != 1] for metrics in picasso_spot_metrics[1:]]
+    spot_metrics = [metrics[metrics["spot_index"] != 3] for metrics in spot_metrics]
+
+    trace_stores = build_trace_stores(spot_metrics, background_metrics, picasso_spot_metrics)
+    traces_dict = build_traces_dict(spot_metrics, background_metrics, picasso_spot_metrics)
+
+    assert_matches_traces_dict(trace_stores, traces_dict)
+
+    assert np.all(np.isnan(trace_stores["b"]["donor"][1]["spot_photons"]))
+
+
+def test_build_trace_stores_empty():
+
+    assert build_trace_stores(None) == {}
+    assert build_trace_stores([pd.DataFrame()]) == {}
+
+
+def test_spot_trace_views():
+
+    spot_metrics, background_metrics, _ = get_toy_metrics(n_spots=3, n_frames=4, seed=3)
+
+    store = build_trace_stores(spot_metrics, background_metrics)["a"]["acceptor"]
+
+    store[2]["spot_mean"] = 0
+    store[2]["gap_label"] = "gap"
+    store.fill_attribute("bleach_index", 3)
+
+    assert np.all(store.get_metric("spot_mean")[2] == 0)
+    assert np.all(store.get_metric("spot_mean")[:2] != 0)
+    assert list(store.get_attribute("gap_label")) == [None, None, "gap"]
+    assert store[1]["bleach_index"] == 3
+    assert store[0].get("missing") is None
+    assert 5 not in store